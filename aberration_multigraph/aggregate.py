@@ -0,0 +1,345 @@
+"""
+Streaming statistics over collections of aberration multigraphs (AMGs).
+
+A statistic is computed by a *reducer*, which consumes AMGs one at a time and
+keeps only a small summary, such as a histogram. Any number of reducers share a
+single pass over the AMGs with :func:`aggregate`, so adding a statistic never
+costs another enumeration. Reducers of the same kind are mergeable: parallel
+workers each reduce a share of the AMGs and the partial reducers are combined
+with :func:`merge`. Results are returned as Counters and integers keyed by the
+names of the reducers, never printed.
+
+Reducers also consume whole collections of AMGs at once, see
+:func:`aggregate_batches`. A histogram keyed by the name of an invariant, e.g.,
+``Histogram('diameter')``, then counts the invariant columns computed by the
+batched kernels of :mod:`aberration_multigraph.batch` without building any AMG.
+
+Reducers are picklable, and can thus be sent between processes, as long as
+their key functions and predicates are module-level functions, like the key
+functions defined here.
+"""
+
+from collections import Counter
+from aberration_multigraph.amg import cycle_structure_label
+from aberration_multigraph.batch import plain_values
+
+
+def cycle_structure(amg):
+    """
+    The cycle structure of an AMG as a label such as ``'4+6*2'``.
+    """
+    return cycle_structure_label(amg.cycle_structure())
+
+
+def diameter(amg):
+    """
+    The diameter of an AMG.
+    """
+    return amg.diameter()
+
+
+def girth(amg):
+    """
+    The girth of an AMG.
+    """
+    return amg.girth()
+
+
+def num_cycles(amg):
+    """
+    The number of cycles of an AMG.
+    """
+    return len(amg.cycles())
+
+
+def is_connected(amg):
+    """
+    Whether an AMG is connected.
+    """
+    return amg.is_connected()
+
+
+# The key functions computing the invariants of
+# :data:`aberration_multigraph.batch.INVARIANTS` one AMG at a time.
+KEYS = {'diameter': diameter, 'girth': girth, 'num_cycles': num_cycles,
+        'cycle_structure': cycle_structure, 'is_connected': is_connected}
+
+
+class Reducer:
+    """
+    Base class of the reducers.
+
+    Attributes
+    ----------
+    name : str
+        The key of the result in the output of :func:`aggregate`.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def update(self, amg):
+        """
+        Account for one more AMG.
+        """
+        raise NotImplementedError
+
+    def update_batch(self, amgs):
+        """
+        Account for a collection of AMGs, by default one AMG at a time.
+
+        Parameters
+        ----------
+        amgs : AMGCollection
+            The AMGs.
+        """
+        for amg in amgs:
+            self.update(amg)
+
+    def merge(self, other):
+        """
+        Account for the AMGs reduced by another reducer of the same kind.
+
+        Parameters
+        ----------
+        other : Reducer
+            A reducer with the same class and name.
+
+        Raises
+        ------
+        ValueError
+            If the reducers are of different kinds.
+        """
+        if type(other) is not type(self) or other.name != self.name:
+            raise ValueError(f'Cannot merge {other.name} into {self.name}!')
+        self._merge(other)
+
+    def _merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        """
+        The statistic over all AMGs reduced so far.
+        """
+        raise NotImplementedError
+
+
+class Count(Reducer):
+    """
+    Counts the AMGs.
+    """
+    def __init__(self, name='count'):
+        super().__init__(name)
+        self.count = 0
+
+    def update(self, amg):
+        self.count += 1
+
+    def update_batch(self, amgs):
+        self.count += len(amgs)
+
+    def _merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return self.count
+
+
+class Predicate(Reducer):
+    """
+    Counts the AMGs satisfying a predicate.
+    """
+    def __init__(self, predicate, name=None):
+        """
+        Parameters
+        ----------
+        predicate : callable
+            Maps an AMG to a bool.
+        name : str, optional
+            The name of the result, by default the name of ``predicate``.
+        """
+        super().__init__(name or predicate.__name__)
+        self.predicate = predicate
+        self.count = 0
+
+    def update(self, amg):
+        self.count += bool(self.predicate(amg))
+
+    def _merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return self.count
+
+
+class Histogram(Reducer):
+    """
+    Counts the AMGs by the value of a key function, e.g., :func:`diameter`, or
+    of an invariant, e.g., ``'diameter'``.
+    """
+    def __init__(self, key, name=None):
+        """
+        Parameters
+        ----------
+        key : callable or str
+            Maps an AMG to a hashable value, or names one of the invariants
+            computed in batches, see ``KEYS``.
+        name : str, optional
+            The name of the result, by default the name of ``key``.
+        """
+        super().__init__(name or _key_name(key))
+        self.key = key
+        self.counts = Counter()
+
+    def update(self, amg):
+        self.counts[_value(self.key, amg)] += 1
+
+    def update_batch(self, amgs):
+        self.counts.update(_column(self.key, amgs))
+
+    def _merge(self, other):
+        self.counts.update(other.counts)
+
+    def result(self):
+        return Counter(self.counts)
+
+
+class JointHistogram(Histogram):
+    """
+    Counts the AMGs by the tuple of values of several key functions.
+    """
+    def __init__(self, *keys, name=None):
+        """
+        Parameters
+        ----------
+        *keys : callable or str
+            Map an AMG to hashable values, or name invariants, see
+            :class:`Histogram`.
+        name : str, optional
+            The name of the result, by default the names of ``keys`` joined
+            by underscores.
+        """
+        super().__init__(_Joint(keys),
+                         name or '_'.join(_key_name(key) for key in keys))
+
+
+class _Joint:
+    """
+    A picklable key function returning the values of several key functions.
+    """
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+
+    def __call__(self, amg):
+        return tuple(_value(key, amg) for key in self.keys)
+
+    def column(self, amgs):
+        return list(zip(*(_column(key, amgs) for key in self.keys)))
+
+
+def _key_name(key):
+    """
+    Helper function to name the result of a key function or invariant.
+    """
+    return key if isinstance(key, str) else key.__name__
+
+
+def _value(key, amg):
+    """
+    Helper function to compute the value of a key for one AMG.
+    """
+    return KEYS[key](amg) if isinstance(key, str) else key(amg)
+
+
+def _column(key, amgs):
+    """
+    Helper function to compute the values of a key for a collection of AMGs,
+    in batches for invariants.
+    """
+    if isinstance(key, str):
+        return plain_values(amgs.invariant(key))
+    if isinstance(key, _Joint):
+        return key.column(amgs)
+    return [key(amg) for amg in amgs]
+
+
+def aggregate(amgs, reducers):
+    """
+    Feed AMGs to several reducers in a single pass.
+
+    Parameters
+    ----------
+    amgs : iterable of AberrationMultigraph
+        The AMGs, e.g., a generator of AMGs.
+    reducers : list of Reducer
+        The reducers, updated in place.
+
+    Returns
+    -------
+    dict
+        Maps the name of every reducer to its result.
+    """
+    _check_names(reducers)
+    for amg in amgs:
+        for reducer in reducers:
+            reducer.update(amg)
+    return {reducer.name: reducer.result() for reducer in reducers}
+
+
+def aggregate_batches(batches, reducers):
+    """
+    Feed collections of AMGs to several reducers in a single pass.
+
+    Histograms of invariants count the batched invariant columns of every
+    collection; other reducers are fed its AMGs one at a time.
+
+    Parameters
+    ----------
+    batches : iterable of AMGCollection
+        The collections, e.g., chunks of an enumeration.
+    reducers : list of Reducer
+        The reducers, updated in place.
+
+    Returns
+    -------
+    dict
+        Maps the name of every reducer to its result.
+    """
+    _check_names(reducers)
+    for amgs in batches:
+        for reducer in reducers:
+            reducer.update_batch(amgs)
+    return {reducer.name: reducer.result() for reducer in reducers}
+
+
+def _check_names(reducers):
+    """
+    Helper function to check that reducers have distinct names.
+    """
+    names = [reducer.name for reducer in reducers]
+    if len(set(names)) != len(names):
+        raise ValueError('Reducers must have distinct names!')
+
+
+def merge(partials):
+    """
+    Merge the reducers of parallel workers.
+
+    Parameters
+    ----------
+    partials : iterable of list of Reducer
+        For every worker, its reducers, in the same order for all workers.
+
+    Returns
+    -------
+    dict
+        Maps the name of every reducer to its result over the AMGs of all
+        workers.
+    """
+    partials = iter(partials)
+    reducers = next(partials, [])
+    for other in partials:
+        if len(other) != len(reducers):
+            raise ValueError('Workers must use the same reducers!')
+        for reducer, partial in zip(reducers, other):
+            reducer.merge(partial)
+    return {reducer.name: reducer.result() for reducer in reducers}
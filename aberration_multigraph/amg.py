@@ -529,7 +529,8 @@ class AberrationMultigraph:
         AberrationMultigraph
             An object representing the AMG stored in the file.
         """
-        return pickle.load(open(path+filename, 'rb'))
+        with open(path+filename, 'rb') as file:
+            return pickle.load(file)
     
     def __hash__(self) -> int:
         return hash(self.dsbs+self.rejoins)
@@ -538,4 +539,43 @@ class AberrationMultigraph:
         return (True if self.chromatins == other.chromatins
                         and self.dsbs == other.dsbs 
                         and self.rejoins == other.rejoins
-                    else False)
\ No newline at end of file
+                    else False)
+
+
+def cycle_structure_label(cs):
+    """
+    Format a cycle structure as a string such as ``'4+6*2'``.
+
+    Parameters
+    ----------
+    cs : Counter
+        Counts the number of cycles by length.
+
+    Returns
+    -------
+    str
+        The lengths of the cycles, with multiplicities.
+    """
+    return '+'.join(f'{i}*{cs[i]}' if cs[i] != 1 else str(i)
+                    for i in sorted(cs))
+
+
+def cycle_structure_counts(label):
+    """
+    Parse a label of :func:`cycle_structure_label` back into a cycle structure.
+
+    Parameters
+    ----------
+    label : str
+        A label such as ``'4+6*2'``.
+
+    Returns
+    -------
+    Counter
+        Counts the number of cycles by length.
+    """
+    cs = Counter()
+    for term in filter(None, label.split('+')):
+        length, _, count = term.partition('*')
+        cs[int(length)] += int(count or 1)
+    return cs
@@ -0,0 +1,294 @@
+"""
+Batched invariants of aberration multigraphs (AMGs) on one backbone.
+
+Computing invariants one AMG at a time builds a networkx graph per AMG, and for
+small graphs this overhead dominates the actual work. The kernels here compute
+the invariants of many AMGs sharing a backbone at once with NumPy:
+
+- distances, and thus diameters and connectivity, by a breadth-first search
+  from all vertices of all AMGs at once, one batched boolean matrix product
+  per level;
+- girths from the same distances: in a BFS from a vertex on a shortest cycle,
+  the cycle closes either at an edge between two vertices of one level (odd
+  length) or at a vertex with two neighbors on the previous level (even
+  length);
+- cycles of the graph of DSB and rejoin edges by walking partners: following
+  a DSB edge and then a rejoin edge permutes the vertices, and every cycle of
+  length ``2k`` splits into two orbits of size ``k``.
+
+AMGs are processed in chunks of ``CHUNK_SIZE``, which bounds the memory used by
+the ``(chunk, V, V)`` arrays for ``V`` vertices.
+"""
+
+from collections import Counter
+import numpy as np
+from aberration_multigraph.amg import cycle_structure_label
+
+CHUNK_SIZE = 256
+
+# The invariants computed by the kernels.
+INVARIANTS = ('diameter', 'girth', 'num_cycles', 'cycle_structure',
+              'is_connected')
+
+
+def invariants(amgs, names=INVARIANTS, chunk_size=CHUNK_SIZE):
+    """
+    Compute invariants of AMGs sharing one backbone.
+
+    Parameters
+    ----------
+    amgs : sequence of AberrationMultigraph
+        AMGs with identical chromatin and DSB edges and the same number of
+         rejoin edges.
+    names : iterable of str, optional
+        The invariants to compute, by default all of ``INVARIANTS``.
+    chunk_size : int, optional
+        The number of AMGs processed at once, by default ``CHUNK_SIZE``.
+
+    Returns
+    -------
+    dict
+        Maps every name to an array with the value for every AMG, see
+        :func:`rejoin_invariants`.
+    """
+    amgs = list(amgs)
+    if not amgs:
+        raise ValueError('Cannot compute invariants of no AMGs!')
+    first = amgs[0]
+    vertices = sorted({v for edges in (first.chromatins, first.dsbs)
+                           for edge in edges for v in edge})
+    index = {v: i for i, v in enumerate(vertices)}
+    for amg in amgs:
+        if (amg.chromatins != first.chromatins or amg.dsbs != first.dsbs
+                or len(amg.rejoins) != len(first.rejoins)):
+            raise ValueError('AMGs do not share a backbone!')
+    rejoins = np.array([[(index[u], index[v]) for u, v in amg.rejoins]
+                            for amg in amgs], dtype=np.int64) \
+                .reshape(len(amgs), len(first.rejoins), 2)
+    return rejoin_invariants(first.chromatins, first.dsbs, rejoins, names,
+                             vertices, chunk_size)
+
+
+def rejoin_invariants(chromatins, dsbs, rejoins, names=INVARIANTS,
+                      vertices=None, chunk_size=CHUNK_SIZE):
+    """
+    Compute invariants of AMGs given by arrays of rejoin edges.
+
+    Parameters
+    ----------
+    chromatins, dsbs : iterable of tuple
+        The backbone.
+    rejoins : array_like
+        Rejoin edges of all AMGs as indices into ``vertices``, of shape
+        ``(N, R, 2)``.
+    names : iterable of str, optional
+        The invariants to compute, by default all of ``INVARIANTS``.
+    vertices : list, optional
+        Vertex labels ordered by index, by default the sorted vertices of the
+        backbone.
+    chunk_size : int, optional
+        The number of AMGs processed at once, by default ``CHUNK_SIZE``.
+
+    Returns
+    -------
+    dict
+        Maps every name to an array with the value for every AMG. Diameters
+        and girths are floats: the diameter of a disconnected AMG and the
+        girth of an AMG without cycles are ``numpy.inf``. Cycle structures are
+        labels such as ``'4+6*2'``, as in
+        :func:`~aberration_multigraph.aggregate.cycle_structure`.
+
+    Raises
+    ------
+    ValueError
+        If an invariant is unknown.
+    """
+    names = list(names)
+    for name in names:
+        if name not in INVARIANTS:
+            raise ValueError(f'Unknown invariant {name}!')
+    if vertices is None:
+        vertices = sorted({v for edges in (chromatins, dsbs)
+                               for edge in edges for v in edge})
+    index = {v: i for i, v in enumerate(vertices)}
+    backbone = np.array([(index[u], index[v])
+                            for edges in (chromatins, dsbs)
+                            for u, v in edges], dtype=np.int64).reshape(-1, 2)
+    dsb_partner = np.full(len(vertices), -1, dtype=np.int64)
+    for u, v in dsbs:
+        dsb_partner[index[u]], dsb_partner[index[v]] = index[v], index[u]
+    rejoins = np.asarray(rejoins, dtype=np.int64)
+    chunks = [_chunk_invariants(backbone, dsb_partner,
+                                rejoins[start:start+chunk_size], names)
+                for start in range(0, len(rejoins), chunk_size)]
+    if not chunks:
+        chunks = [_chunk_invariants(backbone, dsb_partner, rejoins, names)]
+    return {name: np.concatenate([chunk[name] for chunk in chunks])
+                for name in names}
+
+
+def plain_values(column):
+    """
+    Convert the values of an invariant to plain Python values, e.g., to count
+    them.
+
+    Parameters
+    ----------
+    column : numpy.ndarray
+        Values computed by :func:`rejoin_invariants`.
+
+    Returns
+    -------
+    list
+        The values, with finite diameters and girths as ints.
+    """
+    return [int(value) if isinstance(value, float) and value.is_integer()
+                else value for value in column.tolist()]
+
+
+def _chunk_invariants(backbone, dsb_partner, rejoins, names):
+    """
+    Helper function to compute the invariants of one chunk of AMGs.
+    """
+    results = {}
+    if {'diameter', 'girth', 'is_connected'}.intersection(names):
+        adjacency = _adjacency(backbone, rejoins, len(dsb_partner))
+        distances = _distances(adjacency)
+        connected = (distances >= 0).all(axis=(1, 2))
+        results['is_connected'] = connected
+        results['diameter'] = np.where(
+            connected, distances.max(axis=(1, 2), initial=0), np.inf)
+        if 'girth' in names:
+            results['girth'] = _girths(adjacency, distances)
+    if {'num_cycles', 'cycle_structure'}.intersection(names):
+        counts = _cycle_counts(dsb_partner, rejoins)
+        results['num_cycles'] = counts.sum(axis=1)
+        if 'cycle_structure' in names:
+            results['cycle_structure'] = _cycle_labels(counts)
+    return {name: results[name] for name in names}
+
+
+def _adjacency(backbone, rejoins, num_vertices):
+    """
+    Helper function to build the adjacency matrices of a chunk of AMGs.
+
+    Returns
+    -------
+    numpy.ndarray
+        Of shape ``(n, V, V)``; entry ``[i, u, v]`` tells whether ``u`` and
+        ``v`` are adjacent in AMG ``i``.
+    """
+    adjacency = np.zeros((len(rejoins), num_vertices, num_vertices),
+                         dtype=bool)
+    adjacency[:, backbone[:, 0], backbone[:, 1]] = True
+    adjacency[:, backbone[:, 1], backbone[:, 0]] = True
+    rows = np.arange(len(rejoins))[:, None]
+    adjacency[rows, rejoins[..., 0], rejoins[..., 1]] = True
+    adjacency[rows, rejoins[..., 1], rejoins[..., 0]] = True
+    return adjacency
+
+
+def _distances(adjacency):
+    """
+    Helper function to compute all distances in a chunk of AMGs by a
+    breadth-first search from every vertex, one level at a time.
+
+    Returns
+    -------
+    numpy.ndarray
+        Of shape ``(n, V, V)``; entry ``[i, u, v]`` is the distance between
+        ``u`` and ``v`` in AMG ``i``, or -1 if they are not connected.
+    """
+    n, num_vertices, _ = adjacency.shape
+    weights = adjacency.astype(np.float32)
+    frontier = np.broadcast_to(np.eye(num_vertices, dtype=bool),
+                               adjacency.shape).copy()
+    reached = frontier.copy()
+    distances = np.where(frontier, 0, -1).astype(np.int32)
+    level = 0
+    while frontier.any():
+        level += 1
+        frontier = (frontier.astype(np.float32) @ weights > 0) & ~reached
+        reached |= frontier
+        distances[frontier] = level
+    return distances
+
+
+def _girths(adjacency, distances):
+    """
+    Helper function to compute the girths of a chunk of AMGs from their
+    distances.
+
+    For every root vertex, an edge between two vertices at distance ``d``
+    closes a cycle of length at most ``2d+1``, and a vertex at distance ``d``
+    with two neighbors at distance ``d-1`` closes one of length at most
+    ``2d``. For a root on a shortest cycle, one of the two bounds is attained.
+
+    Returns
+    -------
+    numpy.ndarray
+        The girth of every AMG, ``numpy.inf`` if it has no cycles.
+    """
+    near = distances[:, :, :, None]
+    far = distances[:, :, None, :]
+    edges = adjacency[:, None, :, :] & (near >= 0)
+    odd = np.where(edges & (near == far), 2*near+1, np.iinfo(np.int32).max)
+    parents = (edges & (near == far-1)).sum(axis=2)
+    even = np.where(parents >= 2, 2*distances, np.iinfo(np.int32).max)
+    girths = np.minimum(odd.min(axis=(1, 2, 3), initial=np.iinfo(np.int32).max),
+                        even.min(axis=(1, 2), initial=np.iinfo(np.int32).max))
+    return np.where(girths == np.iinfo(np.int32).max, np.inf,
+                    girths.astype(float))
+
+
+def _cycle_counts(dsb_partner, rejoins):
+    """
+    Helper function to count the cycles of the graphs of DSB and rejoin edges
+    of a chunk of AMGs by walking partners.
+
+    Following the DSB edge and then the rejoin edge of a vertex is a
+    permutation of the vertices in cycles, with an absorbing sink for vertices
+    without such edges. An orbit of size ``k > 1`` is half of a cycle of
+    length ``2k``, while an orbit of size 1 is a rejoin edge coinciding with
+    its DSB edge, which is not a cycle of the graph.
+
+    Returns
+    -------
+    numpy.ndarray
+        Of shape ``(n, V+1)``; entry ``[i, l]`` is the number of cycles of
+        length ``l`` in AMG ``i``.
+    """
+    n, num_vertices = len(rejoins), len(dsb_partner)
+    sink = num_vertices
+    partner = np.full((n, num_vertices+1), sink, dtype=np.int64)
+    rows = np.arange(n)[:, None]
+    partner[rows, rejoins[..., 0]] = rejoins[..., 1]
+    partner[rows, rejoins[..., 1]] = rejoins[..., 0]
+    step = np.append(np.where(dsb_partner >= 0, dsb_partner, sink), sink)
+    step = partner[:, step]
+    start = np.arange(num_vertices+1)
+    current = np.broadcast_to(start, step.shape)
+    orbit = np.zeros(step.shape, dtype=np.int64)
+    for size in range(1, num_vertices//2+1):
+        current = np.take_along_axis(step, current, axis=1)
+        orbit[(current == start) & (orbit == 0)] = size
+    lengths = np.where(orbit > 1, 2*orbit, 0)[:, :num_vertices]
+    keys = (rows*(num_vertices+1) + lengths)[lengths > 0]
+    vertices = np.bincount(keys, minlength=n*(num_vertices+1)) \
+                 .reshape(n, num_vertices+1)
+    return vertices // np.maximum(np.arange(num_vertices+1), 1)
+
+
+def _cycle_labels(counts):
+    """
+    Helper function to label the cycle structures given by cycle counts, once
+    per distinct structure.
+    """
+    labels = np.empty(len(counts), dtype=object)
+    structures, inverse = np.unique(counts, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for i, structure in enumerate(structures):
+        labels[inverse == i] = cycle_structure_label(Counter(
+            {length: int(count) for length, count in enumerate(structure)
+                 if count}))
+    return labels.astype(str)
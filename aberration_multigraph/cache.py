@@ -0,0 +1,303 @@
+"""
+A persistent cache for statistics over collections of aberration multigraphs.
+
+Summaries such as the number of AMGs with a DSB distribution, or the cycle
+structures and diameters of all completions of an incomplete AMG, only depend
+on the backbone, the fixed rejoin edges and the constraints on completions.
+This module stores them in a single SQLite file keyed by a fingerprint of these
+inputs, so repeated analyses return without enumerating anything.
+
+Fingerprints are canonical: vertices are replaced by their rank among all
+vertices and all edges are sorted, so the same problem built twice, or with
+relabeled vertices in the same order, has the same fingerprint. They also
+include ``CACHE_VERSION``, so results computed by older code are never reused. Values are
+stored as JSON. The file is bounded in size; when it outgrows its limit, the
+least recently used results are evicted.
+
+The analysis methods consult the default cache, which is disabled unless the
+``AMG_CACHE`` environment variable names a cache file or a cache is set with
+:func:`set_default_cache`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from collections import Counter
+
+MAX_BYTES = 1 << 28
+
+# Bump whenever the meaning or format of a cached result changes.
+CACHE_VERSION = 3
+
+# Results are stamped with a counter rather than a clock, so that the order of
+# use is strict even across processes sharing the file.
+_NEXT_USE = '(SELECT COALESCE(MAX(used), 0)+1 FROM results)'
+
+_default = None
+
+
+class ResultCache:
+    """
+    A size-bounded, least recently used cache of JSON values in a SQLite file.
+
+    Attributes
+    ----------
+    filename : str
+        The SQLite file.
+    max_bytes : int
+        The maximum total size of the stored values.
+    """
+    def __init__(self, filename, max_bytes=MAX_BYTES):
+        """
+        Parameters
+        ----------
+        filename : str
+            The SQLite file, created if it does not exist.
+        max_bytes : int, optional
+            The maximum total size of the stored values, by default 256 MiB.
+        """
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self._connection = sqlite3.connect(filename)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, '
+                'value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'used INTEGER NOT NULL)')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            # The total size of the values, kept up to date by every change
+            # so that inserting does not scan the table.
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS total (bytes INTEGER NOT NULL)')
+            self._connection.execute(
+                'INSERT INTO total SELECT COALESCE(SUM(size), 0) FROM results '
+                'WHERE NOT EXISTS (SELECT 1 FROM total)')
+
+    def get(self, key):
+        """
+        Look up a result and mark it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            A fingerprint, see :func:`fingerprint`.
+
+        Returns
+        -------
+        object
+            The stored JSON value, or None if the key is not cached.
+        """
+        row = self._connection.execute(
+            'SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self._connection:
+            self._connection.execute(
+                f'UPDATE results SET used = {_NEXT_USE} WHERE key = ?', (key,))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """
+        Store a result, evicting the least recently used ones if the cache
+        outgrows ``max_bytes``.
+
+        Parameters
+        ----------
+        key : str
+            A fingerprint, see :func:`fingerprint`.
+        value : object
+            A JSON-serializable value.
+        """
+        encoded = json.dumps(value)
+        with self._connection:
+            old = self._connection.execute(
+                'SELECT size FROM results WHERE key = ?', (key,)).fetchone()
+            self._connection.execute(
+                f'INSERT OR REPLACE INTO results VALUES (?, ?, ?, {_NEXT_USE})',
+                (key, encoded, len(encoded)))
+            self._add_bytes(len(encoded)-(old[0] if old else 0))
+            excess = self.size()-self.max_bytes
+            rows = self._connection.execute(
+                'SELECT key, size FROM results ORDER BY used') \
+                if excess > 0 else ()
+            evicted, freed = [], 0
+            for old_key, size in rows:
+                if excess <= 0:
+                    break
+                evicted.append((old_key,))
+                excess -= size
+                freed += size
+            self._connection.executemany('DELETE FROM results WHERE key = ?',
+                                         evicted)
+            self._add_bytes(-freed)
+
+    def memoize(self, key, compute):
+        """
+        Look up a result, computing and storing it on a miss.
+
+        Parameters
+        ----------
+        key : str
+            A fingerprint, see :func:`fingerprint`.
+        compute : callable
+            Computes the JSON-serializable value without arguments.
+
+        Returns
+        -------
+        object
+            The stored or computed value.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+            value = json.loads(json.dumps(value))
+        return value
+
+    def size(self):
+        """
+        The total size of the stored values in bytes.
+        """
+        return self._connection.execute('SELECT bytes FROM total').fetchone()[0]
+
+    def clear(self):
+        """
+        Remove all results.
+        """
+        with self._connection:
+            self._connection.execute('DELETE FROM results')
+            self._connection.execute('UPDATE total SET bytes = 0')
+
+    def _add_bytes(self, change):
+        """
+        Helper function to update the total size of the values.
+        """
+        self._connection.execute('UPDATE total SET bytes = bytes + ?',
+                                 (change,))
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self):
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connection.execute(
+            'SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+
+def default_cache():
+    """
+    The cache consulted by the analysis methods.
+
+    Returns
+    -------
+    ResultCache or None
+        The cache set with :func:`set_default_cache`, else a cache in the file
+        named by the ``AMG_CACHE`` environment variable, if any.
+    """
+    global _default
+    if _default is None and os.environ.get('AMG_CACHE'):
+        _default = ResultCache(os.environ['AMG_CACHE'])
+    return _default
+
+
+def set_default_cache(cache):
+    """
+    Set the cache consulted by the analysis methods.
+
+    Parameters
+    ----------
+    cache : ResultCache or None
+        The new default cache, or None to fall back on ``AMG_CACHE``.
+    """
+    global _default
+    _default = cache
+
+
+def memoize(key, compute, cache=None):
+    """
+    Look up a result in a cache, computing and storing it on a miss.
+
+    Parameters
+    ----------
+    key : str
+        A fingerprint, see :func:`fingerprint`.
+    compute : callable
+        Computes the JSON-serializable value without arguments.
+    cache : ResultCache or bool, optional
+        The cache to consult, by default the default cache. ``False`` always
+        computes the value.
+
+    Returns
+    -------
+    object
+        The stored or computed value, as it reads back from JSON.
+    """
+    if cache is None:
+        cache = default_cache()
+    if cache is None or cache is False:
+        return json.loads(json.dumps(compute()))
+    return cache.memoize(key, compute)
+
+
+def fingerprint(kind, chromatins, dsbs, rejoins=(), forbidden=(),
+                capacities=None):
+    """
+    Compute the canonical fingerprint of an AMG problem.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of result, e.g., ``'summary'``.
+    chromatins, dsbs, rejoins : iterable of tuple
+        The edges of the backbone and the fixed rejoin edges.
+    forbidden : iterable of tuple, optional
+        Pairs of vertices that may not be rejoined, by default none.
+    capacities : dict, optional
+        Maps groups of vertices to capacities, by default none.
+
+    Returns
+    -------
+    str
+        A SHA-256 hex digest, which also depends on ``CACHE_VERSION``.
+    """
+    capacities = capacities or {}
+    vertices = {v for edges in (chromatins, dsbs, rejoins, forbidden)
+                    for edge in edges for v in edge}
+    vertices.update(v for group in capacities for v in group)
+    rank = {v: i for i, v in enumerate(sorted(vertices))}
+
+    def edges(pairs):
+        return sorted(sorted(rank[v] for v in pair) for pair in pairs)
+
+    problem = [CACHE_VERSION, kind, edges(chromatins), edges(dsbs), edges(rejoins),
+               edges(forbidden),
+               sorted([sorted(rank[v] for v in group), capacity]
+                        for group, capacity in capacities.items())]
+    return hashlib.sha256(json.dumps(problem).encode()).hexdigest()
+
+
+def pack(counter):
+    """
+    Convert a Counter to a JSON-serializable list of pairs, keeping its order.
+    """
+    return [[key, count] for key, count in counter.items()]
+
+
+def unpack(pairs):
+    """
+    Convert pairs written by :func:`pack` and read from JSON back to a Counter,
+    turning lists back into tuples.
+    """
+    return Counter({_key(key): count for key, count in pairs})
+
+
+def _key(key):
+    """
+    Helper function to restore a key decoded from JSON.
+    """
+    return tuple(_key(k) for k in key) if isinstance(key, list) else key
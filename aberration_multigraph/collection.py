@@ -0,0 +1,474 @@
+"""
+A NumPy-backed container for many aberration multigraphs (AMGs) on one
+backbone.
+
+Analyses over all completions of an incomplete AMG, or over all AMGs with a DSB
+distribution, only vary the rejoin edges. :class:`AMGCollection` stores the
+backbone once and the rejoin edges of ``N`` AMGs as an ``(N, R, 2)`` array of
+vertex indices, so that selecting, grouping and comparing AMGs are array
+operations. Invariants such as the diameter are computed once per collection
+by the batched kernels of :mod:`aberration_multigraph.batch` and kept as
+columns, and AMG objects are only built when an AMG is read.
+
+Collections are saved in the single-file format of
+:mod:`aberration_multigraph.store` and can be read back memory-mapped.
+"""
+
+import numpy as np
+from aberration_multigraph.amg import AberrationMultigraph
+from aberration_multigraph.batch import CHUNK_SIZE, rejoin_invariants
+from aberration_multigraph.store import _label, open_arrays, write_arrays
+
+
+class AMGCollection:
+    """
+    A collection of AMGs sharing one backbone.
+
+    The rejoin edges of every AMG are stored in a canonical order: the vertex
+    indices of every edge are sorted, and so are the edges of every AMG. Two
+    AMGs are thus equal if and only if their rows of ``rejoins`` are.
+
+    Attributes
+    ----------
+    chromatins : tuple
+        Chromatin edges of the backbone.
+    dsbs : tuple
+        DSB edges of the backbone.
+    vertices : list
+        Vertex labels ordered by index.
+    rejoins : numpy.ndarray
+        Rejoin edges of all AMGs as vertex indices, of shape ``(N, R, 2)``.
+    names : numpy.ndarray
+        Names of all AMGs.
+    """
+    def __init__(self, chromatins, dsbs, rejoins, names=None, vertices=None):
+        """
+        Parameters
+        ----------
+        chromatins, dsbs : iterable of tuple
+            The backbone.
+        rejoins : array_like
+            Rejoin edges of all AMGs as indices into ``vertices``, of shape
+            ``(N, R, 2)``.
+        names : array_like, optional
+            Names of all AMGs, by default their positions.
+        vertices : list, optional
+            Vertex labels ordered by index, by default the sorted vertices of
+            the backbone.
+        """
+        self.chromatins = tuple(sorted(tuple(sorted(edge))
+                                           for edge in chromatins))
+        self.dsbs = tuple(sorted(tuple(sorted(edge)) for edge in dsbs))
+        self.vertices = list(_vertices(self.chromatins, self.dsbs)
+                                 if vertices is None else vertices)
+        self.rejoins = _canonical(np.asarray(rejoins), len(self.vertices))
+        if names is None:
+            names = np.arange(len(self.rejoins)).astype(str)
+        self.names = np.asarray(names, dtype=str)
+        if self.names.shape != (len(self.rejoins),):
+            raise ValueError('There must be one name per AMG!')
+        self._columns = {}
+        self._partners = None
+        self._hashes = None
+
+    @classmethod
+    def from_amgs(cls, amgs):
+        """
+        Collect AMGs sharing one backbone.
+
+        Parameters
+        ----------
+        amgs : iterable of AberrationMultigraph
+            AMGs with identical chromatin and DSB edges and the same number
+             of rejoin edges.
+
+        Returns
+        -------
+        AMGCollection
+            The collection of the AMGs, keeping their names.
+        """
+        amgs = list(amgs)
+        if not amgs:
+            raise ValueError('Cannot collect an empty collection of AMGs!')
+        first = amgs[0]
+        for amg in amgs:
+            if (amg.chromatins != first.chromatins or amg.dsbs != first.dsbs
+                    or len(amg.rejoins) != len(first.rejoins)):
+                raise ValueError('AMGs do not share a backbone!')
+        return cls.from_completions(first.chromatins, first.dsbs,
+                                    (amg.rejoins for amg in amgs),
+                                    names=[amg.name for amg in amgs])
+
+    @classmethod
+    def from_completions(cls, chromatins, dsbs, completions, rejoins=(),
+                         names=None, name='', start=0):
+        """
+        Collect the completions of an enumeration of rejoin edges.
+
+        Parameters
+        ----------
+        chromatins, dsbs : iterable of tuple
+            The backbone.
+        completions : iterable of list of tuple
+            The new rejoin edges of every AMG, e.g., from
+            :meth:`ReducedIAMG.complete_rejoins`.
+        rejoins : iterable of tuple, optional
+            Rejoin edges shared by all AMGs, by default none.
+        names : list of str, optional
+            Names of all AMGs, by default ``name+str(start+i)`` for AMG ``i``.
+        name : str, optional
+            The prefix of the default names, by default ''.
+        start : int, optional
+            The number in the default name of the first AMG, by default 0.
+
+        Returns
+        -------
+        AMGCollection
+            The collection of the AMGs.
+        """
+        chromatins, dsbs = list(chromatins), list(dsbs)
+        vertices = _vertices(chromatins, dsbs)
+        index = {v: i for i, v in enumerate(vertices)}
+        fixed = [(index[u], index[v]) for u, v in rejoins]
+        rows = [fixed+[(index[u], index[v]) for u, v in completion]
+                    for completion in completions]
+        size = len(rows[0]) if rows else len(fixed)
+        if any(len(row) != size for row in rows):
+            raise ValueError('AMGs must have the same number of rejoin edges!')
+        if names is None:
+            names = [name+str(start+i) for i in range(len(rows))]
+        return cls(chromatins, dsbs,
+                   np.array(rows, dtype=_index_dtype(len(index)))
+                       .reshape(len(rows), size, 2),
+                   names, vertices)
+
+    @classmethod
+    def from_partners(cls, chromatins, dsbs, partners, names=None,
+                      vertices=None):
+        """
+        Collect AMGs given by partner arrays, see :attr:`partners`.
+
+        Parameters
+        ----------
+        chromatins, dsbs : iterable of tuple
+            The backbone.
+        partners : array_like
+            Of shape ``(N, V)``; entry ``[i, v]`` is the index of the vertex
+            rejoined to vertex ``v`` in AMG ``i``, or -1 if there is none.
+        names : array_like, optional
+            Names of all AMGs, by default their positions.
+        vertices : list, optional
+            Vertex labels ordered by index, by default the sorted vertices of
+            the backbone.
+
+        Returns
+        -------
+        AMGCollection
+            The collection of the AMGs.
+        """
+        partners = np.asarray(partners)
+        lower = partners > np.arange(partners.shape[1])
+        counts = lower.sum(axis=1)
+        if len(counts) and (counts != counts[0]).any():
+            raise ValueError('AMGs must have the same number of rejoin edges!')
+        size = int(counts[0]) if len(counts) else 0
+        rows, first = np.nonzero(lower)
+        rejoins = np.stack([first, partners[rows, first]], axis=-1)
+        return cls(chromatins, dsbs, rejoins.reshape(len(partners), size, 2),
+                   names, vertices)
+
+    @property
+    def partners(self):
+        """
+        The rejoin edges of all AMGs as an ``(N, V)`` partner array.
+
+        Entry ``[i, v]`` is the index of the vertex rejoined to vertex ``v`` in
+        AMG ``i``, or -1 if there is none.
+        """
+        if self._partners is None:
+            partners = np.full((len(self), len(self.vertices)), -1,
+                               dtype=np.int64)
+            rows = np.arange(len(self))[:, None]
+            partners[rows, self.rejoins[..., 0]] = self.rejoins[..., 1]
+            partners[rows, self.rejoins[..., 1]] = self.rejoins[..., 0]
+            self._partners = partners
+        return self._partners
+
+    def __len__(self):
+        return len(self.rejoins)
+
+    def __getitem__(self, key):
+        """
+        Read one AMG, or select several.
+
+        Parameters
+        ----------
+        key : int, slice or array_like
+            The position of an AMG, or a slice, boolean mask or positions
+            selecting several AMGs.
+
+        Returns
+        -------
+        AberrationMultigraph or AMGCollection
+            The AMG at an int position, else the collection of selected AMGs.
+        """
+        if isinstance(key, (int, np.integer)):
+            return AberrationMultigraph(
+                self.chromatins, self.dsbs,
+                [(self.vertices[u], self.vertices[v])
+                    for u, v in self.rejoins[key].tolist()],
+                str(self.names[key]))
+        return self._select(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def invariant(self, name):
+        """
+        The values of an invariant for all AMGs, computed once.
+
+        Parameters
+        ----------
+        name : str
+            One of :data:`aberration_multigraph.batch.INVARIANTS`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The value for every AMG, see
+            :func:`~aberration_multigraph.batch.rejoin_invariants`.
+        """
+        self._compute([name])
+        return self._columns[name]
+
+    def _compute(self, names):
+        """
+        Helper function to compute the missing columns of several invariants
+        in one batched pass.
+        """
+        missing = [name for name in names if name not in self._columns]
+        if missing:
+            self._columns.update(rejoin_invariants(
+                self.chromatins, self.dsbs, self.rejoins, missing,
+                self.vertices, CHUNK_SIZE))
+
+    def filter(self, mask=None, **invariants):
+        """
+        Select the AMGs satisfying all given conditions.
+
+        Parameters
+        ----------
+        mask : array_like of bool, optional
+            Selects AMGs by position, by default all.
+        **invariants
+            Select AMGs with the given values of invariants, e.g.,
+            ``diameter=5``.
+
+        Returns
+        -------
+        AMGCollection
+            The collection of selected AMGs, in their order in this one.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if mask is not None:
+            selected &= np.asarray(mask, dtype=bool)
+        self._compute(invariants)
+        for name, value in invariants.items():
+            selected &= self.invariant(name) == value
+        return self._select(selected)
+
+    def group_by(self, name):
+        """
+        Partition the AMGs by the value of an invariant.
+
+        Parameters
+        ----------
+        name : str
+            One of :data:`aberration_multigraph.batch.INVARIANTS`.
+
+        Returns
+        -------
+        dict
+            Maps every value of the invariant to the collection of AMGs with
+            that value, in sorted order of the values.
+        """
+        values, inverse = np.unique(self.invariant(name), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        return {value.item(): self._select(inverse == i)
+                    for i, value in enumerate(values)}
+
+    def intersection(self, other):
+        """
+        Select the AMGs also in another collection on the same backbone.
+
+        Parameters
+        ----------
+        other : AMGCollection
+            A collection with the same chromatin and DSB edges.
+
+        Returns
+        -------
+        AMGCollection
+            The AMGs of this collection that are in ``other``.
+        """
+        return self._select(np.isin(self._keys(), other._keys(self)))
+
+    def difference(self, other):
+        """
+        Select the AMGs not in another collection on the same backbone.
+
+        Parameters
+        ----------
+        other : AMGCollection
+            A collection with the same chromatin and DSB edges.
+
+        Returns
+        -------
+        AMGCollection
+            The AMGs of this collection that are not in ``other``.
+        """
+        return self._select(~np.isin(self._keys(), other._keys(self)))
+
+    def save(self, filename):
+        """
+        Save the collection, with its computed invariants, to a store file.
+
+        The file is also readable with
+        :class:`~aberration_multigraph.store.AMGStore`. Vertex labels must be
+        JSON-serializable.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+        """
+        arrays = {'rejoins': self.rejoins.astype(
+                                _index_dtype(len(self.vertices))),
+                  'names': self.names}
+        arrays.update({'invariant_'+name: column
+                          for name, column in self._columns.items()})
+        index = {v: i for i, v in enumerate(self.vertices)}
+        attrs = {'vertices': self.vertices,
+                 'chromatins': [[index[u], index[v]]
+                                    for u, v in self.chromatins],
+                 'dsbs': [[index[u], index[v]] for u, v in self.dsbs]}
+        write_arrays(filename, arrays, attrs)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a collection saved with :meth:`save` or
+        :meth:`AMGStore.write`.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+
+        Returns
+        -------
+        AMGCollection
+            The stored collection, with its saved invariants.
+        """
+        arrays, attrs = open_arrays(filename)
+        vertices = [_label(v) for v in attrs['vertices']]
+        collection = cls([[vertices[i] for i in edge]
+                              for edge in attrs['chromatins']],
+                         [[vertices[i] for i in edge]
+                              for edge in attrs['dsbs']],
+                         arrays['rejoins'], arrays['names'], vertices)
+        for name, array in arrays.items():
+            if name.startswith('invariant_'):
+                collection._columns[name[len('invariant_'):]] = np.array(array)
+        return collection
+
+    def _select(self, key):
+        """
+        Helper function to build the collection of the AMGs selected by a
+        slice, boolean mask or positions, keeping the computed invariants.
+        """
+        collection = AMGCollection.__new__(AMGCollection)
+        collection.chromatins = self.chromatins
+        collection.dsbs = self.dsbs
+        collection.vertices = self.vertices
+        collection.rejoins = self.rejoins[key]
+        collection.names = self.names[key]
+        collection._columns = {name: column[key]
+                                   for name, column in self._columns.items()}
+        collection._partners = None
+        collection._hashes = None
+        return collection
+
+    def _keys(self, like=None):
+        """
+        Helper function to compute one comparable key per AMG, the raw bytes
+        of its rejoin edges.
+
+        Parameters
+        ----------
+        like : AMGCollection, optional
+            Compute the keys with the vertex indices of this collection, on the
+            same backbone, by default with the own ones.
+        """
+        if like is not None and (like.chromatins, like.dsbs) != \
+                (self.chromatins, self.dsbs):
+            raise ValueError('Collections do not share a backbone!')
+        if like is None or like.vertices == self.vertices:
+            if self._hashes is None:
+                self._hashes = _row_keys(self.rejoins)
+            return self._hashes
+        index = {v: i for i, v in enumerate(like.vertices)}
+        relabel = np.array([index[v] for v in self.vertices])
+        return _row_keys(_canonical(relabel[self.rejoins], len(index)))
+
+
+def _canonical(rejoins, num_vertices):
+    """
+    Helper function to sort the vertices of every rejoin edge and the rejoin
+    edges of every AMG.
+
+    Parameters
+    ----------
+    rejoins : numpy.ndarray
+        Rejoin edges of all AMGs as vertex indices, of shape ``(N, R, 2)``.
+    num_vertices : int
+        The number of vertices.
+
+    Returns
+    -------
+    numpy.ndarray
+        The rejoin edges in canonical order.
+    """
+    if rejoins.ndim != 3 or rejoins.shape[-1] != 2:
+        raise ValueError('Rejoin edges must be of shape (N, R, 2)!')
+    rejoins = np.sort(rejoins, axis=-1)
+    order = np.argsort(rejoins[..., 0].astype(np.int64)*num_vertices
+                       + rejoins[..., 1], axis=1)
+    return np.take_along_axis(rejoins, order[..., None], axis=1)
+
+
+def _row_keys(rejoins):
+    """
+    Helper function to view the rejoin edges of every AMG as one raw bytes
+    value, so that AMGs are compared and sorted as scalars.
+    """
+    rows = np.ascontiguousarray(rejoins, dtype=np.int64) \
+             .reshape(len(rejoins), 2*rejoins.shape[1])
+    return rows.view(np.dtype((np.void, rows.itemsize*rows.shape[1]))) \
+               .reshape(-1)
+
+
+def _vertices(chromatins, dsbs):
+    """
+    Helper function to list the vertices of a backbone in sorted order.
+    """
+    return sorted({v for edges in (chromatins, dsbs)
+                       for edge in edges for v in edge})
+
+
+def _index_dtype(num_vertices):
+    """
+    Helper function to choose the smallest unsigned dtype for vertex indices.
+    """
+    return np.uint16 if num_vertices <= 1 << 16 else np.uint32
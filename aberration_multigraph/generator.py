@@ -16,9 +16,24 @@ Due to the combinatorial explosion in the number of perfect matchings, this
 implementation is intended for small instances and exploratory use.
 """
 
+import csv
+import gzip
 import heapq as hq
+import itertools
+from aberration_multigraph.aggregate import (Histogram, aggregate_batches,
+                                             cycle_structure)
 from aberration_multigraph.amg import AberrationMultigraph
-from collections import defaultdict
+from aberration_multigraph.batch import CHUNK_SIZE
+from aberration_multigraph.cache import fingerprint, memoize, pack, unpack
+from aberration_multigraph.collection import AMGCollection
+from aberration_multigraph.incomplete_amg import IncompleteAMG
+from aberration_multigraph.store import AMGSequenceStore, KEYFRAME_INTERVAL
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+REPORT_COLUMNS = ('rank', 'rejoins', 'diameter', 'cycle_structure', 'cycles')
+
 
 class AMGGenerator:
     """
@@ -83,33 +98,117 @@ class AMGGenerator:
         ------------
         Resets and updates ``self.amg_counter``.
         """
+        self.amg_counter = 0
+        return self._gen_amgs()
+
+    def collection(self):
+        """
+        Collect all generated AMGs without building them.
+
+        Returns
+        -------
+        AMGCollection
+            The AMGs of :meth:`generate_amgs`, in the same order and with the
+            same names.
+
+        Side Effects
+        ------------
+        Sets ``self.amg_counter`` to the number of AMGs.
+        """
+        amgs = AMGCollection.from_completions(self.chromatins, self.dsbs,
+                                              self._connected_rejoins())
+        self.amg_counter = len(amgs)
+        return amgs
+
+    def save_amgs(self, filename, keyframe=KEYFRAME_INTERVAL):
+        """
+        Write all generated AMGs to a delta-encoded store file.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file, read back with
+            :class:`~aberration_multigraph.store.AMGSequenceStore`.
+        keyframe : int, optional
+            Store every ``keyframe``-th AMG in full, by default
+            ``KEYFRAME_INTERVAL``.
+
+        Returns
+        -------
+        int
+            The number of AMGs written.
+
+        Side Effects
+        ------------
+        Sets ``self.amg_counter`` to the number of AMGs.
+        """
+        self.amg_counter = AMGSequenceStore.write(
+            filename, self.chromatins, self.dsbs, self._connected_rejoins(),
+            keyframe=keyframe)
+        return self.amg_counter
+
+    def _gen_amgs(self):
+        """
+        Build the AMGs of :meth:`_connected_rejoins`, numbered from 0.
+        """
+        for rejoins in self._connected_rejoins():
+            amg = AberrationMultigraph(self.chromatins,
+                                       self.dsbs,
+                                       rejoins,
+                                       str(self.amg_counter))
+            self.amg_counter += 1
+            yield amg
+
+    def _connected_rejoins(self):
+        """
+        Generate the rejoin edges of all connected AMGs, in the order of
+        :meth:`generate_amgs`, without building the AMGs.
+
+        Connectivity is checked on the reduced incomplete AMG without rejoin
+        edges, see :class:`~aberration_multigraph.incomplete_amg.ReducedIAMG`.
+        """
         dsb_vertices = set(u for u,_ in self.dsbs).union(set(v for _,v in self.dsbs))
         free_vertices = [(len(dsb_vertices)-2, i) for i in dsb_vertices]
-        self.amg_counter = 0
         hq.heapify(free_vertices)
-        return self._gen_rejoins([], free_vertices)
+        reduced = IncompleteAMG(self.chromatins, self.dsbs, []).reduce()
+        for rejoins in self._gen_rejoins([], free_vertices):
+            if reduced.is_connected(rejoins):
+                yield rejoins
 
-    def count_amgs(self):
+    def count_amgs(self, cache=None):
         """
         Count the number of AMGs with this DSB distribution.
 
+        The AMGs are counted on the reduced incomplete AMG without rejoin
+        edges, without constructing them, and the count is looked up in and
+        stored to the result cache.
+
+        Parameters
+        ----------
+        cache : ResultCache or bool, optional
+            The result cache, by default
+            :func:`~aberration_multigraph.cache.default_cache`. ``False``
+            always counts.
+
         Returns
         -------
         int
             Number of AMGs.
-
-        Notes
-        -----
-        This method is currently a placeholder. Counting is performed implicitly
-        during generation.
         """
-        self.amg_counter = 0
-        # TODO: count the AMGs without constructing them.
+        def count():
+            if not self.dsbs:
+                return 0
+            reduced = IncompleteAMG(self.chromatins, self.dsbs, []).reduce()
+            return sum(reduced.is_connected(rejoins)
+                       for rejoins in reduced.complete_rejoins())
+
+        key = self._fingerprint('count')
+        self.amg_counter = memoize(key, count, cache)
         return self.amg_counter
 
     def _gen_rejoins(self, rejoins, free_verts):
         """
-        Recursively enumerate all valid rejoin matchings.
+        Recursively enumerate all valid rejoin matchings, connected or not.
 
         Parameters
         ----------
@@ -121,25 +220,20 @@ class AMGGenerator:
 
         Yields
         ------
-        AberrationMultigraph
-            A connected AMG obtained by completing the current partial matching.
+        list of tuple
+            The rejoin edges of a perfect matching completing the current
+            partial matching.
         """
         if len(free_verts) == 0:
             return
         _, v = hq.heappop(free_verts)
         # Base case: if there is only one unmatched vertex left,
-        #  pair it to this vertex and generate an AMG.
+        #  pair it to this vertex.
         if len(free_verts) == 1:
             _, u = hq.heappop(free_verts)
-            amg = AberrationMultigraph(self.chromatins,
-                                        self.dsbs,
-                                        rejoins+[(v, u)],
-                                        str(self.amg_counter))
-            if amg.is_connected():
-                self.amg_counter += 1
-                yield amg
-        # Else, pair this vertex with all remaining vertices and generate AMGs
-        #  recursively.
+            yield rejoins+[(v, u)]
+        # Else, pair this vertex with all remaining vertices and generate
+        #  matchings recursively.
         else:
             for _, w in free_verts:
                 if w != self.dsb_pair[v]:
@@ -218,7 +312,88 @@ class AMGGenerator:
                 edges.append((next(label), next(label)))
         return edges
     
-    def summarize(self):
+    def aggregate(self, reducers):
+        """
+        Compute several statistics over all generated AMGs in a single pass.
+
+        The AMGs are fed to the reducers in collections of ``CHUNK_SIZE``, so
+        histograms of invariants, e.g., ``Histogram('diameter')``, are computed
+        by the batched kernels without building the AMGs.
+
+        Parameters
+        ----------
+        reducers : list of Reducer
+            Reducers from :mod:`aberration_multigraph.aggregate`, e.g.,
+            ``[Histogram('diameter'), JointHistogram('diameter', girth)]``.
+
+        Returns
+        -------
+        dict
+            Maps the name of every reducer to its result.
+
+        Side Effects
+        ------------
+        Sets ``self.amg_counter`` to the number of AMGs.
+        """
+        self.amg_counter = 0
+
+        def batches():
+            for batch in _batches(self._connected_rejoins(), CHUNK_SIZE):
+                amgs = AMGCollection.from_completions(
+                    self.chromatins, self.dsbs, batch, start=self.amg_counter)
+                self.amg_counter += len(amgs)
+                yield amgs
+
+        return aggregate_batches(batches(), reducers)
+
+    def statistics(self, cache=None):
+        """
+        Compute summary statistics over all generated AMGs.
+
+        The statistics are looked up in and stored to the result cache.
+
+        Parameters
+        ----------
+        cache : ResultCache or bool, optional
+            The result cache, by default
+            :func:`~aberration_multigraph.cache.default_cache`. ``False``
+            always generates the AMGs.
+
+        Returns
+        -------
+        dict
+            The number of AMGs under ``'count'``, and Counters of the AMGs by
+            cycle structure label and by diameter under ``'cycle_structures'``
+            and ``'diameters'``.
+        """
+        def compute():
+            results = self.aggregate([
+                Histogram('cycle_structure', 'cycle_structures'),
+                Histogram('diameter', 'diameters')])
+            return {'count': self.amg_counter,
+                    'cycle_structures': pack(results['cycle_structures']),
+                    'diameters': pack(results['diameters'])}
+
+        key = self._fingerprint('statistics')
+        stats = memoize(key, compute, cache)
+        self.amg_counter = stats['count']
+        return {'count': stats['count'],
+                'cycle_structures': unpack(stats['cycle_structures']),
+                'diameters': unpack(stats['diameters'])}
+
+    def _fingerprint(self, kind):
+        """
+        The fingerprint of this DSB distribution in the result cache.
+
+        Permuting the chromosomes does not change any statistic, so the
+        fingerprint is that of the canonical distribution, see
+        :func:`canonical_distribution`.
+        """
+        canonical = canonical_distribution(self.num_dsbs)
+        gen = AMGGenerator(len(canonical), canonical)
+        return fingerprint('generator_'+kind, gen.chromatins, gen.dsbs)
+
+    def summarize(self, cache=None):
         """
         Print summary statistics over all generated AMGs.
 
@@ -226,16 +401,14 @@ class AMGGenerator:
         - Total number of AMGs
         - Distribution by cycle structure
         - Distribution by diameter
+
+        Parameters
+        ----------
+        cache : ResultCache or bool, optional
+            The result cache, see :meth:`statistics`.
         """
-        cycles = defaultdict(int)
-        diameters = defaultdict(int)
-        # girths = defaultdict(int)         # Method not supported by networkx
-        for amg in self.generate_amgs():
-            cs = amg.cycle_structure()
-            s_cs = [f'{i}*{cs[i]}' if cs[i]!=1 else str(i) for i in sorted(cs)]
-            cycles['+'.join(s_cs)] += 1
-            diameters[amg.diameter()] += 1
-            # girths[amg.girth()] += 1
+        stats = self.statistics(cache)
+        cycles, diameters = stats['cycle_structures'], stats['diameters']
         print(f'TOTAL NUMBER OF AMGS: {self.amg_counter}')
         print('\nDISTRIBUTION BY CYCLE STRUCTURE')
         for c in cycles:
@@ -247,36 +420,203 @@ class AMGGenerator:
         # for g in sorted(girths):
         #     print(f'{g}: {girths[g]}')
 
-    def full_report(self, file):
+    def full_report(self, file, workers=None, batch_size=10000,
+                    compress=None, max_pending=None):
         """
-        Write a detailed per-AMG report to a file.
+        Write a CSV report with one row per generated AMG.
+
+        The columns are the rank of the AMG in the order of
+        :meth:`generate_amgs`, its rejoin edges, diameter, cycle structure and
+        cycles. The main process only enumerates rejoin edges; batches of them
+        are sent to worker processes, which build the AMGs and compute their
+        invariants, and the rows are written batch by batch in order.
 
         Parameters
         ----------
         file : str
             Path to the output file.
+        workers : int, optional
+            Number of worker processes, by default one per CPU. With 0, the
+            invariants are computed in the calling process.
+        batch_size : int, optional
+            Number of AMGs per batch, by default 10000.
+        compress : bool, optional
+            Whether to gzip the report, by default if ``file`` ends with
+            ``'.gz'``.
+        max_pending : int, optional
+            Maximum number of batches in flight, by default twice the number
+            of workers.
+
+        Returns
+        -------
+        int
+            The number of AMGs in the report.
+
+        Side Effects
+        ------------
+        Sets ``self.amg_counter`` to the number of AMGs.
         """
-        # TODO: make this a CSV file?
-        with open(file, 'w') as output:
-            output.write("""DIAMETER\t
-                            CYCLE STRUCTURE\t\t
-                            CYCLES\t\t\t
-                            INIT CONFIG\t\t\t\t\t\t
-                            FINAL CONFIG\n""")
-            for amg in self.generate_amgs():
-                diameter = amg.diameter()
-                cs = amg.cycle_structure()
-                cycles = ','.join('('+ ','.join(str(c) for c in cycle)
-                                    + ')' for cycle in amg.cycles())
-                cycle_struct = '+'.join(str(cs[i]) for i in sorted(cs))
-                init_config = ','.join(f'({u},{v})'
-                                       for u,v in amg.init_config().edges)
-                # init_config = amg.init_config()
-                final_config = ','.join(f'({u},{v})'
-                                        for u,v in amg.final_config().edges)
-                # final_config = amg.final_config()
-                output.write(f"""{diameter}\t\t
-                                {cycle_struct}\t\t\t
-                                {cycles}\t\t
-                                {init_config}\t\t
-                                {final_config}\n""")
\ No newline at end of file
+        if compress is None:
+            compress = file.endswith('.gz')
+        output = (gzip.open(file, 'wt', newline='') if compress
+                  else open(file, 'w', newline='', buffering=1 << 20))
+        batches = _batches(self._connected_rejoins(), batch_size)
+        count = 0
+        with output:
+            writer = csv.writer(output)
+            writer.writerow(REPORT_COLUMNS)
+            if workers == 0:
+                for batch in batches:
+                    writer.writerows(_report_rows(self.chromatins, self.dsbs,
+                                                  count, batch))
+                    count += len(batch)
+                self.amg_counter = count
+                return count
+            if max_pending is None:
+                max_pending = 2*(workers or os.cpu_count())
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                for batch in itertools.chain(batches, [None]):
+                    if batch is not None:
+                        pending.append(pool.submit(_report_rows,
+                                                   self.chromatins, self.dsbs,
+                                                   count, batch))
+                        count += len(batch)
+                    while pending and (batch is None
+                                       or len(pending) >= max_pending):
+                        writer.writerows(pending.popleft().result())
+        self.amg_counter = count
+        return count
+
+def canonical_distribution(num_dsbs):
+    """
+    Canonicalize a DSB distribution up to permutations of the chromosomes.
+
+    Parameters
+    ----------
+    num_dsbs : iterable of int
+        The number of DSBs per chromosome.
+
+    Returns
+    -------
+    list of int
+        The numbers of DSBs in decreasing order.
+    """
+    return sorted(num_dsbs, reverse=True)
+
+
+def dsb_distributions(max_dsbs, max_chromosomes=None):
+    """
+    Generate all canonical DSB distributions up to a number of DSBs.
+
+    Every chromosome has at least one DSB, as an AMG with an intact chromosome
+    is not connected. Distributions are generated by increasing number of DSBs,
+    then of chromosomes, so that small problems come first.
+
+    Parameters
+    ----------
+    max_dsbs : int
+        The maximum total number of DSBs.
+    max_chromosomes : int, optional
+        The maximum number of chromosomes, by default ``max_dsbs``.
+
+    Yields
+    ------
+    tuple of int
+        A DSB distribution in decreasing order.
+    """
+    if max_chromosomes is None:
+        max_chromosomes = max_dsbs
+
+    def partitions(total, parts, largest):
+        if parts == 0:
+            if total == 0:
+                yield ()
+            return
+        for first in range(min(total-parts+1, largest), 0, -1):
+            for rest in partitions(total-first, parts-1, first):
+                yield (first,)+rest
+
+    for total in range(1, max_dsbs+1):
+        for parts in range(1, min(total, max_chromosomes)+1):
+            yield from partitions(total, parts, total)
+
+
+def sweep(distributions, cache=None):
+    """
+    Compute the statistics of many DSB distributions.
+
+    Every distribution is canonicalized, and every canonical distribution is
+    generated at most once, by increasing size, with its statistics looked up
+    in and stored to the result cache. Distributions with an intact chromosome
+    have no connected AMGs and are answered without generating anything.
+
+    Parameters
+    ----------
+    distributions : iterable of iterable of int
+        DSB distributions, e.g., from :func:`dsb_distributions`.
+    cache : ResultCache or bool, optional
+        The result cache, see :meth:`AMGGenerator.statistics`.
+
+    Returns
+    -------
+    dict
+        Maps every distribution, as a tuple, to its statistics as returned by
+        :meth:`AMGGenerator.statistics`.
+    """
+    distributions = [tuple(num_dsbs) for num_dsbs in distributions]
+    canonical = {num_dsbs: tuple(canonical_distribution(num_dsbs))
+                    for num_dsbs in distributions}
+    computed = {}
+    for num_dsbs in sorted(set(canonical.values()),
+                           key=lambda d: (sum(d), len(d), d)):
+        if not num_dsbs or num_dsbs[-1] == 0:
+            computed[num_dsbs] = {'count': 0, 'cycle_structures': Counter(),
+                                  'diameters': Counter()}
+        else:
+            gen = AMGGenerator(len(num_dsbs), list(num_dsbs))
+            computed[num_dsbs] = gen.statistics(cache)
+    return {num_dsbs: computed[canonical[num_dsbs]]
+                for num_dsbs in distributions}
+
+
+def _batches(items, size):
+    """
+    Helper function to split an iterable into lists of at most ``size`` items.
+    """
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _report_rows(chromatins, dsbs, start, batch):
+    """
+    Compute the report rows of a batch of AMGs. Runs on the worker processes.
+
+    Parameters
+    ----------
+    chromatins, dsbs : tuple
+        The backbone shared by the AMGs.
+    start : int
+        The rank of the first AMG of the batch.
+    batch : list of list of tuple
+        The rejoin edges of the AMGs.
+
+    Returns
+    -------
+    list of tuple
+        One row per AMG, with the columns ``REPORT_COLUMNS``.
+    """
+    rows = []
+    for rank, rejoins in enumerate(batch, start):
+        amg = AberrationMultigraph(chromatins, dsbs, rejoins)
+        rows.append((rank,
+                     ','.join(f'({u},{v})' for u, v in amg.rejoins),
+                     amg.diameter(),
+                     cycle_structure(amg),
+                     ','.join('('+','.join(str(v) for v in cycle)+')'
+                                for cycle in amg.cycles())))
+    return rows
@@ -16,14 +16,70 @@ An incomplete AMG consists of:
 - A partial set of rejoin edges
 
 and supports basic graph-theoretic queries and extension operations.
+Completions can be restricted, e.g., by copy number data, with forbidden pairs
+of vertices and with capacities on groups of vertices; both are enforced while
+backtracking, so infeasible partial matchings are never extended. Completions
+are counted and enumerated on a reduced instance, in which every fixed
+alternating path of DSB and rejoin edges is contracted into a super-edge
+between its free ends, weighted by its number of DSB edges. Rejoin edges can be
+added and undone in place, updating the reduced instance incrementally.
 
 .. note::
    Incomplete AMGs are intended as intermediate combinatorial objects and are
    not required to satisfy connectivity or completeness constraints.
 """
 
+from aberration_multigraph.aggregate import Histogram, aggregate_batches
 from aberration_multigraph.amg import AberrationMultigraph
+from aberration_multigraph.batch import CHUNK_SIZE
+from aberration_multigraph.cache import fingerprint, memoize, pack, unpack
+from aberration_multigraph.collection import AMGCollection
+from aberration_multigraph.store import AMGSequenceStore, KEYFRAME_INTERVAL
+from collections import Counter, namedtuple
+import bisect
 import heapq as hq
+import itertools
+import networkx as nx
+import numpy as np
+
+OBJECTIVES = ('cycles', 'diameter')
+
+Optimum = namedtuple('Optimum', ['value', 'amg', 'explored', 'pruned'])
+Optimum.__doc__ = """
+The result of :meth:`IncompleteAMG.optimize`.
+
+Parameters
+----------
+value : int or float
+    The optimal number of cycles or diameter, or None if there is no feasible
+    completion. Disconnected completions have infinite diameter.
+amg : AberrationMultigraph
+    A completion attaining the optimum, or None.
+explored : int
+    The number of nodes of the search tree that were visited.
+pruned : int
+    The number of nodes whose subtrees were discarded by a bound.
+"""
+
+InvariantBounds = namedtuple('InvariantBounds',
+                             ['cycles', 'cycle_lengths', 'diameter'])
+InvariantBounds.__doc__ = """
+The result of :meth:`IncompleteAMG.invariant_bounds`.
+
+Every field is a pair ``(low, high)``; the invariant is determined exactly when
+``low == high``.
+
+Parameters
+----------
+cycles : tuple of int
+    The range of the number of cycles.
+cycle_lengths : tuple of int
+    The shortest and longest cycle over all completions, or ``(None, None)``
+    if no completion has a cycle.
+diameter : tuple
+    A lower and an upper bound on the diameter; ``numpy.inf`` stands for
+    disconnected completions.
+"""
 
 class IncompleteAMG(AberrationMultigraph):
     """
@@ -36,8 +92,21 @@ class IncompleteAMG(AberrationMultigraph):
 
     This class is primarily used as an intermediate object during AMG generation
     and backtracking algorithms.
+
+    Attributes
+    ----------
+    free : list
+        Vertices incident to a DSB edge but not to a rejoin edge.
+    count : int or None
+        The number of completions, once counted or enumerated.
+    forbidden : set of frozenset
+        Pairs of vertices that may not be rejoined by a completion.
+    capacities : dict
+        Maps groups of vertices (frozensets) to the maximum number of rejoin
+        edges added by a completion with at least one end in the group.
     """
-    def __init__(self, chromatins, dsbs, rejoins, name=''):
+    def __init__(self, chromatins, dsbs, rejoins, name='', forbidden=(),
+                 capacities=None):
         """
         Initialize an incomplete aberration multigraph.
 
@@ -51,6 +120,12 @@ class IncompleteAMG(AberrationMultigraph):
             Partial set of rejoin edges.
         name : str
             Identifier for the incomplete AMG.
+        forbidden : iterable of tuple, optional
+            Pairs of vertices that may not be rejoined, by default none.
+        capacities : dict, optional
+            Maps iterables of vertices to the maximum number of new rejoin
+            edges incident to them, by default unconstrained. A rejoin edge
+            with both ends in a group counts once.
         """
         super().__init__(chromatins, dsbs, rejoins, name)
         rejoin_verts = set([u for (u,v) in self.rejoins]+
@@ -60,11 +135,150 @@ class IncompleteAMG(AberrationMultigraph):
         self.count = None
         if len(self.free) % 2 != 0:
             raise ValueError('There are an odd number of free vertices!')
+        self.forbidden = {frozenset(pair) for pair in forbidden}
+        self.capacities = {frozenset(group): capacity for group, capacity
+                            in (capacities or {}).items()}
+        self._groups = list(self.capacities)
+        self._vertex_groups = {}
+        for k, group in enumerate(self._groups):
+            for v in group:
+                self._vertex_groups.setdefault(v, []).append(k)
+        self._reduced = None
+        self._history = []
     
+    def reduce(self):
+        """
+        Contract the fixed alternating paths into weighted super-edges.
+
+        Returns
+        -------
+        ReducedIAMG
+            The reduced instance, computed once and cached.
+        """
+        if self._reduced is None:
+            self._reduced = ReducedIAMG(self)
+        return self._reduced
+
+    def add_rejoin(self, v, w):
+        """
+        Fix a rejoin edge between two free vertices in place.
+
+        Only the state touched by the new edge is updated: the graph, the free
+        vertices, the capacities of the vertex groups of ``v`` and ``w``, and
+        the reduced instance with its open paths, closed cycles and connected
+        components (see :meth:`reduce`). Apart from keeping the tuple of rejoin
+        edges sorted, this takes constant time, so what-if analyses over
+        candidate rejoin edges never rebuild the incomplete AMG. The cached
+        count of completions is reset.
+
+        Parameters
+        ----------
+        v, w : hashable
+            Two free vertices that are not the ends of a DSB edge.
+
+        Raises
+        ------
+        ValueError
+            If the vertices are not free, or may not be rejoined.
+
+        See Also
+        --------
+        undo : Remove the rejoin edge added last.
+        """
+        reduced = self.reduce()
+        if v == w or v not in reduced.ends or w not in reduced.ends:
+            raise ValueError(f'{v} and {w} are not two free vertices!')
+        if reduced.is_bare(v, w) or frozenset((v, w)) in self.forbidden:
+            raise ValueError(f'{v} and {w} cannot be rejoined!')
+        touched = set(self._vertex_groups.get(v, ()))
+        touched.update(self._vertex_groups.get(w, ()))
+        for k in touched:
+            self.capacities[self._groups[k]] -= 1
+        edge = tuple(sorted((v, w)))
+        rejoins = list(self.rejoins)
+        bisect.insort(rejoins, edge)
+        self.rejoins = tuple(rejoins)
+        color = self.graph.edges[v, w]['color'] if self.graph.has_edge(v, w) \
+                    else None
+        self.graph.add_edge(v, w, color='misrejoining')
+        self._history.append((edge, reduced._add(v, w), touched, color,
+                              self.count))
+        self.count = None
+
+    def undo(self):
+        """
+        Remove the rejoin edge added last by :meth:`add_rejoin`.
+
+        The incomplete AMG, including its cached count and the order of its
+        free vertices, is restored exactly, in constant time apart from the
+        sorted tuple of rejoin edges.
+
+        Raises
+        ------
+        ValueError
+            If no rejoin edge was added.
+        """
+        if not self._history:
+            raise ValueError('There is no rejoin edge to undo!')
+        (v, w), record, touched, color, count = self._history.pop()
+        self._reduced._remove(record)
+        for k in touched:
+            self.capacities[self._groups[k]] += 1
+        rejoins = list(self.rejoins)
+        del rejoins[bisect.bisect_left(rejoins, (v, w))]
+        self.rejoins = tuple(rejoins)
+        if color is None:
+            self.graph.remove_edge(v, w)
+        else:
+            self.graph.edges[v, w]['color'] = color
+        self.count = count
+
+    def remove_rejoin(self, v, w):
+        """
+        Remove a fixed rejoin edge, freeing its ends.
+
+        The rejoin edge added last is removed by :meth:`undo`. Any other rejoin
+        edge is removed directly; the reduced instance is then recomputed when
+        next needed, and the rejoin edges added so far can no longer be undone.
+
+        Parameters
+        ----------
+        v, w : hashable
+            The ends of a rejoin edge.
+
+        Raises
+        ------
+        ValueError
+            If ``(v, w)`` is not a rejoin edge.
+        """
+        edge = tuple(sorted((v, w)))
+        if self._history and self._history[-1][0] == edge:
+            self.undo()
+            return
+        if edge not in self.rejoins:
+            raise ValueError(f'({v}, {w}) is not a rejoin edge!')
+        for added, _, touched, _, _ in self._history:
+            if added == edge:
+                for k in touched:
+                    self.capacities[self._groups[k]] += 1
+        self.rejoins = tuple(e for e in self.rejoins if e != edge)
+        self.graph.remove_edge(v, w)
+        if edge in self.chromatins:
+            self.graph.add_edge(v, w, color='chromatin')
+        elif edge in self.dsbs:
+            self.graph.add_edge(v, w, color='dsb')
+        self.free.extend(edge)
+        self._reduced = None
+        self._history = []
+        self.count = None
+
     def complete_amgs(self):
         """
         Generate all complete aberration multigraphs extending this incomplete AMG.
 
+        The completions are enumerated on the reduced instance, see
+        :meth:`reduce`.
+
         Returns
         -------
         generator of AberrationMultigraph
@@ -77,19 +291,66 @@ class IncompleteAMG(AberrationMultigraph):
         completed AMGs generated.
         """
         self.count = 0
-        priorities = {v: len(self.free)-1 for v in self.free}
-        for (a,b) in self.dsbs:
-            if a in self.free and b in self.free:
-                priorities[a] -= 1
-                priorities[b] -= 1
-        free_verts = [(priorities[v], v) for v in priorities]
-        hq.heapify(free_verts)
-        return self._gen_rejoins([], free_verts)
+        return self.reduce().complete_amgs()
     
-    def count_amgs(self):
+    def collection(self):
+        """
+        Collect all completions without building them.
+
+        Returns
+        -------
+        AMGCollection
+            The completions of :meth:`complete_amgs`, in the same order and
+            with the same names.
+
+        Side Effects
+        ------------
+        Sets the attribute ``self.count`` to the number of completions.
+        """
+        amgs = AMGCollection.from_completions(
+            self.chromatins, self.dsbs, self.reduce().complete_rejoins(),
+            self.rejoins, name=self.name+'_', start=1)
+        self.count = len(amgs)
+        return amgs
+
+    def save_completions(self, filename, keyframe=KEYFRAME_INTERVAL):
+        """
+        Write all completions to a delta-encoded store file.
+
+        The completions are stored in the order and with the names of
+        :meth:`complete_amgs`, far more compactly than one file per AMG.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file, read back with
+            :class:`~aberration_multigraph.store.AMGSequenceStore`.
+        keyframe : int, optional
+            Store every ``keyframe``-th completion in full, by default
+            ``KEYFRAME_INTERVAL``.
+
+        Returns
+        -------
+        int
+            The number of completions written.
+        """
+        self.count = AMGSequenceStore.write(
+            filename, self.chromatins, self.dsbs,
+            self.reduce().complete_rejoins(), self.rejoins, self.name+'_', 1,
+            keyframe)
+        return self.count
+
+    def count_amgs(self, cache=None):
         """
         Count the number of complete aberration multigraphs extending this incomplete AMG.
 
+        Parameters
+        ----------
+        cache : ResultCache or bool, optional
+            The result cache, by default
+            :func:`~aberration_multigraph.cache.default_cache`. ``False``
+            always counts.
+
         Returns
         -------
         int
@@ -99,51 +360,603 @@ class IncompleteAMG(AberrationMultigraph):
         -----
         The count is cached after the first computation and stored in ``self.count``.
         """
-        if self.count is not None:
-            return self.count
-        priorities = {v: len(self.free)-1 for v in self.free}
-        for (a,b) in self.dsbs:
-            if a in self.free and b in self.free:
-                priorities[a] -= 1
-                priorities[b] -= 1
-        free_verts = [(priorities[v], v) for v in priorities]
-        hq.heapify(free_verts)
-        self.count = self._count_rejoins([], free_verts)
+        if self.count is None:
+            self.count = memoize(self._fingerprint('count'),
+                                 self.reduce().count_amgs, cache)
         return self.count
-        
-    def _count_rejoins(self, rejoins, free_verts):
+
+    def aggregate(self, reducers):
         """
-        Recursively count valid completions of the rejoin set.
+        Compute several statistics over all completions in a single pass.
+
+        The completions are fed to the reducers in collections of
+        ``CHUNK_SIZE``, so histograms of invariants, e.g.,
+        ``Histogram('diameter')``, are computed by the batched kernels without
+        building the AMGs.
+
+        Parameters
+        ----------
+        reducers : list of Reducer
+            Reducers from :mod:`aberration_multigraph.aggregate`.
+
+        Returns
+        -------
+        dict
+            Maps the name of every reducer to its result.
+
+        Side Effects
+        ------------
+        Sets the attribute ``self.count`` to the number of completions.
+        """
+        self.count = 0
+
+        def batches():
+            completions = self.reduce().complete_rejoins()
+            while True:
+                batch = list(itertools.islice(completions, CHUNK_SIZE))
+                if not batch:
+                    return
+                amgs = AMGCollection.from_completions(
+                    self.chromatins, self.dsbs, batch, self.rejoins,
+                    name=self.name+'_', start=self.count+1)
+                self.count += len(amgs)
+                yield amgs
+
+        return aggregate_batches(batches(), reducers)
+
+    def statistics(self, cache=None):
+        """
+        Count the completions by cycle structure and by diameter.
+
+        The statistics are computed by :meth:`aggregate`, in batches of
+        completions, and looked up in and stored to the result cache.
+
+        Parameters
+        ----------
+        cache : ResultCache or bool, optional
+            The result cache, by default
+            :func:`~aberration_multigraph.cache.default_cache`. ``False``
+            always enumerates the completions.
+
+        Returns
+        -------
+        dict
+            The number of completions under ``'count'``, and Counters of the
+            completions by cycle structure label, such as ``'4+6*2'``, and by
+            diameter under ``'cycle_structures'`` and ``'diameters'``, as for
+            :meth:`AMGGenerator.statistics`.
+        """
+        def compute():
+            results = self.aggregate([
+                Histogram('cycle_structure', 'cycle_structures'),
+                Histogram('diameter', 'diameters')])
+            return {'count': self.count,
+                    'cycle_structures': pack(results['cycle_structures']),
+                    'diameters': pack(results['diameters'])}
+
+        stats = memoize(self._fingerprint('statistics'), compute, cache)
+        self.count = stats['count']
+        return {'count': stats['count'],
+                'cycle_structures': unpack(stats['cycle_structures']),
+                'diameters': unpack(stats['diameters'])}
+
+    def _fingerprint(self, kind):
+        """
+        The fingerprint of this incomplete AMG and its constraints in the
+        result cache.
+        """
+        return fingerprint('incomplete_'+kind, self.chromatins, self.dsbs,
+                           self.rejoins, self.forbidden, self.capacities)
+
+    def optimize(self, objective, maximize=False, connected=False):
+        """
+        Find a completion with the fewest or most cycles, or the smallest or
+        largest diameter, without enumerating all completions.
+
+        The search is a branch-and-bound over the same partial matchings as
+        :meth:`complete_amgs`, including the forbidden pairs and capacities.
+        A branch is pruned when an optimistic bound on every completion below it
+        cannot improve on the best completion found so far:
+
+        - cycles: every open alternating path of DSB and rejoin edges closes
+          into at most one cycle, paths with a single DSB edge only in pairs,
+          and at least one cycle remains to be closed while two or more paths
+          are open;
+        - minimum diameter: distances never drop below those in the partial
+          AMG with all free vertices joined into a clique;
+        - maximum diameter: distances never exceed those in the partial AMG;
+        - connectivity: a component without free vertices stays separated.
+
+        Parameters
+        ----------
+        objective : str
+            Either ``'cycles'`` or ``'diameter'``.
+        maximize : bool, optional
+            Whether to maximize the objective, by default False.
+        connected : bool, optional
+            Whether to consider connected completions only, by default False.
+
+        Returns
+        -------
+        Optimum
+            The optimal value and completion, or None for both if there is no
+            (connected) completion, with the numbers of search nodes explored
+            and pruned. As the search is exhaustive up to pruned branches, the
+            latter certify that no completion improves on the optimum.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f'Unknown objective {objective}!')
+        search = _BranchAndBound(self, objective, maximize, connected)
+        return search.run()
+
+    def invariant_bounds(self):
+        """
+        Bound the invariants of all completions without enumerating them.
+
+        The bounds only depend on the open alternating paths of DSB and rejoin
+        edges between free vertices and on the distances in the partial AMG
+        (see :meth:`optimize`). The ranges of the number of cycles and of cycle
+        lengths are exact; the diameter lies between the diameter of the partial
+        AMG with all free vertices joined into a clique and the diameter of the
+        partial AMG itself. Forbidden pairs and capacities are ignored, so the
+        bounds remain valid, but may not be attained, when they are given.
+
+        Returns
+        -------
+        InvariantBounds
+            Ranges of the number of cycles, cycle lengths and diameter.
+        """
+        search = _BranchAndBound(self, 'diameter', False, False)
+        return InvariantBounds(search.cycle_bounds(self.free),
+                               search.cycle_length_bounds(self.free,
+                                                          search.reduced.closed),
+                               (search._diameter(self.free), search._diameter()))
+
+    def _capacity_state(self):
+        """
+        Compute the initial capacity state of the vertex groups.
+
+        Returns
+        -------
+        tuple
+            The capacity and the number of free vertices of every vertex group,
+            or ``(None, None)`` if some group cannot accommodate its free
+            vertices.
+        """
+        free = set(self.free)
+        room = [self.capacities[group] for group in self._groups]
+        left = [len(group & free) for group in self._groups]
+        if any(r < (l+1)//2 for r, l in zip(room, left)):
+            return None, None
+        return room, left
+
+    def _pair(self, v, w, room, left):
+        """
+        Account for a new rejoin edge in the constraints.
+
+        Parameters
+        ----------
+        v, w : int
+            The vertices to be rejoined.
+        room, left : list of int
+            Remaining capacity and number of free vertices of every vertex
+            group, updated in place.
+
+        Returns
+        -------
+        set or None
+            The vertex groups touched by the rejoin edge, or None if the pair is
+            forbidden or leaves a group too little capacity to rejoin its
+            remaining free vertices. In the latter case nothing is updated.
+
+        Notes
+        -----
+        Every free vertex of a group needs a rejoin edge, and one edge serves at
+        most two of them, so a group with ``l`` free vertices left needs at least
+        ``ceil(l/2)`` more capacity.
+        """
+        if self.forbidden and frozenset((v, w)) in self.forbidden:
+            return None
+        touched = set(self._vertex_groups.get(v, ()))
+        touched.update(self._vertex_groups.get(w, ()))
+        for k in touched:
+            room[k] -= 1
+            left[k] -= (v in self._groups[k]) + (w in self._groups[k])
+        if any(room[k] < (left[k]+1)//2 for k in touched):
+            self._unpair(v, w, touched, room, left)
+            return None
+        return touched
+
+    def _unpair(self, v, w, touched, room, left):
+        """
+        Undo :meth:`_pair` for the vertex groups it touched.
+        """
+        for k in touched:
+            room[k] += 1
+            left[k] += (v in self._groups[k]) + (w in self._groups[k])
+
+    # def save_all_complete(self, filename):
+    #     pass
+
+
+class ReducedIAMG:
+    """
+    An incomplete AMG contracted to the open paths between its free vertices.
+
+    The DSB and fixed rejoin edges of an incomplete AMG form alternating paths
+    and cycles. A completion only adds rejoin edges between free vertices, the
+    ends of the open paths, so every open path is contracted into a super-edge
+    between its ends, weighted by the number of its DSB edges. A rejoin edge
+    may join the ends of a super-edge unless it has weight 1, as it would be
+    parallel to a DSB edge.
+
+    The cycles of a completion are the fixed cycles together with the cycles
+    of super-edges and new rejoin edges, with two vertices per DSB edge, and its
+    connected components follow from those of the partial AMG. Completions are
+    counted, enumerated and summarized on the reduced instance, which is several
+    times smaller than the incomplete AMG for typical patient subsets, without
+    building a graph per completion.
+
+    Attributes
+    ----------
+    inc : IncompleteAMG
+        The incomplete AMG.
+    free : list
+        The free vertices; the list ``inc.free`` itself.
+    ends : dict
+        Maps every free vertex to the other end of its super-edge.
+    lengths : dict
+        Maps every free vertex to the weight of its super-edge.
+    closed : list of int
+        The lengths of the cycles closed by the fixed rejoin edges.
+    components : dict
+        Maps every free vertex to the index of its connected component in the
+        partial AMG when it was reduced; components merged since are tracked by
+        a union-find structure.
+    sealed : int
+        The number of connected components of the partial AMG without free
+        vertices.
+    """
+    def __init__(self, inc):
+        """
+        Parameters
+        ----------
+        inc : IncompleteAMG
+            The incomplete AMG to reduce.
+        """
+        self.inc = inc
+        self.free = inc.free
+        self._position = {v: i for i, v in enumerate(self.free)}
+        dsb = {}
+        for u, v in inc.dsbs:
+            dsb[u], dsb[v] = v, u
+        rejoin = {}
+        for u, v in inc.rejoins:
+            rejoin[u], rejoin[v] = v, u
+        self.ends, self.lengths = {}, {}
+        for v in self.free:
+            u, length = dsb[v], 1
+            while u in rejoin:
+                u = dsb[rejoin[u]]
+                length += 1
+            self.ends[v], self.lengths[v] = u, length
+        self.closed = [len(cycle) for cycle in inc.cycles()]
+        self.components = {}
+        self.sealed = 0
+        self._parent, self._size, self._free_count = [], [], []
+        for k, component in enumerate(nx.connected_components(inc.graph)):
+            free = [v for v in component if v in self.ends]
+            self.sealed += not free
+            for v in free:
+                self.components[v] = k
+            self._parent.append(k)
+            self._size.append(1)
+            self._free_count.append(len(free))
+
+    def is_bare(self, v, w):
+        """
+        Whether the free vertices ``v`` and ``w`` are the ends of a DSB edge.
+        """
+        return self.ends[v] == w and self.lengths[v] == 1
+
+    def count_amgs(self):
+        """
+        Count the completions of the incomplete AMG.
+
+        Returns
+        -------
+        int
+            The number of completions satisfying the forbidden pairs and
+            capacities of the incomplete AMG.
+        """
+        room, left = self.inc._capacity_state()
+        if room is None:
+            return 0
+        if not self.free:
+            return 1
+        return self._count_rejoins(self._heap(), room, left)
+
+    def complete_rejoins(self):
+        """
+        Generate the rejoin edges added by every completion.
+
+        The completions are generated in the same order as
+        :meth:`IncompleteAMG.complete_amgs`.
+
+        Yields
+        ------
+        list of tuple
+            The new rejoin edges of a completion.
+        """
+        room, left = self.inc._capacity_state()
+        if room is None:
+            return
+        if not self.free:
+            yield []
+            return
+        yield from self._gen_rejoins([], self._heap(), room, left)
+
+    def complete_amgs(self):
+        """
+        Generate all completions of the incomplete AMG.
+
+        Yields
+        ------
+        AberrationMultigraph
+            A completion, named after the incomplete AMG and its position.
+
+        Side Effects
+        ------------
+        Sets the attribute ``count`` of the incomplete AMG to the number of
+        completions generated.
+        """
+        inc = self.inc
+        inc.count = 0
+        for rejoins in self.complete_rejoins():
+            inc.count += 1
+            yield AberrationMultigraph(inc.chromatins, inc.dsbs,
+                                       list(inc.rejoins)+rejoins,
+                                       inc.name+'_'+str(inc.count))
+
+    def cycle_lengths(self, rejoins):
+        """
+        Compute the cycle lengths of a completion.
 
         Parameters
         ----------
         rejoins : list of tuple
-            Rejoin edges fixed so far in the recursion.
+            The new rejoin edges of a completion.
+
+        Returns
+        -------
+        list of int
+            The number of vertices of every cycle, sorted.
+        """
+        partner = {}
+        for v, w in rejoins:
+            partner[v], partner[w] = w, v
+        lengths = list(self.closed)
+        seen = set()
+        for v in self.free:
+            if v in seen:
+                continue
+            u, length = v, 0
+            while True:
+                seen.add(u)
+                seen.add(self.ends[u])
+                length += self.lengths[u]
+                u = partner[self.ends[u]]
+                if u == v:
+                    break
+            if length > 1:
+                lengths.append(2*length)
+        return sorted(lengths)
+
+    def cycle_structure(self, rejoins):
+        """
+        Compute the cycle structure of a completion, like
+        :meth:`AberrationMultigraph.cycle_structure`.
+
+        Parameters
+        ----------
+        rejoins : list of tuple
+            The new rejoin edges of a completion.
+
+        Returns
+        -------
+        Counter
+            Counts the number of cycles by length.
+        """
+        return Counter(self.cycle_lengths(rejoins))
+
+    def is_connected(self, rejoins):
+        """
+        Check whether a completion is connected.
+
+        Parameters
+        ----------
+        rejoins : list of tuple
+            The new rejoin edges of a completion.
+
+        Returns
+        -------
+        bool
+            True if the completion is connected, False otherwise.
+        """
+        parent = {self._find(k): self._find(k)
+                    for k in self.components.values()}
+
+        def find(k):
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        for v, w in rejoins:
+            parent[find(self._find(self.components[v]))] = \
+                find(self._find(self.components[w]))
+        return self.sealed+len({find(k) for k in parent}) == 1
+
+    def cycle_structures(self, connected=False):
+        """
+        Tally the cycle structures of all completions.
+
+        Parameters
+        ----------
+        connected : bool, optional
+            Whether to tally connected completions only, by default False.
+
+        Returns
+        -------
+        Counter
+            Maps the sorted tuple of cycle lengths of a completion to the number
+            of completions with these cycle lengths.
+        """
+        structures = Counter()
+        for rejoins in self.complete_rejoins():
+            if not connected or self.is_connected(rejoins):
+                structures[tuple(self.cycle_lengths(rejoins))] += 1
+        return structures
+
+    def _find(self, k):
+        """
+        Helper function to find the root of a component in the union-find
+        structure. Paths are not compressed, so that unions can be undone.
+        """
+        while self._parent[k] != k:
+            k = self._parent[k]
+        return k
+
+    def _add(self, v, w):
+        """
+        Contract the new rejoin edge (v, w) between two free vertices.
+
+        All updates take constant time, apart from the union-find lookups,
+        which take logarithmic time.
+
+        Returns
+        -------
+        tuple
+            The state needed by :meth:`_remove` to undo the contraction.
+        """
+        a, b = self.ends[v], self.ends[w]
+        ends = (self.ends.pop(v), self.lengths.pop(v),
+                self.ends.pop(w), self.lengths.pop(w))
+        if a == w:
+            self.closed.append(2*ends[1])
+            merged = None
+        else:
+            merged = (self.lengths[a], self.lengths[b])
+            self.ends[a], self.ends[b] = b, a
+            self.lengths[a] = self.lengths[b] = ends[1]+ends[3]
+        positions = (self._discard(v), self._discard(w))
+        labels = (self.components.pop(v), self.components.pop(w))
+        i, j = self._find(labels[0]), self._find(labels[1])
+        if i != j:
+            if self._size[i] < self._size[j]:
+                i, j = j, i
+            self._parent[j] = i
+            self._size[i] += self._size[j]
+            self._free_count[i] += self._free_count[j]
+        self._free_count[i] -= 2
+        sealed = self._free_count[i] == 0
+        self.sealed += sealed
+        return v, w, ends, merged, positions, labels, (i, j), sealed
+
+    def _remove(self, record):
+        """
+        Undo :meth:`_add`, given the state it returned.
+        """
+        v, w, ends, merged, positions, labels, (i, j), sealed = record
+        self.sealed -= sealed
+        if i != j:
+            self._parent[j] = j
+            self._size[i] -= self._size[j]
+            self._free_count[i] += 2-self._free_count[j]
+        else:
+            self._free_count[i] += 2
+        self.components[v], self.components[w] = labels
+        self._restore(w, positions[1])
+        self._restore(v, positions[0])
+        if merged is None:
+            self.closed.pop()
+        else:
+            a, b = ends[0], ends[2]
+            self.ends[a], self.ends[b] = v, w
+            self.lengths[a], self.lengths[b] = merged
+        self.ends[v], self.lengths[v], self.ends[w], self.lengths[w] = ends
+
+    def _discard(self, v):
+        """
+        Helper function to remove a vertex from the free vertices in constant
+        time, by moving the last free vertex into its place.
+        """
+        position = self._position.pop(v)
+        last = self.free.pop()
+        if last != v:
+            self.free[position] = last
+            self._position[last] = position
+        return position
+
+    def _restore(self, v, position):
+        """
+        Helper function to undo :meth:`_discard`, restoring the order of the
+        free vertices.
+        """
+        if position == len(self.free):
+            self.free.append(v)
+        else:
+            self.free.append(self.free[position])
+            self._position[self.free[position]] = len(self.free)-1
+            self.free[position] = v
+        self._position[v] = position
+
+    def _heap(self):
+        """
+        Helper function to build the heap of free vertices, prioritized by
+        the number of vertices they can be rejoined to.
+        """
+        free_verts = [(len(self.free)-1-(self.lengths[v] == 1), v)
+                        for v in self.free]
+        hq.heapify(free_verts)
+        return free_verts
+
+    def _count_rejoins(self, free_verts, room, left):
+        """
+        Recursively count valid completions of the rejoin set.
+
+        Parameters
+        ----------
         free_verts : list
             Heap of currently unmatched vertices, prioritized by remaining flexibility.
+        room, left : list of int
+            Remaining capacity and number of free vertices of every vertex group.
 
         Returns
         -------
         int
             Number of valid completions extending the current partial rejoining.
-
-        Notes
-        -----
-        This is an internal helper method and not part of the public API.
         """
+        inc = self.inc
         loc_count = 0
         _, v = hq.heappop(free_verts)
         if len(free_verts) == 1:
+            touched = inc._pair(v, free_verts[0][1], room, left)
+            if touched is None:
+                return loc_count
+            inc._unpair(v, free_verts[0][1], touched, room, left)
             return loc_count+1
-        else:
-            for _, w in free_verts:
-                if (v,w) not in self.dsbs and (w,v) not in self.dsbs:
-                    new_free_verts = self._remaining_vertices(free_verts, v, w)
-                    new_rejoins = rejoins + [(v, w)]
-                    loc_count += self._count_rejoins(new_rejoins, new_free_verts)
+        for _, w in free_verts:
+            if not self.is_bare(v, w):
+                touched = inc._pair(v, w, room, left)
+                if touched is None:
+                    continue
+                new_free_verts = self._remaining_vertices(free_verts, v, w)
+                loc_count += self._count_rejoins(new_free_verts, room, left)
+                inc._unpair(v, w, touched, room, left)
         return loc_count
-        
-    def _gen_rejoins(self, rejoins, free_verts):
+
+    def _gen_rejoins(self, rejoins, free_verts, room, left):
         """
         Recursively generate valid rejoin completions.
 
@@ -153,35 +966,35 @@ class IncompleteAMG(AberrationMultigraph):
             Rejoin edges fixed so far in the recursion.
         free_verts : list
             Heap of currently unmatched vertices.
+        room, left : list of int
+            Remaining capacity and number of free vertices of every vertex group.
 
         Yields
         ------
-        AberrationMultigraph
-            A complete aberration multigraph obtained by extending the current
-            incomplete AMG.
-
-        Notes
-        -----
-        This is an internal helper method used by :meth:`complete_amgs`.
+        list of tuple
+            The new rejoin edges of a completion.
         """
+        inc = self.inc
         _, v = hq.heappop(free_verts)
-        # If there is only one unmatched vertex left, pair it to this vertex 
-        # and generate an AMG.
-        # Else, pair this vertex with all remaining vertices and generate AMGs
-        # recursively.
+        # If there is only one unmatched vertex left, pair it to this vertex.
+        # Else, pair this vertex with all remaining vertices and recurse.
         if len(free_verts) == 1:
             _, u = hq.heappop(free_verts)
-            self.count += 1
-            yield AberrationMultigraph(self.chromatins,
-                                       self.dsbs,
-                                       list(self.rejoins)+rejoins+[(v,u)],
-                                       self.name+'_'+str(self.count))
-        else:
-            for _, w in free_verts:
-                if (v,w) not in self.dsbs and (w,v) not in self.dsbs:
-                    new_free_verts = self._remaining_vertices(free_verts, v, w)
-                    new_rejoins = rejoins + [(v, w)]
-                    yield from self._gen_rejoins(new_rejoins, new_free_verts)
+            touched = inc._pair(v, u, room, left)
+            if touched is None:
+                return
+            inc._unpair(v, u, touched, room, left)
+            yield rejoins+[(v, u)]
+            return
+        for _, w in free_verts:
+            if not self.is_bare(v, w):
+                touched = inc._pair(v, w, room, left)
+                if touched is None:
+                    continue
+                new_free_verts = self._remaining_vertices(free_verts, v, w)
+                yield from self._gen_rejoins(rejoins+[(v, w)], new_free_verts,
+                                             room, left)
+                inc._unpair(v, w, touched, room, left)
 
     def _remaining_vertices(self, free_verts, v, w):
         """
@@ -201,23 +1014,236 @@ class IncompleteAMG(AberrationMultigraph):
 
         Notes
         -----
-        Priority updates reflect reduced pairing options induced by DSB constraints.
+        A vertex that cannot be rejoined to ``v`` or ``w`` loses one option
+        only; every other vertex loses two.
         """
         new_free_verts = []
         for priority, u in free_verts:
-            if ((u,v) in self.dsbs or (v,u) in self.dsbs or 
-                (u,w) in self.dsbs or (w,u) in self.dsbs):
+            if u == w:
+                continue
+            if self.is_bare(u, v) or self.is_bare(u, w):
                 new_free_verts.append((priority-1, u))
-            # if (self.dsb_pair[u] == v
-            #         or self.dsb_pair[u] == w):
-            #     new_free_verts.append((priority-1, u))
-            elif u != w:
+            else:
                 new_free_verts.append((priority-2, u))
         hq.heapify(new_free_verts)
         return new_free_verts
 
-    # def save_all_complete(self, filename):
-    #     pass
+
+class _BranchAndBound:
+    """
+    State of a branch-and-bound search over the completions of an IAMG.
+
+    The search maintains the partial AMG incrementally: the number of closed
+    cycles, for every free vertex the other end of its open alternating path of
+    DSB and rejoin edges together with the number of DSB edges on that path,
+    and, when distances are needed, the matrix of all pairwise distances.
+    """
+    def __init__(self, inc, objective, maximize, connected):
+        self.inc = inc
+        self.objective = objective
+        self.sign = -1 if maximize else 1
+        self.connected = connected
+        self.best = None
+        self.best_rejoins = None
+        self.explored = 0
+        self.pruned = 0
+        self.reduced = inc.reduce()
+        self.cycles = len(self.reduced.closed)
+        self.end = dict(self.reduced.ends)
+        self.length = dict(self.reduced.lengths)
+        self.index = {v: i for i, v in enumerate(inc.graph.nodes)}
+        self.dist = None
+        if objective == 'diameter' or connected:
+            self.dist = np.full((len(self.index),)*2, np.inf)
+            for v, i in self.index.items():
+                for u, d in nx.single_source_shortest_path_length(inc.graph,
+                                                                  v).items():
+                    self.dist[i, self.index[u]] = d
+
+    def run(self):
+        """
+        Search all completions and return the optimum.
+        """
+        inc = self.inc
+        room, left = inc._capacity_state()
+        if room is not None:
+            self._search([], self.reduced._heap(), room, left)
+        amg = None
+        if self.best_rejoins is not None:
+            amg = AberrationMultigraph(inc.chromatins, inc.dsbs,
+                                       list(inc.rejoins)+self.best_rejoins,
+                                       inc.name+'_'+self.objective)
+        return Optimum(self.best, amg, self.explored, self.pruned)
+
+    def _search(self, rejoins, free_verts, room, left):
+        """
+        Extend the partial matching ``rejoins`` in all feasible ways.
+        """
+        self.explored += 1
+        if not free_verts:
+            self._leaf(rejoins)
+            return
+        bound = self._bound(free_verts)
+        if bound is None or (self.best is not None
+                             and self.sign*bound >= self.sign*self.best):
+            self.pruned += 1
+            return
+        _, v = hq.heappop(free_verts)
+        if len(free_verts) == 1:
+            candidates = [free_verts[0][1]]
+        else:
+            candidates = [w for _, w in free_verts
+                            if not self.reduced.is_bare(v, w)]
+            if self.objective == 'cycles':
+                # try closing the path of v first when maximizing, last otherwise
+                candidates.sort(key=lambda w: (w == self.end[v]) == (self.sign < 0),
+                                reverse=True)
+            else:
+                # try far vertices first when minimizing, near ones otherwise
+                dist = self.dist[self.index[v]]
+                candidates.sort(key=lambda w: self.sign*dist[self.index[w]],
+                                reverse=True)
+        for w in candidates:
+            touched = self.inc._pair(v, w, room, left)
+            if touched is None:
+                continue
+            undo = self._join(v, w)
+            new_free_verts = (self.reduced._remaining_vertices(free_verts, v, w)
+                              if len(free_verts) > 1 else [])
+            self._search(rejoins+[(v, w)], new_free_verts, room, left)
+            self._split(undo)
+            self.inc._unpair(v, w, touched, room, left)
+
+    def _join(self, v, w):
+        """
+        Add the rejoin edge (v, w) to the partial AMG.
+        """
+        dist = self.dist
+        if dist is not None:
+            i, j = self.index[v], self.index[w]
+            self.dist = np.minimum(dist, np.minimum(dist[:, [i]]+1+dist[[j], :],
+                                                    dist[:, [j]]+1+dist[[i], :]))
+        if self.end[v] == w:
+            closed = 1 if self.length[v] > 1 else 0
+            self.cycles += closed
+            return dist, closed, None
+        a, b = self.end[v], self.end[w]
+        merged = (a, b, self.end[a], self.end[b], self.length[a], self.length[b])
+        length = self.length[v]+self.length[w]
+        self.end[a], self.end[b] = b, a
+        self.length[a], self.length[b] = length, length
+        return dist, 0, merged
+
+    def _split(self, undo):
+        """
+        Remove the rejoin edge added by :meth:`_join`.
+        """
+        self.dist, closed, merged = undo
+        self.cycles -= closed
+        if merged is not None:
+            a, b, end_a, end_b, length_a, length_b = merged
+            self.end[a], self.end[b] = end_a, end_b
+            self.length[a], self.length[b] = length_a, length_b
+
+    def _leaf(self, rejoins):
+        """
+        Evaluate a completion and keep it if it improves on the best one.
+        """
+        if self.connected and np.isinf(self.dist[0]).any():
+            return
+        value = self.cycles if self.objective == 'cycles' else self._diameter()
+        if self.best is None or self.sign*value < self.sign*self.best:
+            self.best = value
+            self.best_rejoins = list(rejoins)
+
+    def _bound(self, free_verts):
+        """
+        An optimistic bound on the objective over all completions of the
+        current partial matching, or None if none of them is feasible.
+        """
+        free = [v for _, v in free_verts]
+        if self.connected:
+            # label every vertex by the first vertex of its component
+            labels = np.isfinite(self.dist).argmax(axis=1)
+            components = set(labels.tolist())
+            reachable = set(labels[[self.index[v] for v in free]].tolist())
+            if len(components) > 1 and (reachable != components
+                                        or len(components)-1 > len(free)//2):
+                return None
+        if self.objective == 'cycles':
+            return self.cycle_bounds(free)[self.sign < 0]
+        if self.sign < 0:
+            return self._diameter()
+        return self._diameter(free)
+
+    def _paths(self, free):
+        """
+        The numbers of DSB edges on the open paths ending in ``free``.
+        """
+        return [self.length[v] for v in free
+                    if self.index[v] < self.index[self.end[v]]]
+
+    def cycle_bounds(self, free):
+        """
+        The range of the number of cycles over all completions.
+
+        Every open path closes into at most one cycle, and paths with a single
+        DSB edge only in pairs, since a rejoin parallel to a DSB edge does not
+        form a cycle. Closing the paths one by one, and pairing up the single
+        ones, attains the maximum; joining all paths into one cycle attains the
+        minimum.
+        """
+        lengths = self._paths(free)
+        single = sum(length == 1 for length in lengths)
+        high = self.cycles+len(lengths)-single+single//2
+        if len(lengths) == 1 and single == 1:
+            return self.cycles, high
+        return self.cycles+(1 if lengths else 0), high
+
+    def cycle_length_bounds(self, free, closed):
+        """
+        The shortest and longest cycle over all completions.
+
+        A new cycle has two vertices per DSB edge on the open paths it joins.
+        The longest one joins all open paths. The shortest one closes a single
+        path with several DSB edges, or joins two or all paths, provided the
+        remaining paths can still be completed: a lone path with a single DSB
+        edge would have to be closed by a rejoin parallel to it.
+
+        Parameters
+        ----------
+        free : list
+            The free vertices.
+        closed : list of int
+            The lengths of the cycles closed already.
+        """
+        lengths = sorted(self._paths(free))
+        total = sum(lengths)
+        candidates = list(closed)
+        if len(lengths) > 1 or total > 1:
+            candidates.append(2*total)
+        joins = [(i,) for i in range(len(lengths))]
+        joins += [(i, j) for j in range(min(3, len(lengths))) for i in range(j)]
+        for join in joins:
+            length = sum(lengths[i] for i in join)
+            rest = len(lengths)-len(join)
+            if length > 1 and (rest != 1 or total-length > 1):
+                candidates.append(2*length)
+        if not candidates:
+            return None, None
+        return min(candidates), max(candidates)
+
+    def _diameter(self, clique=()):
+        """
+        The diameter of the partial AMG, after joining the vertices of
+        ``clique`` pairwise by edges.
+        """
+        dist = self.dist
+        if clique:
+            hub = dist[:, [self.index[v] for v in clique]].min(axis=1)
+            dist = np.minimum(dist, hub[:, None]+1+hub[None, :])
+        diameter = dist.max()
+        return int(diameter) if np.isfinite(diameter) else np.inf
 
 
 if __name__ == '__main__':
@@ -0,0 +1,353 @@
+"""
+Random rearrangement dynamics on the space of aberration multigraphs (AMGs).
+
+This module turns the operation structure recorded by
+:class:`~aberration_multigraph.representative.AMGRepresentative` into a sparse
+Markov transition operator. At every step of the walk one operation is chosen
+at random: first its kind (twist, swap or edge reversal) according to
+configurable move probabilities, then one operation of that kind uniformly at
+random. Operations leading outside the space of generated AMGs, and any
+probability mass not assigned to a kind of operation, leave the AMG unchanged.
+
+The operator is stored in compressed sparse row (CSR) form using NumPy arrays
+only, so that the evolution of a distribution over AMGs is a sequence of sparse
+matrix-vector products instead of a per-AMG simulation loop.
+"""
+
+import numpy as np
+from collections import Counter
+from aberration_multigraph.amg import cycle_structure_label
+
+
+class CSRMatrix:
+    """
+    A minimal compressed sparse row matrix backed by NumPy arrays.
+
+    Attributes
+    ----------
+    data : numpy.ndarray
+        The nonzero entries, row by row.
+    indices : numpy.ndarray
+        The column of every nonzero entry.
+    indptr : numpy.ndarray
+        Row ``i`` occupies ``data[indptr[i]:indptr[i+1]]``.
+    shape : tuple of int
+        The shape of the matrix.
+    """
+    def __init__(self, data, indices, indptr, shape):
+        """
+        Parameters
+        ----------
+        data : array_like
+            The nonzero entries, row by row.
+        indices : array_like
+            The column of every nonzero entry.
+        indptr : array_like
+            Offsets of the rows in ``data`` and ``indices``.
+        shape : tuple of int
+            The shape of the matrix.
+        """
+        self.data = np.asarray(data, dtype=float)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.shape = tuple(shape)
+
+    @staticmethod
+    def from_coo(rows, cols, values, shape):
+        """
+        Build a CSR matrix from coordinate triples, summing duplicates.
+
+        Parameters
+        ----------
+        rows, cols : array_like
+            Row and column of every entry.
+        values : array_like
+            The value of every entry.
+        shape : tuple of int
+            The shape of the matrix.
+
+        Returns
+        -------
+        CSRMatrix
+            The matrix with the given entries.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        keys, inverse = np.unique(rows*shape[1]+cols, return_inverse=True)
+        data = np.bincount(inverse, weights=values, minlength=len(keys))
+        indptr = np.searchsorted(keys // shape[1], np.arange(shape[0]+1))
+        return CSRMatrix(data, keys % shape[1], indptr, shape)
+
+    def dot(self, x):
+        """
+        Multiply this matrix with a vector or with the columns of a matrix.
+
+        Parameters
+        ----------
+        x : numpy.ndarray
+            An array of shape ``(n,)`` or ``(n, k)`` where ``n`` is the number
+             of columns of this matrix.
+
+        Returns
+        -------
+        numpy.ndarray
+            The product, of shape ``(m,)`` or ``(m, k)``.
+        """
+        x = np.asarray(x, dtype=float)
+        products = (self.data[:, None]*x[self.indices] if x.ndim == 2
+                    else self.data*x[self.indices])
+        # Every row is summed on its own, so that rounding errors do not
+        # accumulate over the rows before it. Empty rows stay zero.
+        result = np.zeros((self.shape[0],)+products.shape[1:])
+        nonempty = self.indptr[1:] > self.indptr[:-1]
+        if nonempty.any():
+            result[nonempty] = np.add.reduceat(
+                products, self.indptr[:-1][nonempty], axis=0)
+        return result
+
+    def transpose(self):
+        """
+        Compute the transpose of this matrix.
+
+        Returns
+        -------
+        CSRMatrix
+            The transposed matrix.
+        """
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        return CSRMatrix.from_coo(self.indices, rows, self.data,
+                                  (self.shape[1], self.shape[0]))
+
+    def toarray(self):
+        """
+        Convert this matrix to a dense array.
+
+        Returns
+        -------
+        numpy.ndarray
+            The dense matrix.
+        """
+        dense = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        np.add.at(dense, (rows, self.indices), self.data)
+        return dense
+
+
+class AMGMarkovChain:
+    """
+    A random walk over AMGs under twists, swaps and edge reversals.
+
+    Attributes
+    ----------
+    amgs : list of AberrationMultigraph
+        The states of the chain, in the order of the representative's
+         adjacency list.
+    index : dict
+        Maps the rejoin edges of an AMG to its state index.
+    move_probabilities : dict
+        The probability of choosing each kind of operation.
+    transition : CSRMatrix
+        Row-stochastic transition matrix; entry ``(i, j)`` is the probability
+         of moving from ``amgs[i]`` to ``amgs[j]``.
+    classes : list
+        The distinct cycle-structure labels of the states.
+    class_of : numpy.ndarray
+        The index in ``classes`` of the cycle structure of every state.
+    """
+    def __init__(self, representative, move_probabilities=None):
+        """
+        Parameters
+        ----------
+        representative : AMGRepresentative
+            A representative-graph builder whose adjacency list has been
+             computed.
+        move_probabilities : dict, optional
+            Maps ``'twist'``, ``'swap'`` and ``'reversal'`` to the probability
+             of choosing an operation of that kind.
+            The probabilities must sum to at most 1; the remainder is the
+             probability of staying put.
+            By default, every kind present in the representative is equally
+             likely.
+        """
+        if not representative.adjacency_list:
+            raise RuntimeError(
+                'Adjacency list is empty. Call compute_amg_adjacency_list() first.'
+            )
+        kinds = Counter(op[0] for op in representative.operations.values())
+        if move_probabilities is None:
+            move_probabilities = {kind: 1/len(kinds) for kind in kinds}
+        if (any(p < 0 for p in move_probabilities.values())
+                or sum(move_probabilities.values()) > 1+1e-12):
+            raise ValueError('Move probabilities must be a sub-distribution!')
+        self.move_probabilities = dict(move_probabilities)
+        self.amgs = list(representative.adjacency_list)
+        self.index = {amg.rejoins: i for i, amg in enumerate(self.amgs)}
+
+        rows, cols, values = [], [], []
+        for i, amg in enumerate(self.amgs):
+            stay = 1-sum(self.move_probabilities.get(kind, 0)
+                         for kind in kinds)
+            for rejoins, operation in representative.adjacency_list[amg]:
+                kind = representative.operations[operation][0]
+                p = self.move_probabilities.get(kind, 0)/kinds[kind]
+                j = self.index.get(rejoins)
+                if j is None:
+                    stay += p
+                else:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(p)
+            rows.append(i)
+            cols.append(i)
+            values.append(stay)
+        n = len(self.amgs)
+        self.transition = CSRMatrix.from_coo(rows, cols, values, (n, n))
+        self._forward = self.transition.transpose()
+
+        labels = [cycle_structure_label(amg.cycle_structure())
+                    for amg in self.amgs]
+        self.classes = sorted(set(labels))
+        class_index = {label: k for k, label in enumerate(self.classes)}
+        self.class_of = np.array([class_index[label] for label in labels],
+                                 dtype=np.int64)
+
+    def step(self, distribution, steps=1):
+        """
+        Evolve one or several distributions over AMGs.
+
+        Parameters
+        ----------
+        distribution : numpy.ndarray
+            A distribution of shape ``(n,)``, or ``k`` distributions stored as
+             the columns of an array of shape ``(n, k)``.
+        steps : int, optional
+            The number of steps of the walk, by default 1.
+
+        Returns
+        -------
+        numpy.ndarray
+            The distribution(s) after ``steps`` steps.
+        """
+        distribution = np.asarray(distribution, dtype=float)
+        for _ in range(steps):
+            distribution = self._forward.dot(distribution)
+        return distribution
+
+    def power_iteration(self, distribution=None, tol=1e-12, max_iter=10000):
+        """
+        Iterate the lazy version of the walk until the distribution settles.
+
+        The lazy walk stays put with probability 1/2 at every step, which has
+        the same stationary distributions but cannot oscillate.
+
+        Parameters
+        ----------
+        distribution : numpy.ndarray, optional
+            The initial distribution, by default uniform over all AMGs.
+        tol : float, optional
+            Stop once the L1 change in one step is below this, by default 1e-12.
+        max_iter : int, optional
+            The maximum number of steps, by default 10000.
+
+        Returns
+        -------
+        tuple
+            The final distribution and the number of steps taken.
+        """
+        n = len(self.amgs)
+        if distribution is None:
+            distribution = np.full(n, 1/n)
+        distribution = np.asarray(distribution, dtype=float)
+        for iteration in range(1, max_iter+1):
+            new_distribution = (distribution+self._forward.dot(distribution))/2
+            if np.abs(new_distribution-distribution).sum() < tol:
+                return new_distribution, iteration
+            distribution = new_distribution
+        return distribution, max_iter
+
+    def stationary_distribution(self, tol=1e-12, max_iter=10000):
+        """
+        Compute a stationary distribution of the walk.
+
+        Starting from the uniform distribution, the walk converges to the
+        stationary distribution in which every communicating class keeps its
+        initial mass.
+
+        Parameters
+        ----------
+        tol : float, optional
+            Convergence tolerance for the power iteration, by default 1e-12.
+        max_iter : int, optional
+            The maximum number of steps, by default 10000.
+
+        Returns
+        -------
+        numpy.ndarray
+            A stationary distribution over ``amgs``.
+        """
+        return self.power_iteration(tol=tol, max_iter=max_iter)[0]
+
+    def class_mass(self, distribution):
+        """
+        Aggregate one or several distributions by cycle structure.
+
+        Parameters
+        ----------
+        distribution : numpy.ndarray
+            An array of shape ``(n,)`` or ``(n, k)``.
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of shape ``(c,)`` or ``(c, k)`` whose rows follow
+             ``classes``.
+        """
+        distribution = np.asarray(distribution, dtype=float)
+        mass = np.zeros((len(self.classes),)+distribution.shape[1:])
+        np.add.at(mass, self.class_of, distribution)
+        return mass
+
+    def propagate_classes(self, distribution, steps):
+        """
+        Track the probability mass of every cycle structure along the walk.
+
+        Parameters
+        ----------
+        distribution : numpy.ndarray
+            The initial distribution over ``amgs``.
+        steps : int
+            The number of steps of the walk.
+
+        Returns
+        -------
+        numpy.ndarray
+            An array of shape ``(steps+1, c)`` whose row ``t`` is the mass of
+             every cycle structure after ``t`` steps.
+        """
+        distribution = np.asarray(distribution, dtype=float)
+        history = np.empty((steps+1, len(self.classes)))
+        history[0] = self.class_mass(distribution)
+        for t in range(1, steps+1):
+            distribution = self._forward.dot(distribution)
+            history[t] = self.class_mass(distribution)
+        return history
+
+    def point_mass(self, amg):
+        """
+        The distribution concentrated on a single AMG.
+
+        Parameters
+        ----------
+        amg : AberrationMultigraph
+            One of the states of the chain.
+
+        Returns
+        -------
+        numpy.ndarray
+            The indicator vector of ``amg``.
+        """
+        distribution = np.zeros(len(self.amgs))
+        distribution[self.index[amg.rejoins]] = 1
+        return distribution
+
@@ -53,10 +53,13 @@ class AMGRepresentative():
         # Adjacency list: AMG name -> set of (neighbor_name, operation_index)
         self.adjacency_list = {}
 
+        # Operation index -> ('twist', k), ('swap', i, j) or ('reversal', edge)
+        self.operations = {}
+
         # Representative graph (constructed later)
         self.rep_graph = None
 
-    def compute_amg_adjacency_list(self):
+    def compute_amg_adjacency_list(self, reversals=False):
         """
         Compute adjacency information between AMGs under allowed operations.
 
@@ -64,19 +67,30 @@ class AMGRepresentative():
         - Apply all valid total twists (one per chromosome).
         - Apply all valid total swaps between chromosomes with equal
           numbers of DSBs.
+        - Optionally, apply all chromosome edge reversals.
 
         Each resulting AMG is identified by its rejoin-edge set, and adjacency
         information is recorded symbolically without constructing the full
         representative graph.
+        Edge reversals may lead outside the space of generated AMGs; such
+        neighbors are recorded but ignored by the representative graph.
+
+        Parameters
+        ----------
+        reversals : bool, optional
+            Whether to include chromosome edge reversals, by default False.
 
         Side Effects
         ------------
         Populates:
         - ``self.rejoin_name_map``
         - ``self.adjacency_list``
+        - ``self.operations``
         """
         self.adjacency_list = {}
         self.rejoin_name_map = {}
+        self.operations = {k+1: ('twist', k)
+                            for k in range(self.num_chromosomes)}
         for amg in self.generator.generate_amgs():
             # self.rejoin_name_map[(amg.dsbs,amg.rejoins)] = amg.name
             self.rejoin_name_map[amg.rejoins] = amg.name
@@ -90,7 +104,7 @@ class AMGRepresentative():
 
             operation_number = self.num_chromosomes+1
             for i in range(self.num_chromosomes):
-                for j in range(i, self.num_chromosomes):
+                for j in range(i+1, self.num_chromosomes):
                     chrom_1, chrom_2 = (j, i) if j < i else (i, j)
                     chrom_1_nodes = set(k for k in amg.graph.nodes if amg.graph.nodes[k]['chromosome'] == chrom_1)
                     chrom_2_nodes = set(k for k in amg.graph.nodes if amg.graph.nodes[k]['chromosome'] == chrom_2)
@@ -99,7 +113,42 @@ class AMGRepresentative():
                         start_2, stop_2 = min(chrom_2_nodes), max(chrom_2_nodes)
                         # self.adjacency_list[amg].add((amg.dsbs_total_swap(start_1,start_2,stop_1,stop_2), amg.rejoin_edges_total_swap(start_1,start_2,stop_1,stop_2), operation_number))
                         self.adjacency_list[amg].add((amg._rejoin_edges_total_swap(start_1,start_2,stop_1,stop_2), operation_number))
+                        self.operations[operation_number] = ('swap', i, j)
                         operation_number += 1
+
+            if reversals:
+                for edge in self.generator.chromatins:
+                    edge = tuple(sorted(edge))
+                    self.adjacency_list[amg].add((self._rejoin_edges_reversal(amg, edge), operation_number))
+                    self.operations[operation_number] = ('reversal', edge)
+                    operation_number += 1
+
+    def _rejoin_edges_reversal(self, amg, edge):
+        """
+        Helper method to compute the rejoin edges after an edge reversal.
+
+        Parameters
+        ----------
+        amg : AberrationMultigraph
+            The AMG to be transformed.
+        edge : tuple
+            A chromatin edge of ``amg``.
+
+        Returns
+        -------
+        tuple
+            The rejoin edges of ``amg.edge_reversal(edge)``.
+        """
+        u, v = edge
+        partner = {}
+        for a, b in amg.rejoins:
+            partner[a], partner[b] = b, a
+        if u not in partner or v not in partner or partner[u] == v:
+            return amg.rejoins
+        x, y = partner[u], partner[v]
+        rejoins = [e for e in amg.rejoins if u not in e and v not in e]
+        rejoins += [tuple(sorted((u, y))), tuple(sorted((v, x)))]
+        return tuple(sorted(rejoins))
     
     def compute_representative_graph(self):
         """
@@ -122,8 +171,8 @@ class AMGRepresentative():
         self.rep_graph = nx.Graph()
         for amg in self.adjacency_list:
             for nbr_rejoin_edge, operation in self.adjacency_list[amg]:
-                nbr = self.rejoin_name_map[nbr_rejoin_edge]
-                if nbr != amg.name:
+                nbr = self.rejoin_name_map.get(nbr_rejoin_edge)
+                if nbr is not None and nbr != amg.name:
                     self.rep_graph.add_edge(amg.name, nbr, color=operation)
 
     def draw_representative_graph(self):
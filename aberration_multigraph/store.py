@@ -0,0 +1,449 @@
+"""
+Memory-mapped storage for collections of aberration multigraphs (AMGs).
+
+Pickling one object per file makes cohort-wide sweeps pay for opening and
+deserializing thousands of small files. This module provides a single-file,
+versioned container of fixed-width NumPy arrays instead. The file starts with a
+small header describing every array, followed by the raw array data. Arrays are
+opened with :class:`numpy.memmap`, so random access and scans read only the
+bytes they touch and never deserialize anything.
+
+File layout
+-----------
+- 8 bytes: the magic string ``b'AMGSTORE'``
+- 4 bytes: the format version as a little-endian unsigned integer
+- 4 bytes: the length of the header as a little-endian unsigned integer
+- the header, a UTF-8 encoded JSON object with the ``dtype``, ``shape`` and
+  ``offset`` of every array, and free-form ``attrs``
+- the arrays, each starting at a multiple of 64 bytes
+
+Enumerations of AMGs are stored more compactly by :class:`AMGSequenceStore`:
+consecutive completions from backtracking share long prefixes of rejoin edges,
+so only the edges after the shared prefix are stored, with periodic keyframes
+holding all edges for random access.
+"""
+
+import itertools
+import json
+import struct
+import numpy as np
+from aberration_multigraph.amg import AberrationMultigraph
+
+MAGIC = b'AMGSTORE'
+VERSION = 1
+ALIGNMENT = 64
+KEYFRAME_INTERVAL = 256
+
+
+def write_arrays(filename, arrays, attrs=None):
+    """
+    Write named arrays to a single store file.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file.
+    arrays : dict
+        Maps names to NumPy arrays with fixed-width dtypes.
+    attrs : dict, optional
+        JSON-serializable metadata stored in the header, by default None.
+    """
+    arrays = {name: np.ascontiguousarray(array)
+                for name, array in arrays.items()}
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f'Array {name} does not have a fixed width!')
+    # The header stores offsets, so its length depends on itself: reserve a
+    # generous number of digits for every offset.
+    layout = {name: {'dtype': array.dtype.str,
+                     'shape': list(array.shape),
+                     'offset': 10**15}
+                for name, array in arrays.items()}
+    header = {'arrays': layout, 'attrs': attrs or {}}
+    start = _align(16+len(json.dumps(header).encode()))
+    offset = start
+    for name, array in arrays.items():
+        layout[name]['offset'] = offset
+        offset = _align(offset+array.nbytes)
+    encoded = json.dumps(header).encode().ljust(start-16)
+    with open(filename, 'wb') as file:
+        file.write(MAGIC+struct.pack('<II', VERSION, len(encoded)))
+        file.write(encoded)
+        for name, array in arrays.items():
+            file.seek(layout[name]['offset'])
+            file.write(array.tobytes())
+        file.truncate(offset)
+
+
+def open_arrays(filename, mode='r'):
+    """
+    Open the arrays of a store file without reading them.
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file.
+    mode : str, optional
+        The :class:`numpy.memmap` mode, by default 'r' (read-only).
+
+    Returns
+    -------
+    tuple
+        A dict mapping names to memory-mapped arrays, and the stored attrs.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a store or was written by an unknown version.
+    """
+    with open(filename, 'rb') as file:
+        prefix = file.read(16)
+        if len(prefix) < 16 or prefix[:8] != MAGIC:
+            raise ValueError(f'{filename} is not an AMG store!')
+        version, length = struct.unpack('<II', prefix[8:])
+        if version != VERSION:
+            raise ValueError(f'Unsupported store version {version}!')
+        header = json.loads(file.read(length).decode())
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        if dtype.itemsize*int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode=mode,
+                                     offset=spec['offset'], shape=shape)
+    return arrays, header['attrs']
+
+
+def _align(offset):
+    """
+    Helper function to round an offset up to the next aligned position.
+
+    Parameters
+    ----------
+    offset : int
+        A position in the file.
+
+    Returns
+    -------
+    int
+        The smallest multiple of ``ALIGNMENT`` not less than ``offset``.
+    """
+    return -(-offset // ALIGNMENT)*ALIGNMENT
+
+
+class AMGStore:
+    """
+    A memory-mapped collection of AMGs sharing one backbone.
+
+    The backbone is stored once in the header.
+    The rejoin edges of AMG ``i`` are row ``i`` of an array of shape
+    ``(N, R, 2)`` holding vertex indices, so any AMG can be read without
+    touching the others.
+
+    Attributes
+    ----------
+    chromatins : tuple
+        Chromatin edges of the backbone.
+    dsbs : tuple
+        DSB edges of the backbone.
+    vertices : list
+        Vertex labels ordered by index.
+    rejoins : numpy.ndarray
+        Memory-mapped rejoin edges of all AMGs as vertex indices.
+    names : numpy.ndarray
+        Memory-mapped names of all AMGs.
+    """
+    def __init__(self, filename):
+        """
+        Parameters
+        ----------
+        filename : str
+            A file written by :meth:`AMGStore.write`.
+        """
+        arrays, attrs = open_arrays(filename)
+        self.vertices = [_label(v) for v in attrs['vertices']]
+        self.chromatins = tuple(tuple(self.vertices[i] for i in edge)
+                                    for edge in attrs['chromatins'])
+        self.dsbs = tuple(tuple(self.vertices[i] for i in edge)
+                            for edge in attrs['dsbs'])
+        self.rejoins = arrays['rejoins']
+        self.names = arrays['names']
+
+    @staticmethod
+    def write(filename, amgs):
+        """
+        Write AMGs sharing one backbone to a store file.
+
+        Vertex labels must be JSON-serializable; tuple labels such as
+        ``BreakLocation`` are read back as plain tuples.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+        amgs : iterable of AberrationMultigraph
+            AMGs with identical chromatin and DSB edges and the same number
+             of rejoin edges.
+        """
+        amgs = list(amgs)
+        if not amgs:
+            raise ValueError('Cannot store an empty collection of AMGs!')
+        first = amgs[0]
+        vertices = list(first.graph.nodes)
+        index = {v: i for i, v in enumerate(vertices)}
+        dtype = np.uint16 if len(vertices) <= 1 << 16 else np.uint32
+        rejoins = np.empty((len(amgs), len(first.rejoins), 2), dtype=dtype)
+        for k, amg in enumerate(amgs):
+            if (amg.chromatins != first.chromatins or amg.dsbs != first.dsbs
+                    or len(amg.rejoins) != len(first.rejoins)):
+                raise ValueError('AMGs do not share a backbone!')
+            rejoins[k] = [(index[u], index[v]) for u, v in amg.rejoins]
+        names = np.array([str(amg.name) for amg in amgs], dtype=str)
+        attrs = {'vertices': vertices,
+                 'chromatins': [[index[u], index[v]]
+                                    for u, v in first.chromatins],
+                 'dsbs': [[index[u], index[v]] for u, v in first.dsbs]}
+        write_arrays(filename, {'rejoins': rejoins, 'names': names}, attrs)
+
+    def __len__(self):
+        return len(self.rejoins)
+
+    def __getitem__(self, i):
+        """
+        Read one AMG.
+
+        Parameters
+        ----------
+        i : int
+            The position of the AMG in the store.
+
+        Returns
+        -------
+        AberrationMultigraph
+            The stored AMG.
+        """
+        rejoins = [(self.vertices[u], self.vertices[v])
+                    for u, v in self.rejoins[i].tolist()]
+        return AberrationMultigraph(self.chromatins, self.dsbs, rejoins,
+                                    str(self.names[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class AMGSequenceStore:
+    """
+    A memory-mapped, delta-encoded enumeration of AMGs sharing one backbone.
+
+    The AMGs are the fixed rejoin edges of the backbone together with the new
+    rejoin edges of every completion, in the order they were added while
+    backtracking. Completion ``i`` is stored as the length of the prefix it
+    shares with completion ``i-1`` and the edges after that prefix. Every
+    ``keyframe``-th completion is stored in full, so reading any AMG decodes
+    at most ``keyframe`` completions, while iteration decodes each once.
+
+    Attributes
+    ----------
+    chromatins : tuple
+        Chromatin edges of the backbone.
+    dsbs : tuple
+        DSB edges of the backbone.
+    rejoins : list of tuple
+        Rejoin edges shared by all AMGs.
+    vertices : list
+        Vertex labels ordered by index.
+    keyframe : int
+        The distance between completions stored in full.
+    prefix : numpy.ndarray
+        Memory-mapped length of the shared prefix of every completion.
+    offsets : numpy.ndarray
+        Completion ``i`` stores the edges ``edges[offsets[i]:offsets[i+1]]``.
+    edges : numpy.ndarray
+        Memory-mapped rejoin edges after the shared prefixes, as vertex
+        indices.
+    """
+    def __init__(self, filename):
+        """
+        Parameters
+        ----------
+        filename : str
+            A file written by :meth:`AMGSequenceStore.write`.
+        """
+        arrays, attrs = open_arrays(filename)
+        self.vertices = [_label(v) for v in attrs['vertices']]
+        self.chromatins = tuple(tuple(self.vertices[i] for i in edge)
+                                    for edge in attrs['chromatins'])
+        self.dsbs = tuple(tuple(self.vertices[i] for i in edge)
+                            for edge in attrs['dsbs'])
+        self.rejoins = [tuple(self.vertices[i] for i in edge)
+                            for edge in attrs['rejoins']]
+        self.keyframe = attrs['keyframe']
+        self._name, self._start = attrs['name'], attrs['start']
+        self.prefix = arrays['prefix']
+        self.offsets = arrays['offsets']
+        self.edges = arrays['edges']
+
+    @staticmethod
+    def write(filename, chromatins, dsbs, completions, rejoins=(), name='',
+              start=0, keyframe=KEYFRAME_INTERVAL):
+        """
+        Write an enumeration of completions to a store file.
+
+        Vertex labels must be JSON-serializable; tuple labels such as
+        ``BreakLocation`` are read back as plain tuples.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+        chromatins, dsbs : iterable of tuple
+            The backbone.
+        completions : iterable of list of tuple
+            The new rejoin edges of every completion, in the order they were
+            added, e.g., from :meth:`ReducedIAMG.complete_rejoins`.
+        rejoins : iterable of tuple, optional
+            Rejoin edges shared by all AMGs, by default none.
+        name : str, optional
+            AMG ``i`` is named ``name+str(start+i)``, by default ``str(i)``.
+        start : int, optional
+            The number in the name of the first AMG, by default 0.
+        keyframe : int, optional
+            Store every ``keyframe``-th completion in full, by default
+            ``KEYFRAME_INTERVAL``.
+
+        Returns
+        -------
+        int
+            The number of AMGs written.
+        """
+        chromatins, dsbs, rejoins = list(chromatins), list(dsbs), list(rejoins)
+        vertices = list(dict.fromkeys(v for edges in (chromatins, dsbs, rejoins)
+                                        for edge in edges for v in edge))
+        index = {v: i for i, v in enumerate(vertices)}
+        dtype = np.uint16 if len(vertices) <= 1 << 16 else np.uint32
+        prefix, offsets, edges = [], [0], []
+        previous = []
+        for i, completion in enumerate(completions):
+            completion = [(index[u], index[v]) for u, v in completion]
+            shared = 0
+            if i % keyframe:
+                for old, new in zip(previous, completion):
+                    if old != new:
+                        break
+                    shared += 1
+            prefix.append(shared)
+            edges.extend(completion[shared:])
+            offsets.append(len(edges))
+            previous = completion
+        attrs = {'vertices': vertices,
+                 'chromatins': [[index[u], index[v]] for u, v in chromatins],
+                 'dsbs': [[index[u], index[v]] for u, v in dsbs],
+                 'rejoins': [[index[u], index[v]] for u, v in rejoins],
+                 'keyframe': keyframe, 'name': name, 'start': start}
+        write_arrays(filename,
+                     {'prefix': np.array(prefix, dtype=np.uint32),
+                      'offsets': np.array(offsets, dtype=np.int64),
+                      'edges': np.array(edges, dtype=dtype).reshape(-1, 2)},
+                     attrs)
+        return len(prefix)
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def completion(self, i):
+        """
+        Decode the new rejoin edges of one completion.
+
+        Parameters
+        ----------
+        i : int
+            The position of the completion in the store.
+
+        Returns
+        -------
+        list of tuple
+            The new rejoin edges, in the order they were added.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(f'No completion {i} in the store!')
+        first = i - i % self.keyframe
+        return next(itertools.islice(self._completions(first, i+1),
+                                     i-first, None))
+
+    def __getitem__(self, i):
+        """
+        Read one AMG.
+
+        Parameters
+        ----------
+        i : int
+            The position of the AMG in the store.
+
+        Returns
+        -------
+        AberrationMultigraph
+            The stored AMG.
+        """
+        return self._amg(i, self.completion(i))
+
+    def __iter__(self):
+        for i, completion in enumerate(self._completions(0, len(self))):
+            yield self._amg(i, completion)
+
+    def completions(self):
+        """
+        Iterate over the new rejoin edges of all completions without building
+        the AMGs.
+
+        Yields
+        ------
+        list of tuple
+            The new rejoin edges of a completion.
+        """
+        return self._completions(0, len(self))
+
+    def _completions(self, first, stop):
+        """
+        Helper function to decode the completions from ``first``, a keyframe,
+        up to ``stop``, reading the arrays in blocks between keyframes.
+        """
+        vertices = self.vertices
+        current = []
+        for block in range(first, stop, self.keyframe):
+            end = min(block+self.keyframe, stop)
+            prefix = self.prefix[block:end].tolist()
+            offsets = self.offsets[block:end+1].tolist()
+            edges = self.edges[offsets[0]:offsets[-1]].tolist()
+            base = offsets[0]
+            for k, shared in enumerate(prefix):
+                current = current[:shared] + [
+                    (vertices[u], vertices[v])
+                        for u, v in edges[offsets[k]-base:offsets[k+1]-base]]
+                yield current
+
+    def _amg(self, i, completion):
+        """
+        Helper function to build the AMG of a completion.
+        """
+        return AberrationMultigraph(self.chromatins, self.dsbs,
+                                    self.rejoins+completion,
+                                    self._name+str(self._start+i))
+
+
+def _label(vertex):
+    """
+    Helper function to restore a vertex label decoded from JSON.
+
+    Parameters
+    ----------
+    vertex : object
+        A decoded label.
+
+    Returns
+    -------
+    object
+        The label, with lists turned back into (hashable) tuples.
+    """
+    return tuple(_label(v) for v in vertex) if isinstance(vertex, list) else vertex
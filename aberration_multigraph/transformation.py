@@ -0,0 +1,345 @@
+"""
+Shortest transformation paths between aberration multigraphs (AMGs).
+
+Two AMGs on the same chromosomal backbone differ only in their rejoin edges.
+This module searches for a shortest sequence of elementary operations turning
+one into the other, where the operations are the ones already implemented on
+:class:`~aberration_multigraph.amg.AberrationMultigraph`:
+
+- **Total twists** (:meth:`~AberrationMultigraph.total_twist`)
+- **Total swaps** (:meth:`~AberrationMultigraph.total_swap`)
+- **Chromosome edge reversals** (:meth:`~AberrationMultigraph.edge_reversal`)
+
+Unlike :class:`~aberration_multigraph.representative.AMGRepresentative`, the
+search never enumerates the space of AMGs. States are explored lazily from both
+ends at once and each state is stored as a compact byte string encoding the
+rejoin partner of every vertex.
+
+Every operation is an involution, so the space of AMGs under these operations
+is an undirected graph and the backward search uses the same moves as the
+forward search.
+"""
+
+from array import array
+from collections import deque
+from aberration_multigraph.amg import AberrationMultigraph
+
+OPERATIONS = ('twist', 'swap', 'reversal')
+
+
+class MoveSpace:
+    """
+    Compact encoding of the AMGs on a fixed backbone and the moves between them.
+
+    Vertices are indexed by their position in the backbone, chromosome by
+    chromosome, exactly as in :class:`AberrationMultigraph`.
+    A state is a byte string of unsigned 16-bit integers whose ``i``-th entry
+    is the index of the vertex rejoined with vertex ``i``.
+    Telomeres, and more generally vertices without a rejoin, are their own
+    partner.
+
+    Attributes
+    ----------
+    chromatins : tuple
+        Chromatin edges of the backbone.
+    dsbs : tuple
+        DSB edges of the backbone.
+    vertices : list
+        Vertex labels ordered by index.
+    index : dict
+        Maps vertex labels to their index.
+    chromosomes : list of tuple
+        The first and last vertex index of every chromosome.
+    operations : tuple of str
+        The operations used to generate neighbouring states.
+    """
+    def __init__(self, chromatins, dsbs, operations=OPERATIONS):
+        """
+        Parameters
+        ----------
+        chromatins : iterable
+            Chromatin edges of the backbone.
+        dsbs : iterable
+            DSB edges of the backbone.
+        operations : iterable of str, optional
+            Any of ``'twist'``, ``'swap'`` and ``'reversal'``,
+             by default all of them.
+        """
+        backbone = AberrationMultigraph(chromatins, dsbs, [])
+        self.chromatins = backbone.chromatins
+        self.dsbs = backbone.dsbs
+        self.operations = tuple(operations)
+        for operation in self.operations:
+            if operation not in OPERATIONS:
+                raise ValueError(f'Unknown operation {operation}!')
+        self.vertices = list(backbone.graph.nodes)
+        if len(self.vertices) > 1 << 16:
+            raise ValueError('Too many vertices to encode compactly!')
+        self.index = {v: i for i, v in enumerate(self.vertices)}
+        self.chromosomes = []
+        for k in range(backbone.num_chromosome):
+            chrom_nodes = [self.index[v] for v in self.vertices
+                            if backbone.graph.nodes[v]['chromosome'] == k]
+            self.chromosomes.append((min(chrom_nodes), max(chrom_nodes)))
+        self.reversal_edges = [(self.index[u], self.index[v])
+                                for u, v in self.chromatins]
+
+    def encode(self, amg):
+        """
+        Encode the rejoin edges of an AMG on this backbone as a state.
+
+        Parameters
+        ----------
+        amg : AberrationMultigraph
+            An AMG whose chromatin and DSB edges match this backbone.
+
+        Returns
+        -------
+        bytes
+            The compact state of ``amg``.
+        """
+        if amg.chromatins != self.chromatins or amg.dsbs != self.dsbs:
+            raise ValueError('AMG does not share the backbone of this space!')
+        partner = array('H', range(len(self.vertices)))
+        for u, v in amg.rejoins:
+            partner[self.index[u]] = self.index[v]
+            partner[self.index[v]] = self.index[u]
+        return partner.tobytes()
+
+    def decode(self, state, name=''):
+        """
+        Build the AMG encoded by a state.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+        name : str, optional
+            A name for the AMG, by default ''
+
+        Returns
+        -------
+        AberrationMultigraph
+            The AMG encoded by ``state``.
+        """
+        partner = array('H', state)
+        rejoins = [(self.vertices[i], self.vertices[j])
+                    for i, j in enumerate(partner) if i < j]
+        return AberrationMultigraph(self.chromatins, self.dsbs, rejoins, name)
+
+    def twist(self, state, chromosome):
+        """
+        Apply a total twist to a state.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+        chromosome : int
+            The chromosome to be reversed.
+
+        Returns
+        -------
+        bytes
+            The state of the twisted AMG.
+        """
+        start, stop = self.chromosomes[chromosome]
+        return self._relabel(state,
+                             lambda i: stop-i+start if start <= i <= stop
+                                        else i)
+
+    def swap(self, state, chrom_1, chrom_2):
+        """
+        Apply a total swap of two chromosomes of equal length to a state.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+        chrom_1, chrom_2 : int
+            The chromosomes to be swapped.
+
+        Returns
+        -------
+        bytes
+            The state of the AMG with both chromosomes swapped.
+            The state is unchanged if the chromosomes differ in length.
+        """
+        start_1, stop_1 = self.chromosomes[chrom_1]
+        start_2, stop_2 = self.chromosomes[chrom_2]
+        if stop_1-start_1 != stop_2-start_2 or chrom_1 == chrom_2:
+            return state
+        def relabel(i):
+            if start_1 <= i <= stop_1:
+                return i-start_1+start_2
+            if start_2 <= i <= stop_2:
+                return i-start_2+start_1
+            return i
+        return self._relabel(state, relabel)
+
+    def reversal(self, state, edge):
+        """
+        Apply a chromosome edge reversal to a state.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+        edge : tuple of int
+            The indices of the endpoints of a chromatin edge.
+
+        Returns
+        -------
+        bytes
+            The state after exchanging the rejoin partners of both endpoints.
+            The state is unchanged if either endpoint is not rejoined or if
+             both endpoints are rejoined with each other.
+        """
+        u, v = edge
+        partner = array('H', state)
+        x, y = partner[u], partner[v]
+        if x == u or y == v or x == v:
+            return state
+        partner[u], partner[y] = y, u
+        partner[v], partner[x] = x, v
+        return partner.tobytes()
+
+    def moves(self, state):
+        """
+        Generate all states one operation away from a state.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+
+        Yields
+        ------
+        tuple
+            Pairs ``(operation, new_state)`` where ``operation`` is one of
+            ``('twist', k)``, ``('swap', i, j)`` or ``('reversal', (u, v))``
+            with ``u`` and ``v`` vertex labels.
+        """
+        if 'twist' in self.operations:
+            for k in range(len(self.chromosomes)):
+                yield ('twist', k), self.twist(state, k)
+        if 'swap' in self.operations:
+            for i in range(len(self.chromosomes)):
+                for j in range(i+1, len(self.chromosomes)):
+                    new_state = self.swap(state, i, j)
+                    if new_state != state:
+                        yield ('swap', i, j), new_state
+        if 'reversal' in self.operations:
+            for u, v in self.reversal_edges:
+                new_state = self.reversal(state, (u, v))
+                if new_state != state:
+                    yield (('reversal', (self.vertices[u], self.vertices[v])),
+                            new_state)
+
+    def _relabel(self, state, relabel):
+        """
+        Helper method to move every vertex of a state to a new index.
+
+        Parameters
+        ----------
+        state : bytes
+            A state of this space.
+        relabel : callable
+            A bijection on vertex indices mapping the backbone to itself.
+
+        Returns
+        -------
+        bytes
+            The state whose rejoins are the relabelled rejoins of ``state``.
+        """
+        partner = array('H', state)
+        new_partner = array('H', partner)
+        for i, j in enumerate(partner):
+            new_partner[relabel(i)] = relabel(j)
+        return new_partner.tobytes()
+
+
+def shortest_transformation(source, target, operations=OPERATIONS,
+                            max_depth=None):
+    """
+    Find a shortest sequence of operations turning one AMG into another.
+
+    The search is a bidirectional breadth-first search that always expands the
+    smaller frontier, so only states within half the distance of either AMG
+    are ever stored.
+
+    Parameters
+    ----------
+    source : AberrationMultigraph
+        The AMG to start from.
+    target : AberrationMultigraph
+        The AMG to reach. It must have the same chromatin and DSB edges as
+         ``source``.
+    operations : iterable of str, optional
+        Any of ``'twist'``, ``'swap'`` and ``'reversal'``,
+         by default all of them.
+    max_depth : int, optional
+        Give up on paths longer than this, by default None (no limit).
+
+    Returns
+    -------
+    list or None
+        The operations, in order, as described in :meth:`MoveSpace.moves`.
+        Applying them with ``total_twist``, ``total_swap`` and
+         ``edge_reversal`` to ``source`` yields ``target``.
+        Returns None if ``target`` cannot be reached.
+    """
+    space = MoveSpace(source.chromatins, source.dsbs, operations)
+    start, goal = space.encode(source), space.encode(target)
+    if start == goal:
+        return []
+    # parents maps a state to (previous state, operation) on either side
+    parents = ({start: None}, {goal: None})
+    frontiers = ([start], [goal])
+    depth = 0
+    while frontiers[0] and frontiers[1]:
+        if max_depth is not None and depth >= max_depth:
+            return None
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        seen, other = parents[side], parents[1-side]
+        next_frontier = []
+        for state in frontiers[side]:
+            for operation, new_state in space.moves(state):
+                if new_state in seen:
+                    continue
+                seen[new_state] = (state, operation)
+                if new_state in other:
+                    return _join_paths(parents, new_state)
+                next_frontier.append(new_state)
+        frontiers = ((next_frontier, frontiers[1]) if side == 0
+                        else (frontiers[0], next_frontier))
+        depth += 1
+    return None
+
+
+def _join_paths(parents, meeting):
+    """
+    Helper function to rebuild the operation sequence through a meeting state.
+
+    Parameters
+    ----------
+    parents : tuple of dict
+        Parent pointers of the forward and the backward search.
+    meeting : bytes
+        A state reached by both searches.
+
+    Returns
+    -------
+    list
+        The operations from the source to the target.
+    """
+    forward = deque()
+    state = meeting
+    while parents[0][state] is not None:
+        state, operation = parents[0][state]
+        forward.appendleft(operation)
+    state = meeting
+    while parents[1][state] is not None:
+        state, operation = parents[1][state]
+        forward.append(operation)
+    return list(forward)
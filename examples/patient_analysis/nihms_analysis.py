@@ -1,6 +1,6 @@
 import os
 from collections import defaultdict
-from nihms_patient import NIHMSPatient
+from nihms_patient import NIHMSCohort
 from sv_utils import BreakLocation
 
 def cycle_structure_str(cs):
@@ -12,9 +12,7 @@ def cycle_structure_str(cs):
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 os.chdir(dir_path+'/../../data/')
-data_file = 'P05-1657.pickle'
-    
-patient = NIHMSPatient.load_from_file(data_file, 'nihms_files_backup/')
+patient = NIHMSCohort.load('nihms_cohort.store').patient('P05-1657')
 
 subset_twist_edge_pairs = [((4,), None),
                            ((7,), ((BreakLocation(chrom=7, bp=3581948), BreakLocation(chrom=7, bp=46822440)), )),
@@ -33,6 +31,8 @@ for subset, twist_edges in subset_twist_edge_pairs:
         amg_names = {amg: i for i, amg in enumerate(amgs)}
         amg_cs = {}
         for edge in twist_edges:
+            # AMG vertices are integer ids of the break locations
+            edge = tuple(sorted(patient.vertex_id(v) for v in edge))
             related_pairs = set()
             related_cs = defaultdict(int)
             for amg in amgs:
@@ -0,0 +1,237 @@
+"""
+Diameter and cycle structure statistics for the whole NIHMS cohort.
+
+Every (patient, chromosome cluster) pair is a job. Jobs are sized by the number
+of completions of their incomplete AMG and run largest-first on a process pool,
+so the longest jobs do not straggle at the end of the run. Clusters with more
+than ``MAX_FREE_VERTICES`` free ends cannot be enumerated; for those, only the
+bounds on their invariants from ``IncompleteAMG.invariant_bounds`` are recorded.
+Every finished job is appended to a results file as one JSON line; rerunning
+the script skips the jobs already recorded there, so a killed run resumes where
+it stopped. Finally, the per-job counters are merged into cohort tables. Set
+``AMG_CACHE`` to a cache file to reuse the statistics of identical clusters
+across patients and runs.
+
+Run ``nihms_patient.py`` first to create ``data/nihms_cohort.store``.
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from nihms_patient import NIHMSCohort
+from aberration_multigraph.amg import cycle_structure_counts
+
+COHORT_FILE = 'nihms_cohort.store'
+RESULTS_FILE = 'nihms_cohort_amg.jsonl'
+MAX_WORKERS = os.cpu_count()
+MAX_FREE_VERTICES = 16
+
+_cohort = None
+
+
+def cycle_structure_str(cs):
+    cs_str = ''
+    for length in sorted(cs):
+        cs_str += f'{cs[length]}C{length//2}+'
+    return cs_str[:-1]
+
+
+def _diameter(value):
+    """Convert a diameter, e.g., a key read back from JSON, to an int or inf."""
+    value = float(value)
+    return int(value) if value != float('inf') else value
+
+
+def _init_worker(cohort_file):
+    """Open the memory-mapped cohort once per worker process."""
+    global _cohort
+    _cohort = NIHMSCohort.load(cohort_file)
+
+
+def _job_size(pat_id, subset, max_free):
+    """
+    Count the completions of a job.
+
+    Returns 0 if the job cannot be built and None if it has more than
+     ``max_free`` free vertices.
+    """
+    try:
+        inc_amg = _cohort.patient(pat_id).amg(subset)
+    except ValueError:
+        return 0
+    return inc_amg.count_amgs() if len(inc_amg.free) <= max_free else None
+
+
+def _run_job(pat_id, subset):
+    """Count the invariants of all completions of a job, or look them up in the
+    result cache."""
+    result = {'patient': pat_id, 'subset': list(subset)}
+    try:
+        inc_amg = _cohort.patient(pat_id).amg(subset)
+    except ValueError as error:
+        result['error'] = str(error)
+        return result
+    stats = inc_amg.statistics()
+    result['count'] = stats['count']
+    result['diameters'] = {str(diam): count
+                            for diam, count in stats['diameters'].items()}
+    result['cycle_structures'] = {
+        cycle_structure_str(cycle_structure_counts(label)): count
+            for label, count in stats['cycle_structures'].items()}
+    return result
+
+
+def _bound_job(pat_id, subset):
+    """Bound the invariants of all completions of a job without enumerating."""
+    result = {'patient': pat_id, 'subset': list(subset)}
+    try:
+        inc_amg = _cohort.patient(pat_id).amg(subset)
+    except ValueError as error:
+        result['error'] = str(error)
+        return result
+    bounds = inc_amg.invariant_bounds()
+    result['bounds'] = {'cycles': list(bounds.cycles),
+                        'cycle_lengths': list(bounds.cycle_lengths),
+                        'diameter': [_diameter(d) for d in bounds.diameter]}
+    return result
+
+
+def load_results(results_file):
+    """
+    Read the jobs finished by previous runs.
+
+    A partially written last line, e.g., from a killed run, is ignored, and so
+    are jobs that were only bounded, which are cheap to bound again.
+
+    Parameters
+    ----------
+    results_file : str
+        The checkpoint file.
+
+    Returns
+    -------
+    dict
+        Maps (patient, subset) to the recorded result.
+    """
+    results = {}
+    if not os.path.exists(results_file):
+        return results
+    with open(results_file) as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'bounds' in result:
+                continue
+            results[(result['patient'], tuple(result['subset']))] = result
+    return results
+
+
+def run_cohort(cohort_file, results_file, max_workers=MAX_WORKERS,
+               max_free=MAX_FREE_VERTICES):
+    """
+    Run all jobs not yet recorded in the results file.
+
+    Parameters
+    ----------
+    cohort_file : str
+        The cohort store written by ``nihms_patient.py``.
+    results_file : str
+        The checkpoint file, appended to as jobs finish.
+    max_workers : int, optional
+        The number of worker processes, by default one per CPU.
+    max_free : int, optional
+        Only bound jobs with more free vertices, by default
+         ``MAX_FREE_VERTICES``.
+
+    Returns
+    -------
+    dict
+        Maps (patient, subset) to the results of all finished jobs.
+    """
+    cohort = NIHMSCohort.load(cohort_file)
+    results = load_results(results_file)
+    jobs = [(patient.id, tuple(sorted(cluster)))
+                for patient in cohort.patients()
+                for cluster in patient.clusters()]
+    jobs = [job for job in jobs if job not in results]
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                             initargs=(cohort_file,)) as pool:
+        sizes = pool.map(_job_size, [pat_id for pat_id, _ in jobs],
+                         [subset for _, subset in jobs], [max_free]*len(jobs))
+        sizes = list(sizes)
+        sized = [(size, job) for size, job in zip(sizes, jobs)
+                    if size is not None]
+        large = [job for size, job in zip(sizes, jobs) if size is None]
+        jobs = [job for _, job in sorted(sized, reverse=True)]
+        print(f'{len(results)} jobs already done, {len(jobs)} to go, '
+              f'{len(large)} too large to enumerate and only bounded.')
+        futures = [pool.submit(_run_job, *job) for job in jobs]
+        futures += [pool.submit(_bound_job, *job) for job in large]
+        with open(results_file, 'a') as checkpoint:
+            for future in as_completed(futures):
+                result = future.result()
+                checkpoint.write(json.dumps(result)+'\n')
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                results[(result['patient'], tuple(result['subset']))] = result
+                print(f"Finished {result['patient']} {result['subset']}")
+    return results
+
+
+def merge_results(results):
+    """
+    Merge the counters of all jobs into cohort tables.
+
+    Parameters
+    ----------
+    results : dict
+        Results as returned by :func:`run_cohort`.
+
+    Returns
+    -------
+    tuple of Counter
+        Number of AMGs by diameter and by cycle structure over the cohort,
+         and the number of AMGs per patient. Diameters are numbers, although
+         they are strings in the results, as keys of JSON objects.
+    """
+    diams, css, counts = Counter(), Counter(), Counter()
+    for result in results.values():
+        if 'error' in result or 'bounds' in result:
+            continue
+        for diam, count in result['diameters'].items():
+            diams[_diameter(diam)] += count
+        css.update(result['cycle_structures'])
+        counts[result['patient']] += result['count']
+    return diams, css, counts
+
+
+def write_table(filename, header, counter):
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(sorted(counter.items()))
+
+
+if __name__ == '__main__':
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path+'/../../data/')
+    results = run_cohort(COHORT_FILE, RESULTS_FILE)
+    failed = [key for key, result in results.items() if 'error' in result]
+    bounded = [key for key, result in results.items() if 'bounds' in result]
+    print(f'{len(results)} jobs finished, {len(failed)} could not be built, '
+          f'{len(bounded)} were only bounded.')
+    diams, css, counts = merge_results(results)
+    write_table('nihms_cohort_diameters.csv', ['diameter', 'amgs'], diams)
+    write_table('nihms_cohort_cycle_structures.csv',
+                ['cycle_structure', 'amgs'], css)
+    write_table('nihms_cohort_counts.csv', ['patient', 'amgs'], counts)
+    print("Diameter distribution:")
+    for diam, count in sorted(diams.items()):
+        print(f'{diam}: {count}')
+    print("Cycle structure distribution")
+    for cs, count in css.most_common():
+        print(f'{cs}: {count}')
@@ -1,86 +1,233 @@
 from sv_utils import BreakLocation
+from collections import OrderedDict
 from aberration_multigraph.incomplete_amg import IncompleteAMG
+from aberration_multigraph.store import write_arrays, open_arrays
+import numpy as np
 import os
 import pickle
 
 class NIHMSPatient:
-    def __init__(self, id, breakpoints=(), rejoins=()):
+    """
+    A class to store a patient's structural variations from the NIHMS dataset.
+
+    Incomplete AMGs for subsets of chromosomes are built from per-chromosome
+     indexes computed once per patient.
+    Their vertices are compact integer ids that follow the order of the
+     corresponding `BreakLocation` objects, which can be recovered from the
+     label table.
+
+    Attributes
+    ----------
+    id : str
+        The patient's identifier.
+    breakpoints : list
+        Sorted pairs (chromosome, base pair) of all breakpoints.
+    rejoins : list
+        Pairs of (chromosome, base pair, strand) triples, one per SV.
+    cache_size : int
+        The maximum number of subsets whose edges are kept by :meth:`amg`.
+    """
+    def __init__(self, id, breakpoints=(), rejoins=(), cache_size=32):
         self.id = id
         self.breakpoints = list(breakpoints)
         self.rejoins = list(rejoins)
-        self._vertices = {}
+        self.cache_size = cache_size
         self._amg = None
+        self._reset_index()
 
     def add_breakpoint(self, breakpoint):
         self.breakpoints.append(breakpoint)
+        self._reset_index()
     
     def add_rejoin(self, rejoin):
         self.rejoins.append(rejoin)
+        self._reset_index()
 
     def amg(self, subset):
-        self._generate_vertices(subset)
-        suffix = '_'.join(str(x) for x in subset)
-
-        # generate incomplete amg
-        self._amg = IncompleteAMG(self._chromatin_edges(subset),
-                                  self._dsb_edges(subset),
-                                  self._rejoin_edges(subset),
-                                  self.id+'_'+suffix)
+        """
+        Build the incomplete AMG induced by a subset of chromosomes.
+
+        The edges of a subset are cached by the set of chromosomes, but every
+         call builds a new AMG, so that adding rejoins to it in place does
+         not affect later calls.
+
+        Parameters
+        ----------
+        subset : iterable of int
+            The chromosomes to include.
+
+        Returns
+        -------
+        IncompleteAMG
+            The AMG of the breakpoints and rejoins within ``subset``, with
+             integer vertices (see :meth:`vertex_label`).
+        """
+        key = frozenset(subset)
+        if key in self._amg_cache:
+            self._amg_cache.move_to_end(key)
+        else:
+            self._amg_cache[key] = self._subset_edges(key)
+            if len(self._amg_cache) > self.cache_size:
+                self._amg_cache.popitem(last=False)
+        chromatins, dsbs, rejoins, name = self._amg_cache[key]
+        self._amg = IncompleteAMG(chromatins, dsbs, rejoins, name)
         return self._amg
 
-    def _generate_vertices(self, subset):
-        for chrom, bp in self.breakpoints:
-            if chrom not in subset:
-                continue
-            self._vertices[(chrom, bp)] = BreakLocation(chrom, bp)
-            self._vertices[(chrom, bp+1)] = BreakLocation(chrom, bp+1)
-    
-    def _dsb_edges(self, subset):
-        dsbs = []
-        for chrom, bp in self.breakpoints:
-            if chrom not in subset:
-                continue
-            dsbs.append((self._vertices[(chrom, bp)],
-                         self._vertices[(chrom, bp+1)]))
-        return dsbs
-    
-    def _chromatin_edges(self, subset):
-        chroms = []
-        prev_chrom = prev_bp = None
+    def _subset_edges(self, key):
+        """
+        Collect the edges of the incomplete AMG induced by a set of
+         chromosomes.
+
+        Returns
+        -------
+        tuple
+            The chromatin, DSB and rejoin edges as tuples, and the name of
+             the AMG.
+        """
+        if self._labels is None:
+            self._build_index()
+        chromatins, dsbs, rejoins = [], [], []
+        for chrom in sorted(key):
+            chromatins += self._chrom_chromatins.get(chrom, [])
+            dsbs += self._chrom_dsbs.get(chrom, [])
+        for (c1, c2), edges in self._pair_rejoins.items():
+            if c1 in key and c2 in key:
+                rejoins += edges
+        suffix = '_'.join(str(x) for x in sorted(key))
+        return (tuple(chromatins), tuple(dsbs), tuple(rejoins),
+                self.id+'_'+suffix)
+
+    def vertex_label(self, vertex):
+        """
+        Look up the break location of a vertex of an incomplete AMG.
+
+        Parameters
+        ----------
+        vertex : int
+            A vertex id.
+
+        Returns
+        -------
+        BreakLocation
+            The location represented by ``vertex``.
+        """
+        if self._labels is None:
+            self._build_index()
+        return self._labels[vertex]
+
+    def vertex_id(self, location):
+        """
+        Look up the vertex id of a break location.
+
+        Parameters
+        ----------
+        location : BreakLocation
+            A breakpoint location, or a telomere at base pair 0 or infinity.
+
+        Returns
+        -------
+        int
+            The vertex id used in incomplete AMGs of this patient.
+        """
+        if self._labels is None:
+            self._build_index()
+        return self._ids[location]
+
+    def clusters(self):
+        """
+        Group the chromosomes of this patient into independent clusters.
+
+        Two chromosomes belong to the same cluster if they are linked by a
+         chain of rejoins, computed with a union-find over the rejoins.
+        Chromosomes with breakpoints but no rejoin to another chromosome form
+         clusters of their own.
+
+        Returns
+        -------
+        list of frozenset
+            The clusters, ordered by their smallest chromosome.
+        """
+        parent = {chrom: chrom for chrom, _ in self.breakpoints}
+
+        def find(chrom):
+            while parent[chrom] != chrom:
+                parent[chrom] = parent[parent[chrom]]
+                chrom = parent[chrom]
+            return chrom
+
+        for (c1, _, _), (c2, _, _) in self.rejoins:
+            parent.setdefault(c1, c1)
+            parent.setdefault(c2, c2)
+            root_1, root_2 = find(c1), find(c2)
+            if root_1 != root_2:
+                parent[max(root_1, root_2)] = min(root_1, root_2)
+        clusters = {}
+        for chrom in parent:
+            clusters.setdefault(find(chrom), set()).add(chrom)
+        return [frozenset(clusters[root]) for root in sorted(clusters)]
+
+    def cluster_amgs(self):
+        """
+        Build one incomplete AMG per independent cluster of chromosomes.
+
+        Returns
+        -------
+        dict
+            Maps every cluster returned by :meth:`clusters` to its
+             ``IncompleteAMG``.
+        """
+        return {cluster: self.amg(sorted(cluster))
+                    for cluster in self.clusters()}
+
+    def _reset_index(self):
+        """
+        Invalidate the per-chromosome indexes and the cache of subset edges.
+        """
+        self._labels = None
+        self._ids = None
+        self._chrom_chromatins = {}
+        self._chrom_dsbs = {}
+        self._pair_rejoins = {}
+        self._amg_cache = OrderedDict()
+
+    def _build_index(self):
+        """
+        Intern all break locations and index the edges by chromosome.
+
+        Every breakpoint (chrom, bp) contributes the vertices (chrom, bp) and
+         (chrom, bp+1) joined by a DSB edge, and every chromosome with a
+         breakpoint contributes telomeres (chrom, 0) and (chrom, inf).
+        Vertex ids are assigned in sorted order of these locations.
+        """
+        by_chrom = {}
         for chrom, bp in self.breakpoints:
-            if chrom not in subset:
-                continue
-            if prev_chrom is None:
-                prev_chrom = 0
-            if prev_chrom != chrom:
-                if prev_bp is not None:
-                    chroms.append((self._vertices[(prev_chrom, prev_bp+1)],
-                                    BreakLocation(prev_chrom, float('inf'))))
-                chroms.append((BreakLocation(chrom, 0),
-                               self._vertices[(chrom, bp)]))
-            else:
-                chroms.append((self._vertices[(prev_chrom, prev_bp+1)],
-                               self._vertices[(chrom, bp)]))
-            prev_chrom, prev_bp = chrom, bp
-        if prev_chrom != None:
-            chroms.append((self._vertices[(prev_chrom, prev_bp+1)],
-                            BreakLocation(prev_chrom, float('inf'))))
-        return chroms
-
-    def _rejoin_edges(self, subset):
-        rejoin_edges = []
-        for r1, r2 in self.rejoins:
-            c1, bp1, loc1 = r1
-            c2, bp2, loc2 = r2
-            if c1 not in subset or c2 not in subset:
-                continue
+            by_chrom.setdefault(chrom, []).append(bp)
+        locations = set()
+        for chrom, bps in by_chrom.items():
+            bps.sort()
+            locations.add(BreakLocation(chrom, 0))
+            locations.add(BreakLocation(chrom, float('inf')))
+            for bp in bps:
+                locations.add(BreakLocation(chrom, bp))
+                locations.add(BreakLocation(chrom, bp+1))
+        self._labels = sorted(locations)
+        self._ids = {location: i for i, location in enumerate(self._labels)}
+        ids = self._ids
+        for chrom, bps in by_chrom.items():
+            self._chrom_dsbs[chrom] = [(ids[(chrom, bp)], ids[(chrom, bp+1)])
+                                        for bp in bps]
+            ends = ([ids[(chrom, 0)]]
+                    + [ids[(chrom, bp+i)] for bp in bps for i in (0, 1)]
+                    + [ids[(chrom, float('inf'))]])
+            self._chrom_chromatins[chrom] = list(zip(ends[::2], ends[1::2]))
+        for (c1, bp1, loc1), (c2, bp2, loc2) in self.rejoins:
             if loc1 == '+':
                 bp1 += 1
             if loc2 == '+':
                 bp2 += 1
-            rejoin_edges.append((self._vertices[(c1, bp1)],
-                                    self._vertices[(c2, bp2)]))
-        return rejoin_edges
+            key = (c1, c2) if c1 <= c2 else (c2, c1)
+            self._pair_rejoins.setdefault(key, []).append((ids[(c1, bp1)],
+                                                           ids[(c2, bp2)]))
 
     def save_to_file(self, filename='', path=''):
         if filename == '':
@@ -90,36 +237,162 @@ class NIHMSPatient:
 
     @staticmethod
     def load_from_file(filename, path=''):
-        file = open(path+filename, 'rb')
-        return pickle.load(file)
+        with open(path+filename, 'rb') as file:
+            return pickle.load(file)
+
+class NIHMSCohort:
+    """
+    A columnar store of the structural variations of all NIHMS patients.
+
+    Every SV is a row of the NumPy column arrays below.
+    Rows are grouped by patient, so the SVs of patient ``ids[k]`` are the rows
+     ``offsets[k]`` to ``offsets[k+1]``.
+
+    Attributes
+    ----------
+    ids : numpy.ndarray
+        The patient identifiers, in the order of their rows.
+    offsets : numpy.ndarray
+        The first row of every patient, followed by the total number of rows.
+    chrom1, pos1, chrom2, pos2 : numpy.ndarray
+        Chromosome and position of both breakpoints of every SV.
+    strand1, strand2 : numpy.ndarray
+        Strand of both breakpoints of every SV, True for '+'.
+    """
+    COLUMNS = ('chrom1', 'strand1', 'pos1', 'chrom2', 'strand2', 'pos2')
+
+    def __init__(self, ids, offsets, chrom1, strand1, pos1,
+                 chrom2, strand2, pos2):
+        self.ids = np.asarray(ids)
+        self.offsets = np.asarray(offsets)
+        self.chrom1 = np.asarray(chrom1)
+        self.strand1 = np.asarray(strand1)
+        self.pos1 = np.asarray(pos1)
+        self.chrom2 = np.asarray(chrom2)
+        self.strand2 = np.asarray(strand2)
+        self.pos2 = np.asarray(pos2)
+        self._index = {str(pat_id): k for k, pat_id in enumerate(self.ids)}
+
+    @staticmethod
+    def from_csv(filename):
+        """
+        Parse the NIHMS structural variation table in a single pass.
+
+        Parameters
+        ----------
+        filename : str
+            Path to ``nihms.csv``.
+
+        Returns
+        -------
+        NIHMSCohort
+            The SVs of all patients in the file.
+        """
+        table = np.loadtxt(filename, dtype=str, delimiter=',', skiprows=1,
+                           usecols=(0, 2, 3, 4, 5, 6, 7), encoding='utf-8-sig',
+                           ndmin=2)
+        ids, codes = np.unique(table[:, 0], return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+        table = table[order]
+        offsets = np.searchsorted(codes[order], np.arange(len(ids)+1))
+        return NIHMSCohort(ids, offsets,
+                           table[:, 1].astype(np.int8),
+                           table[:, 2] == '+',
+                           table[:, 3].astype(np.int64),
+                           table[:, 4].astype(np.int8),
+                           table[:, 5] == '+',
+                           table[:, 6].astype(np.int64))
+
+    def save(self, filename):
+        """
+        Save the cohort as a single memory-mappable store file.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+        """
+        write_arrays(filename,
+                     {'ids': self.ids, 'offsets': self.offsets,
+                      **{column: getattr(self, column)
+                            for column in self.COLUMNS}},
+                     {'cohort': 'nihms'})
+
+    @staticmethod
+    def load(filename):
+        """
+        Open a cohort saved with :meth:`save`.
+
+        The columns are memory-mapped, so only the rows of the patients that
+         are actually materialized are read from disk.
+
+        Parameters
+        ----------
+        filename : str
+            The name of the file.
+
+        Returns
+        -------
+        NIHMSCohort
+            The stored cohort.
+        """
+        arrays, attrs = open_arrays(filename)
+        if attrs.get('cohort') != 'nihms':
+            raise ValueError(f'{filename} does not store a NIHMS cohort!')
+        return NIHMSCohort(arrays['ids'], arrays['offsets'],
+                           *(arrays[column] for column in NIHMSCohort.COLUMNS))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pat_id):
+        return pat_id in self._index
+
+    def patient(self, pat_id):
+        """
+        Materialize the data of one patient.
+
+        Parameters
+        ----------
+        pat_id : str
+            The identifier of the patient.
+
+        Returns
+        -------
+        NIHMSPatient
+            The patient with sorted breakpoints and rejoins in file order.
+        """
+        k = self._index[pat_id]
+        rows = slice(self.offsets[k], self.offsets[k+1])
+        chrom1, pos1 = self.chrom1[rows].tolist(), self.pos1[rows].tolist()
+        chrom2, pos2 = self.chrom2[rows].tolist(), self.pos2[rows].tolist()
+        strand1 = ['+' if s else '-' for s in self.strand1[rows]]
+        strand2 = ['+' if s else '-' for s in self.strand2[rows]]
+        breakpoints = sorted(list(zip(chrom1, pos1))+list(zip(chrom2, pos2)))
+        rejoins = list(zip(zip(chrom1, pos1, strand1),
+                           zip(chrom2, pos2, strand2)))
+        return NIHMSPatient(pat_id, breakpoints, rejoins)
+
+    def patients(self):
+        """
+        Materialize all patients one at a time.
+
+        Yields
+        ------
+        NIHMSPatient
+            The patients in the order of ``ids``.
+        """
+        for pat_id in self.ids:
+            yield self.patient(str(pat_id))
+
 
 if __name__ == '__main__':
     dir_path = os.path.dirname(os.path.realpath(__file__))
     os.chdir(dir_path+'/../../data')
-    data_file = 'nihms.csv'
-    patients = {}
-    with open(data_file) as file:
-        headers = file.readline()
-        for entry in file:
-            entry = entry.split(',')
-            pat_id = entry[0]
-            patient = patients.setdefault(pat_id, NIHMSPatient(pat_id))
-            
-            patient.add_breakpoint((int(entry[2]), int(entry[4])))
-            patient.add_breakpoint((int(entry[5]), int(entry[7])))
-
-            r1 = (int(entry[2]), int(entry[4]), entry[3])
-            r2 = (int(entry[5]), int(entry[7]), entry[6])
-            patient.add_rejoin((r1, r2))
-    print(os.getcwd())
-    if not os.path.isdir('nihms_patient_files/'):
-        os.mkdir('nihms_patient_files/')
-    for pat_id, patient in patients.items():
-        print(f"Saving patient {pat_id}")
-        patient.breakpoints.sort()
-        patient.save_to_file(path='nihms_patient_files/')
-        
-    patients = [NIHMSPatient.load_from_file(file, 'nihms_patient_files/')
-                            for file in os.listdir('nihms_patient_files/')]
-    print(len(patients))
-    print(patients[0].id)
\ No newline at end of file
+    cohort = NIHMSCohort.from_csv('nihms.csv')
+    print(f'Saving {len(cohort)} patients')
+    cohort.save('nihms_cohort.store')
+
+    cohort = NIHMSCohort.load('nihms_cohort.store')
+    patient = cohort.patient(str(cohort.ids[0]))
+    print(patient.id, len(patient.rejoins))
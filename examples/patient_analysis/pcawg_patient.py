@@ -1,7 +1,25 @@
 from examples.patient_analysis.sv_utils import BreakLocation, SVVertex, StructuralVariation, CNSegment
+from examples.patient_analysis.sv_utils import read_bedpe, read_cna, StructuralVariationView, cn_segments
+from examples.patient_analysis.sv_utils import cluster_breakpoints
+from aberration_multigraph.incomplete_amg import IncompleteAMG
 from collections import defaultdict
+import numpy as np
 import os
 
+# Error codes of copy number lookups and the messages used in logs
+CN_OK, CN_NA, CN_BELOW, CN_ABOVE, CN_NOT_SEQUENCED = range(5)
+CN_ERRORS = (0, 'NA', '<', '>', 'Not sequenced')
+
+# Codes of validation events and the priorities of their log messages
+(EV_PATIENT, EV_END, EV_NOT_SEQUENCED, EV_MISSING_BPS, EV_DUPLICATE_BPS,
+ EV_SEQUENCE_COMPLETE, EV_REJOINS_MINUS_OK, EV_REJOINS_PLUS_OK, EV_REJOINS,
+ EV_BELOW_PLUS_OK, EV_BELOW, EV_ABOVE_MINUS_OK, EV_ABOVE, EV_CN_NA,
+ EV_CN_NOT_FOUND, EV_REJOINS_OK, EV_FAILED) = range(17)
+EV_PRIORITIES = (5, 5, 5, 5, 5, 5, 1, 1, 5, 1, 5, 1, 5, 5, 5, 5, 5)
+EVENT_DTYPE = np.dtype([('code', np.int8), ('patient', 'U64'),
+                        ('chrom', np.int8), ('bp', np.int64),
+                        ('values', np.int64, (2,))])
+
 class PCAWGPatient:
     """
     A class to store a patient's data from the PCAWG project.
@@ -16,30 +34,58 @@ class PCAWGPatient:
     dataset : str
         Determines the dataset containing the patient.
         Either 'tcga' or 'icgc'.
+    events : list
+        Validation events as compact (code, chrom, bp, values) records; see
+         the `EV_*` codes. Log messages are only rendered on demand.
     logs : list
-        A list of pairs of strings to store logging information and their
-         priorities.
+        The rendered log messages of all events with their priorities.
+    sv_table : numpy.ndarray
+        A structured array with one row per SV observed in this patient, as
+         parsed from the corresponding consensus SV file.
+    cn_table : numpy.ndarray
+        A structured array with one row per CN segment sequenced for this
+         patient, as parsed from the corresponding CNA file.
     bl_to_sv : defaultdict(dict)
         A dictionary to map BreakLocation to SVVertex.
         This prevents constructing multiple SVVertex objects for the same
          breakpoint location.
+        Built from `sv_table` on first access.
     sequence : defaultdict(list)
         A dictionary mapping chromosomes to lists of CNSegment objects that 
          store the sequencing information for this patient from the
          corresponding CNA file.
-    svs : list
-        A list of StructuralVariation objects to store all the SVs obeserved in
-         this patient from the corresponding consensus SV file.
+        Built from `cn_table` on first access.
+    svs : StructuralVariationView
+        A sequence of StructuralVariation objects for all the SVs obeserved in
+         this patient, created from `sv_table` on access.
     bp_slack : int
         An additive error permitted when matching breakpoint locations in
-         SVVertex and CNSegment.
+         SVVertex and CNSegment, and the largest gap between consecutive
+         breakends merged into one location.
+    bp_span : int or None
+        The largest distance between the first and the last breakend merged
+         into one location, or None if unbounded.
 
     Methods
     -------
     _get_sequence(cn_path, cn_extension)
         Loads sequencing information for the patient.
     _get_svs(sv_path, sv_extension)
-        Generates StructuralVariation objects for SVs observed in the patient.
+        Loads the SVs observed in the patient.
+    cn_capacities(subset)
+        Derives completion capacities from the copy numbers of locations.
+    merged_break_locations()
+        Clusters the breakends of all SVs into canonical break locations.
+    amg(subset)
+        Builds the incomplete AMG induced by a subset of chromosomes.
+    clusters()
+        Groups the chromosomes of this patient into independent clusters.
+    cluster_amgs()
+        Builds one incomplete AMG per independent cluster of chromosomes.
+    vertex_label(vertex)
+        Looks up the break location of a vertex of an incomplete AMG.
+    sv_vertices(k)
+        Looks up the rejoin edge of an SV.
     _chrom_to_int(chrom)
         Converts chromosome number from `str` to `int`.
     _create_sv_vertex(bl, pos, sv)
@@ -50,16 +96,25 @@ class PCAWGPatient:
         Checks if the sequencing data for this patient is complete.
     _bp_loc_cn(bl)
         Checks the copy number for the segment containing a break location.
+    bp_locs_cn(bls, offset)
+        Resolves the copy numbers of many break locations at once.
+    break_locations_cn()
+        Resolves the copy numbers of all break locations, with and without
+         slack.
     _bp_loc_rejoins(bl)
         Computes the number of rejoins a breakpoint location is involved in.
     _check_rejoins_cn()
         Checks if for every break location the number of rejoins exceeds the 
          number of copies.
+    render_logs(priority_level)
+        Renders the log messages of the events with at least a given priority.
+    event_table()
+        Exports the events as a structured array.
     write_logs(log_file)
         Write logging info to file and clear logs.
     """
 
-    def __init__(self, id, dataset, bp_slack=2):
+    def __init__(self, id, dataset, bp_slack=2, bp_span=None):
         """
         Parameters
         ----------
@@ -72,6 +127,10 @@ class PCAWGPatient:
         bp_slack : int, optional
             The acceptable absolute error when matching breakpoint locations
              from structural variations with copy number aberrations. 
+        bp_span : int, optional
+            The largest distance between the first and the last breakend
+             merged into one location (see `merged_break_locations`), by
+             default unbounded.
         """
         sv_extension = '.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
         cn_extension = '.consensus.20170119.somatic.cna.txt'
@@ -80,11 +139,16 @@ class PCAWGPatient:
         
         self.id = id
         self.dataset = dataset
-        self.logs = []
-        self.bl_to_sv = defaultdict(dict)
-        self.sequence = defaultdict(list)
-        self.svs = []
+        self.events = []
+        self.sv_table = None
+        self.cn_table = None
         self.bp_slack = bp_slack
+        self.bp_span = bp_span
+        self._bl_to_sv = None
+        self._sequence = None
+        self._locations = None
+        self._cn_segments = {}
+        self._labels = None
 
         self._get_svs(sv_path, sv_extension)
         self._get_sequence(cn_path, cn_extension)
@@ -93,13 +157,9 @@ class PCAWGPatient:
         """Loads sequencing information for the patient.
         
         This internal method uses the input parameters to open the CNA file for
-         this patient and loads these sequences as `CNSegment` objects.
-        Finally, all of these are stored as a list in the `sequence` attribute.
+         this patient and parses it in one pass into the `cn_table` attribute.
         This is the only time the method is called.
 
-        This method raises a ValueError if the file cannot be opened or is in an
-         incompatible format.
-
         Parameters
         ----------
         cn_path : str
@@ -111,33 +171,16 @@ class PCAWGPatient:
         Raises
         ------
         ValueError
-            If the header does not match or CNA file cannot be opened.
+            If the CNA file is in an incompatible format.
         """
-        file = self.id+cn_extension
-        # sequence = defaultdict(list)
-        with open(cn_path+file, 'r') as cnfile:                 #TODO: check if file can be opened
-            headers = cnfile.readline()                         # read headers
-            # if headers.split() != []                          #TODO: check headers
-            for entry in cnfile:
-                entry = entry.split()
-                chrom = self._chrom_to_int(entry[0])
-                for i, x in enumerate(entry[1:]):               # manage scientific notation
-                    if 'e+' in x:
-                        components = x.split('e+')
-                        if len(components) == 2:
-                            b, e = components
-                            entry[i+1] = float(b)*10**int(e)
-                segment = [x if x == 'NA' else int(x)  for x in entry[1:]]
-                self.sequence[chrom].append(CNSegment(*segment))
-        # return sequence
+        self.cn_table = read_cna(cn_path+self.id+cn_extension)
             
     def _get_svs(self, sv_path, sv_extension):
-        """Generates StructuralVariation objects for SVs observed in the patient.
+        """Loads the SVs observed in the patient.
         
         This internal method uses the input parameters to open the consensus SV 
-         file for this patient and loads these SVs as `StructuralVariation`
-         objects.
-        Finally, all of these are stored as a list in the `svs` attribute.
+         file for this patient and parses it in one pass into the `sv_table`
+         attribute.
         This is the only time the method is called.
 
         Parameters
@@ -151,28 +194,295 @@ class PCAWGPatient:
         Raises
         ------
         ValueError
-            If the header does not match or consensus SV file cannot be opened.
+            If the consensus SV file is in an incompatible format.
         """
-        file = self.id+sv_extension
-        # svs = []
-        with open(sv_path+file, 'r') as svfile:                 #TODO: check if file can be opened
-            headers = svfile.readline()                         # read headers
-            # if headers.split() != []                          #TODO: check headers
-            for entry in svfile:
-                entry = entry.split()
-                entry[0] = self._chrom_to_int(entry[0])
-                entry[3] = self._chrom_to_int(entry[3])
-                sv = StructuralVariation(*entry)
-                self.svs.append(sv)
-                bls = (BreakLocation(entry[0], int(entry[1])),
-                        BreakLocation(entry[0], int(entry[2])),
-                        BreakLocation(entry[3], int(entry[4])),
-                        BreakLocation(entry[3], int(entry[5]))
-                    )
+        self.sv_table = read_bedpe(sv_path+self.id+sv_extension)
+
+    @property
+    def svs(self):
+        """StructuralVariation views of the rows of `sv_table`."""
+        return StructuralVariationView(self.sv_table)
+
+    @property
+    def sequence(self):
+        """CNSegments of every chromosome, built from `cn_table` on first use."""
+        if self._sequence is None:
+            self._sequence = cn_segments(self.cn_table)
+        return self._sequence
+
+    @property
+    def bl_to_sv(self):
+        """SVVertex of every break location, built from `sv_table` on first use."""
+        if self._bl_to_sv is None:
+            self._bl_to_sv = defaultdict(dict)
+            for sv in self.svs:
+                bls = (BreakLocation(sv.chrom1, sv.start1),
+                       BreakLocation(sv.chrom1, sv.end1),
+                       BreakLocation(sv.chrom2, sv.start2),
+                       BreakLocation(sv.chrom2, sv.end2))
                 for i, bl in enumerate(bls):
                     self._create_sv_vertex(bl, i+1, sv)
-        # return svs
-    
+        return self._bl_to_sv
+
+    def break_locations(self):
+        """Collects the break locations of all SVs and their rejoin counts.
+
+        Returns
+        -------
+        tuple
+            NumPy arrays of the chromosomes and base pairs of all distinct
+             break locations in sorted order, and of the number of rejoins
+             every location is involved in (see `_bp_loc_rejoins`).
+        """
+        if self._locations is None:
+            table = self.sv_table
+            chroms = np.concatenate((table['chrom1'], table['chrom1'],
+                                     table['chrom2'], table['chrom2']))
+            bps = np.concatenate((table['start1'], table['end1'],
+                                  table['start2'], table['end2']))
+            rejoined = np.concatenate((table['strand1'] == '-',
+                                       table['strand1'] == '+',
+                                       table['strand2'] == '-',
+                                       table['strand2'] == '+'))
+            order = np.lexsort((bps, chroms))
+            chroms, bps, rejoined = chroms[order], bps[order], rejoined[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = (chroms[1:] != chroms[:-1]) | (bps[1:] != bps[:-1])
+            starts = np.flatnonzero(first)
+            rejoins = np.add.reduceat(rejoined.astype(np.int64), starts) \
+                        if len(starts) else np.zeros(0, dtype=np.int64)
+            self._locations = (chroms[starts].astype(np.int64), bps[starts],
+                               rejoins)
+        return self._locations
+
+    def merged_break_locations(self):
+        """Clusters the breakends of all SVs into canonical break locations.
+
+        Breakends on the same chromosome are merged by a sweep with tolerance
+         `bp_slack` and maximum span `bp_span` (see `cluster_breakpoints`).
+
+        Returns
+        -------
+        tuple
+            The sorted list of canonical BreakLocations, and a NumPy array of
+             shape (n, 2) whose row k holds the indices of the locations of
+             both breakends of the SV in row k of `sv_table`.
+        """
+        table = self.sv_table
+        locations, mapping = cluster_breakpoints(
+            np.concatenate((table['chrom1'], table['chrom2'])),
+            np.concatenate((table['start1'], table['start2'])),
+            self.bp_slack, self.bp_span)
+        return locations, mapping.reshape(2, -1).T
+
+    def cn_capacities(self, subset):
+        """Derives completion capacities from the copy numbers of locations.
+
+        A merged break location with copy number c that is already rejoined by
+         r SV breakends can take part in at most c-r further rejoins.
+        Locations whose copy number cannot be resolved are unconstrained.
+
+        Parameters
+        ----------
+        subset : iterable of int
+            The chromosomes to include.
+
+        Returns
+        -------
+        dict
+            Maps the vertices of every constrained location with free vertices
+             to its capacity, as accepted by IncompleteAMG.
+        """
+        if self._labels is None:
+            self._build_index()
+        chroms, bps = self._merged
+        copies, errors = self._locs_cn(chroms, bps)
+        offsets = self._group_offsets
+        free = 2*np.diff(offsets)-self._group_rejoins
+        capacities = {}
+        for g in np.flatnonzero(np.isin(chroms, sorted(set(subset)))
+                                    & (errors == CN_OK) & (free > 0)).tolist():
+            lefts = self._dsbs[offsets[g]:offsets[g+1]]
+            vertices = lefts.tolist()+(lefts+1).tolist()
+            capacities[tuple(vertices)] = max(int(copies[g]-self._group_rejoins[g]), 0)
+        return capacities
+
+    def amg(self, subset, copy_numbers=False):
+        """Builds the incomplete AMG induced by a subset of chromosomes.
+
+        Every SV contributes one rejoin edge between its two breakends.
+        Breakends are merged as in `merged_break_locations`, and a breakend
+         rejoined on the '-' strand can share its DSB with one rejoined on the
+         '+' strand of the same location, as in a balanced rearrangement.
+        DSB vertices that are not rejoined by any SV remain free.
+
+        Parameters
+        ----------
+        subset : iterable of int
+            The chromosomes to include.
+        copy_numbers : bool, optional
+            Whether completions must respect the capacities derived from copy
+             numbers (see `cn_capacities`), by default False.
+
+        Returns
+        -------
+        IncompleteAMG
+            The AMG of the breakpoints and rejoins within `subset`, with
+             integer vertices (see `vertex_label`).
+        """
+        if self._labels is None:
+            self._build_index()
+        subset = sorted(set(subset))
+        keep = np.isin(self._vertex_chrom, subset)
+        starts = np.flatnonzero(keep[::2])*2
+        chromatins = list(zip(starts.tolist(), (starts+1).tolist()))
+        lefts = self._dsbs[np.isin(self._dsb_chrom, subset)]
+        dsbs = list(zip(lefts.tolist(), (lefts+1).tolist()))
+        rows = np.isin(self.sv_table['chrom1'], subset) \
+                & np.isin(self.sv_table['chrom2'], subset)
+        rejoins = list(zip(self._rejoins[rows, 0].tolist(),
+                           self._rejoins[rows, 1].tolist()))
+        suffix = '_'.join(str(x) for x in subset)
+        capacities = self.cn_capacities(subset) if copy_numbers else None
+        return IncompleteAMG(chromatins, dsbs, rejoins, self.id+'_'+suffix,
+                             capacities=capacities)
+
+    def clusters(self):
+        """Groups the chromosomes of this patient into independent clusters.
+
+        Two chromosomes belong to the same cluster if they are linked by a
+         chain of SVs.
+
+        Returns
+        -------
+        list of frozenset
+            The clusters, ordered by their smallest chromosome.
+        """
+        pairs = np.unique(np.stack((self.sv_table['chrom1'],
+                                    self.sv_table['chrom2']), axis=1), axis=0)
+        parent = {chrom: chrom for chrom in pairs.ravel().tolist()}
+
+        def find(chrom):
+            while parent[chrom] != chrom:
+                parent[chrom] = parent[parent[chrom]]
+                chrom = parent[chrom]
+            return chrom
+
+        for c1, c2 in pairs.tolist():
+            root_1, root_2 = find(c1), find(c2)
+            if root_1 != root_2:
+                parent[max(root_1, root_2)] = min(root_1, root_2)
+        clusters = {}
+        for chrom in parent:
+            clusters.setdefault(find(chrom), set()).add(chrom)
+        return [frozenset(clusters[root]) for root in sorted(clusters)]
+
+    def cluster_amgs(self):
+        """Builds one incomplete AMG per independent cluster of chromosomes.
+
+        Returns
+        -------
+        dict
+            Maps every cluster returned by `clusters` to its IncompleteAMG.
+        """
+        return {cluster: self.amg(cluster) for cluster in self.clusters()}
+
+    def vertex_label(self, vertex):
+        """Looks up the break location of a vertex of an incomplete AMG.
+
+        Parameters
+        ----------
+        vertex : int
+            A vertex id.
+
+        Returns
+        -------
+        BreakLocation
+            The location represented by `vertex`; telomeres are at base pair
+             0 and infinity.
+            Merged breakends share their canonical location, and the right
+             vertex of a DSB is one base pair after its left vertex.
+        """
+        if self._labels is None:
+            self._build_index()
+        return self._labels[vertex]
+
+    def sv_vertices(self, k):
+        """Looks up the rejoin edge of an SV.
+
+        Parameters
+        ----------
+        k : int
+            The row of the SV in `sv_table`.
+
+        Returns
+        -------
+        tuple of int
+            The vertex ids of both breakends of the SV.
+        """
+        if self._labels is None:
+            self._build_index()
+        return tuple(self._rejoins[k].tolist())
+
+    def _build_index(self):
+        """Assigns integer vertex ids to telomeres and merged breakends.
+
+        The vertices of every chromosome are numbered consecutively in order
+         of location, starting at an even id: the first telomere, the two
+         vertices of every DSB and the last telomere.
+        Hence the chromatin edges are exactly the pairs (2i, 2i+1) and every
+         DSB is a pair (2i+1, 2i+2).
+        """
+        table = self.sv_table
+        n = len(table)
+        locations, mapping = self.merged_break_locations()
+        group = mapping.T.ravel()
+        plus = np.concatenate((table['strand1'] == '+', table['strand2'] == '+'))
+        order = np.argsort(group, kind='stable')
+
+        # the k-th '-' and the k-th '+' breakend of a group share a DSB
+        rank = np.empty(2*n, dtype=np.int64)
+        for strand in (False, True):
+            members = order[plus[order] == strand]
+            rank[members] = np.arange(len(members)) \
+                                - np.searchsorted(group[members], group[members])
+        group_dsbs = np.zeros(len(locations), dtype=np.int64)
+        np.maximum.at(group_dsbs, group, rank+1)
+        # a DSB cannot be rejoined to itself, so fold-backs get a DSB of their own
+        folds = (group[:n] == group[n:]) & (plus[:n] != plus[n:]) \
+                    & (rank[:n] == rank[n:])
+        for k in np.flatnonzero(folds).tolist():
+            end = k if plus[k] else n+k
+            rank[end] = group_dsbs[group[end]]
+            group_dsbs[group[end]] += 1
+
+        group_chrom, group_bp = np.array(locations, dtype=np.int64).reshape(-1, 2).T
+        dsb_chrom = np.repeat(group_chrom, group_dsbs)
+        dsb_bp = np.repeat(group_bp, group_dsbs)
+        chrom_list, chrom_first, chrom_dsbs = np.unique(
+            dsb_chrom, return_index=True, return_counts=True)
+        base = np.concatenate(([0], np.cumsum(2*chrom_dsbs+2)))
+        index = np.searchsorted(chrom_list, dsb_chrom)
+        lefts = base[index]+1+2*(np.arange(len(dsb_chrom))-chrom_first[index])
+        dsb = np.concatenate(([0], np.cumsum(group_dsbs)))[group]+rank
+        vertices = lefts[dsb]+plus
+
+        self._merged = (group_chrom, group_bp)
+        self._group_offsets = np.concatenate(([0], np.cumsum(group_dsbs)))
+        self._group_rejoins = np.bincount(group, minlength=len(locations))
+        self._vertex_chrom = np.repeat(chrom_list, 2*chrom_dsbs+2)
+        self._dsb_chrom = dsb_chrom
+        self._dsbs = lefts
+        self._rejoins = np.stack((vertices[:n], vertices[n:]), axis=1)
+        self._labels = []
+        for c, chrom in enumerate(chrom_list.tolist()):
+            rows = slice(chrom_first[c], chrom_first[c]+chrom_dsbs[c])
+            self._labels.append(BreakLocation(chrom, 0))
+            for bp in dsb_bp[rows].tolist():
+                self._labels += [BreakLocation(chrom, bp),
+                                 BreakLocation(chrom, bp+1)]
+            self._labels.append(BreakLocation(chrom, float('inf')))
+
     def _chrom_to_int(self, chrom):
         """Converts chromosome number from `str` to `int`.
 
@@ -215,22 +525,22 @@ class PCAWGPatient:
             Object corresponding to the SV involving this break location.
         """
         # first check if SVVertex has already been created
-        if bl in self.bl_to_sv:
-            self.bl_to_sv[bl]['svs'].append((sv, pos))
+        if bl in self._bl_to_sv:
+            self._bl_to_sv[bl]['svs'].append((sv, pos))
         else:
             # create new SVVertex for this BreakLocation
-            self.bl_to_sv[bl]['vertex'] = SVVertex(*bl)
+            self._bl_to_sv[bl]['vertex'] = SVVertex(*bl)
             # update the StructuralVariation and the position in that SV this location belongs to
-            self.bl_to_sv[bl]['svs'] = [(sv, pos)]
+            self._bl_to_sv[bl]['svs'] = [(sv, pos)]
 
 
     def check_valid(self):
         """Checks if the data for this patient is clean.
 
-        Any discrepancies observed while checking are stored in `logs`.
+        Any discrepancies observed while checking are stored in `events`.
         """
         valid = True
-        self.logs.append((5, f'Patient {self.id}\n'))
+        self._log(EV_PATIENT)
 
         if not self._check_sequence_complete():
             valid = False
@@ -240,7 +550,7 @@ class PCAWGPatient:
         # for bl in self.bl_to_sv:
         #     print(f'{bl}: {self.bl_to_sv[bl]}')
 
-        self.logs.append((5, '----------------------\n\n'))
+        self._log(EV_END)
         return valid
 
     def _check_sequence_complete(self):
@@ -256,24 +566,20 @@ class PCAWGPatient:
         bool
             Returns True if sequence is complete, False otherwise.
         """
-        old_logs = len(self.logs)
+        old_events = len(self.events)
+        table = self.cn_table
+        chroms, first = np.unique(table['chrom'], return_index=True)
         for chrom in range(1,24):
-            if chrom not in self.sequence:
-                self.logs.append((5, f'Chromosome {chrom} not sequenced.\n'))
-        for chrom in self.sequence:
-            for i in range(1, len(self.sequence[chrom])):
-                if self.sequence[chrom][i].start - self.sequence[chrom][i-1].end > 1:
-                    self.logs.append((5, f"""Patient {self.id}: 
-                                        Missing bps in chromosome {chrom}:
-                                        {self.sequence[chrom][i-1].end} to
-                                        {self.sequence[chrom][i].start}.\n"""))
-                elif self.sequence[chrom][i].start - self.sequence[chrom][i-1].end < 1:
-                    self.logs.append((5, f"""Patient {self.id}:
-                                        Duplicate bps sequenced in chromosome {chrom}:
-                                        {self.sequence[chrom][i].start} to
-                                        {self.sequence[chrom][i-1].end}.\n"""))
-        if len(self.logs) == old_logs:
-            self.logs.append((5, f'Patient {self.id}: Sequencing data is complete.\n'))
+            if chrom not in chroms:
+                self._log(EV_NOT_SEQUENCED, chrom)
+        for chrom in chroms[np.argsort(first)].tolist():
+            rows = table[table['chrom'] == chrom]
+            starts, ends = rows['start'][1:], rows['end'][:-1]
+            for i in np.flatnonzero(starts-ends != 1).tolist():
+                code = EV_MISSING_BPS if starts[i]-ends[i] > 1 else EV_DUPLICATE_BPS
+                self._log(code, chrom, values=(ends[i], starts[i]))
+        if len(self.events) == old_events:
+            self._log(EV_SEQUENCE_COMPLETE)
             return True
         else:
             return False
@@ -303,37 +609,121 @@ class PCAWGPatient:
             If the queried location was less than the sequenced range, error
              is '<'.
             Otherwise, the error is 'Not sequenced'.
+        """
+        copies, errors = self.bp_locs_cn([bl])
+        return int(copies[0]), CN_ERRORS[errors[0]]
 
-        Raises
-        ------
-        ValueError
-        TODO
+    def _cn_index(self, chrom):
+        """Sorted interval index of the CNSegment objects of a chromosome.
+
+        The index is built from `cn_table` on first use.
+        A location is resolved to the first segment in file order containing
+         it, as in a linear scan of `sequence`. Segments may overlap (see
+         `_check_sequence_complete`); only then are the segments containing a
+         location searched for the first one.
+
+        Parameters
+        ----------
+        chrom : int
+            The chromosome.
+
+        Returns
+        -------
+        tuple
+            NumPy arrays of the starts, ends, total copy numbers and positions
+             in file order of the segments, sorted by start, whether the
+             segments are disjoint, and the start of the first and the end of
+             the last segment in file order.
+            Copy numbers marked 'NA' are stored as -1.
         """
-        chrom = bl.chrom
-        bp = bl.bp
-        for segment in self.sequence[chrom]:
-            if segment.start <= bp <= segment.end:
-                return (segment.total_cn, 0) if segment.total_cn != 'NA' else (0, 'NA')
-        
-        # log = f'Patient {self.id}: Copy number not found for break location {bl}.'
-        if len(self.sequence[chrom]) == 0:
-            logs.append((5, f'Unsequenced chromosome: {chrom} for {bl}'))
-            return (0, 'Not sequenced')
-        if bp < self.sequence[chrom][0].start:
-            return (0, '<')
-            # log += ' Location less than sequenced range.'
-        elif bp > self.sequence[chrom][-1].end:
-            return (0, '>')
-            # log += ' Location greater than sequenced range.'
-        # self.logs.append(log+'\n')
-        # return (0, 'Not sequenced')
+        if chrom not in self._cn_segments:
+            rows = self.cn_table[self.cn_table['chrom'] == chrom]
+            order = np.argsort(rows['start'], kind='stable')
+            starts, ends = rows['start'][order], rows['end'][order]
+            disjoint = bool((starts[1:] > ends[:-1]).all())
+            bounds = (rows['start'][0], rows['end'][-1]) if len(rows) else (0, 0)
+            self._cn_segments[chrom] = (starts, ends, rows['total_cn'][order],
+                                        order, disjoint, *bounds)
+        return self._cn_segments[chrom]
+
+    def bp_locs_cn(self, bls, offset=0):
+        """Resolves the copy numbers of many break locations at once.
+
+        Parameters
+        ----------
+        bls : iterable of BreakLocation
+            The query breakpoint locations.
+        offset : int, optional
+            Added to every base pair before the lookup, by default 0.
+
+        Returns
+        -------
+        tuple
+            Two NumPy arrays aligned with `bls`: the total copy number of the
+             CNSegment containing every location (0 if unavailable), and an
+             error code indexing `CN_ERRORS` as described in `_bp_loc_cn`.
+        """
+        bls = list(bls)
+        return self._locs_cn(np.array([bl.chrom for bl in bls], dtype=np.int64),
+                             np.array([bl.bp for bl in bls], dtype=np.int64),
+                             offset)
+
+    def _locs_cn(self, chroms, bps, offset=0):
+        """Array version of `bp_locs_cn` taking chromosomes and base pairs."""
+        bps = bps+offset
+        copies = np.zeros(len(bps), dtype=np.int64)
+        errors = np.full(len(bps), CN_NOT_SEQUENCED, dtype=np.int8)
+        for chrom in np.unique(chroms):
+            starts, ends, cns, order, disjoint, first_start, last_end = \
+                self._cn_index(int(chrom))
+            if len(starts) == 0:
+                continue
+            mask = chroms == chrom
+            query = bps[mask]
+            if disjoint:
+                i = np.searchsorted(starts, query, side='right')-1
+                found = (i >= 0) & (query <= ends[np.maximum(i, 0)])
+            else:
+                # the first containing segment in file order
+                inside = (starts <= query[:, None]) & (query[:, None] <= ends)
+                found = inside.any(axis=1)
+                i = np.where(inside, order, len(order)).argmin(axis=1)
+            cn = np.where(found, cns[np.maximum(i, 0)], 0)
+            error = np.full(len(query), CN_NOT_SEQUENCED, dtype=np.int8)
+            error[query > last_end] = CN_ABOVE
+            error[query < first_start] = CN_BELOW
+            error[found & (cn >= 0)] = CN_OK
+            error[found & (cn < 0)] = CN_NA
+            copies[mask] = np.maximum(cn, 0)
+            errors[mask] = error
+        return copies, errors
+
+    def break_locations_cn(self):
+        """Resolves the copy numbers of all break locations of this patient.
+
+        Every location is looked up exactly, `bp_slack` base pairs before,
+         and `bp_slack` base pairs after.
+
+        Returns
+        -------
+        tuple
+            NumPy arrays of the chromosomes and base pairs of all break
+             locations in sorted order (see `break_locations`), and two NumPy
+             arrays of shape (n, 3) with the copy numbers and error codes (see
+             `bp_locs_cn`) at offsets 0, -`bp_slack` and +`bp_slack`.
+        """
+        chroms, bps, _ = self.break_locations()
+        copies = np.empty((len(bps), 3), dtype=np.int64)
+        errors = np.empty((len(bps), 3), dtype=np.int8)
+        for j, offset in enumerate((0, -self.bp_slack, self.bp_slack)):
+            copies[:, j], errors[:, j] = self._locs_cn(chroms, bps, offset)
+        return chroms, bps, copies, errors
     
     def _bp_loc_rejoins(self, bl):
         """Computes the number of rejoins a breakpoint location is involved in.
 
-        Given a breakpoint location, this method iterates over the
-         StructuralVariation objects involving this location and returns the
-         number of rejoins it was involved in.
+        Given a breakpoint location, this method looks up the number of
+         rejoins it was involved in among the counts of `break_locations`.
 
         Parameters
         ----------
@@ -345,17 +735,13 @@ class PCAWGPatient:
         int
             The number of rejoins this location was involved in.
         """
-        rejoins = 0
-        for sv, pos in self.bl_to_sv[bl]['svs']:
-            if pos == 1 and sv.strand1 == '-':
-                rejoins +=1
-            elif pos == 2 and sv.strand1 == '+':
-                rejoins += 1
-            elif pos == 3 and sv.strand2 == '-':
-                rejoins += 1
-            elif pos == 4 and sv.strand2 == '+':
-                rejoins += 1
-        return rejoins
+        chroms, bps, rejoins = self.break_locations()
+        lo = np.searchsorted(chroms, bl.chrom, side='left')
+        hi = np.searchsorted(chroms, bl.chrom, side='right')
+        k = lo+np.searchsorted(bps[lo:hi], bl.bp)
+        if k < hi and bps[k] == bl.bp:
+            return int(rejoins[k])
+        return 0
 
     def _check_rejoins_cn(self):
         """Checks if for every break location the number of rejoins exceeds the 
@@ -368,61 +754,172 @@ class PCAWGPatient:
              in does not exceed the number of copies of that location.
             False otherwise.
         """
-        old_logs = len(self.logs)
-        bp_locs = sorted([bl for bl in self.bl_to_sv])
-        for bp_loc in bp_locs:
-            rejoins = self._bp_loc_rejoins(bp_loc)
-            copies, error = self._bp_loc_cn(bp_loc)
-            if rejoins > copies:
-                bp_less_slack = BreakLocation(bp_loc.chrom, bp_loc.bp-self.bp_slack)
-                bp_less_slack_cn = self._bp_loc_cn(bp_less_slack)[0]
-                bp_add_slack = BreakLocation(bp_loc.chrom, bp_loc.bp+self.bp_slack)
-                bp_add_slack_cn = self._bp_loc_cn(bp_add_slack)[0]
-                if error == 0:
-                    if bp_less_slack_cn <= copies:
-                        self.logs.append((1, f"""Patient {self.id}: {bp_loc} is rejoined
-                                          in {rejoins} SVs while CN is {copies}.
-                                          But a location -{self.bp_slack} is fine.\n"""))
-                    elif  bp_add_slack_cn <= copies:
-                        self.logs.append((1, f"""Patient {self.id}: {bp_loc} is rejoined
-                                          in {rejoins} SVs while CN is {copies}.
-                                          But a location +{self.bp_slack} is fine.\n"""))
-                    else:
-                        self.logs.append((5, f"""Patient {self.id}: {bp_loc} is rejoined
-                                          in {rejoins} SVs while CN is {copies}.\n"""))
-                elif error == '<':
-                    if bp_add_slack_cn <= copies:
-                        self.logs.append((1, f"""Patient {self.id}:
+        old_events = len(self.events)
+        chroms, bps, cns, errors = self.break_locations_cn()
+        counts = self.break_locations()[2]
+        for k in np.flatnonzero(counts > cns[:, 0]).tolist():
+            chrom, bp = int(chroms[k]), int(bps[k])
+            values = (int(counts[k]), int(cns[k, 0]))
+            error = errors[k, 0]
+            fine_below = cns[k, 1] <= values[1]
+            fine_above = cns[k, 2] <= values[1]
+            if error == CN_OK:
+                code = (EV_REJOINS_MINUS_OK if fine_below
+                        else EV_REJOINS_PLUS_OK if fine_above else EV_REJOINS)
+            elif error == CN_BELOW:
+                code = EV_BELOW_PLUS_OK if fine_above else EV_BELOW
+            elif error == CN_ABOVE:
+                code = EV_ABOVE_MINUS_OK if fine_below else EV_ABOVE
+            elif error == CN_NA:
+                code = EV_CN_NA
+            else:
+                code = EV_CN_NOT_FOUND
+            self._log(code, chrom, bp, values)
+        if len(self.events) == old_events:
+            self._log(EV_REJOINS_OK)
+            return True
+        else:
+            return False
+
+    def _log(self, code, chrom=0, bp=0, values=(0, 0)):
+        """Records a validation event.
+
+        Parameters
+        ----------
+        code : int
+            One of the `EV_*` event codes.
+        chrom : int, optional
+            The chromosome the event concerns, if any.
+        bp : int, optional
+            The base pair the event concerns, if any.
+        values : tuple of int, optional
+            The pair of numbers reported by the event: the end and start of a
+             gap or overlap in the sequence, or the number of rejoins and copies
+             of a break location.
+        """
+        self.events.append((code, chrom, bp, (int(values[0]), int(values[1]))))
+
+    def _render(self, event):
+        """Formats the log message of a validation event.
+
+        Parameters
+        ----------
+        event : tuple
+            A (code, chrom, bp, values) record from `events`.
+
+        Returns
+        -------
+        str
+            The log message.
+        """
+        code, chrom, bp, (first, second) = event
+        bp_loc = BreakLocation(chrom, bp)
+        if code == EV_PATIENT:
+            return f'Patient {self.id}\n'
+        elif code == EV_END:
+            return '----------------------\n\n'
+        elif code == EV_NOT_SEQUENCED:
+            return f'Chromosome {chrom} not sequenced.\n'
+        elif code == EV_MISSING_BPS:
+            return f"""Patient {self.id}: 
+                                        Missing bps in chromosome {chrom}:
+                                        {first} to
+                                        {second}.\n"""
+        elif code == EV_DUPLICATE_BPS:
+            return f"""Patient {self.id}:
+                                        Duplicate bps sequenced in chromosome {chrom}:
+                                        {second} to
+                                        {first}.\n"""
+        elif code == EV_SEQUENCE_COMPLETE:
+            return f'Patient {self.id}: Sequencing data is complete.\n'
+        elif code == EV_REJOINS_MINUS_OK:
+            return f"""Patient {self.id}: {bp_loc} is rejoined
+                                          in {first} SVs while CN is {second}.
+                                          But a location -{self.bp_slack} is fine.\n"""
+        elif code == EV_REJOINS_PLUS_OK:
+            return f"""Patient {self.id}: {bp_loc} is rejoined
+                                          in {first} SVs while CN is {second}.
+                                          But a location +{self.bp_slack} is fine.\n"""
+        elif code == EV_REJOINS:
+            return f"""Patient {self.id}: {bp_loc} is rejoined
+                                          in {first} SVs while CN is {second}.\n"""
+        elif code == EV_BELOW_PLUS_OK:
+            return f"""Patient {self.id}:
                                           {bp_loc} CN not found for break location.
                                           Location less than sequenced range.
-                                          But a location +{self.bp_slack} is fine.\n"""))
-                    else:
-                        self.logs.append((5, f"""Patient {self.id}:
+                                          But a location +{self.bp_slack} is fine.\n"""
+        elif code == EV_BELOW:
+            return f"""Patient {self.id}:
                                           {bp_loc} CN not found for break location.
-                                          Location less than sequenced range.\n"""))
-                elif error == '>':
-                    if bp_less_slack_cn  <= copies:
-                        self.logs.append((1, f"""Patient {self.id}:
+                                          Location less than sequenced range.\n"""
+        elif code == EV_ABOVE_MINUS_OK:
+            return f"""Patient {self.id}:
                                           {bp_loc} CN not found for break location.
                                           Location greater than sequenced range.
-                                          But a location -{self.bp_slack} is fine.\n"""))
-                    else:
-                        self.logs.append((5, f"""Patient {self.id}:
+                                          But a location -{self.bp_slack} is fine.\n"""
+        elif code == EV_ABOVE:
+            return f"""Patient {self.id}:
                                           {bp_loc} CN not found for break location.
-                                          Location greater than sequenced range.\n"""))
-                elif error == 'NA':
-                    self.logs.append((5, f"""Patient {self.id}:
+                                          Location greater than sequenced range.\n"""
+        elif code == EV_CN_NA:
+            return f"""Patient {self.id}:
                                       {bp_loc} CN not found for break location.
-                                      Marked NA.\n"""))
-                else:
-                    self.logs.append((5, f"""Patient {self.id}:
-                                      {bp_loc} CN not found for break location.\n"""))
-        if len(self.logs) == old_logs:
-            self.logs.append((5, f"""Patient {self.id}: Success!
-                              For every breakpoint #(rejoins) <= #(copies).\n"""))
-            return True
-        else:
-            return False
+                                      Marked NA.\n"""
+        elif code == EV_CN_NOT_FOUND:
+            return f"""Patient {self.id}:
+                                      {bp_loc} CN not found for break location.\n"""
+        elif code == EV_REJOINS_OK:
+            return f"""Patient {self.id}: Success!
+                              For every breakpoint #(rejoins) <= #(copies).\n"""
+        elif code == EV_FAILED:
+            return f'Patient {self.id}: Validation failed.\n'
+        raise ValueError(f'Unknown event code {code}!')
+
+    def render_logs(self, priority_level=5):
+        """Renders the log messages of the events with at least a given priority.
+
+        Events below `priority_level` are skipped without being formatted.
+
+        Parameters
+        ----------
+        priority_level : int, optional
+            The minimum priority of a rendered event, by default 5.
+
+        Returns
+        -------
+        list of str
+            The log messages in the order the events were recorded.
+        """
+        return [self._render(event) for event in self.events
+                    if EV_PRIORITIES[event[0]] >= priority_level]
+
+    @property
+    def logs(self):
+        """The (priority, message) pairs of all events."""
+        return [(EV_PRIORITIES[event[0]], self._render(event))
+                    for event in self.events]
+
+    def event_table(self):
+        """Exports the events as a structured array.
+
+        Tables of many patients can be concatenated for cohort-level queries,
+         e.g., the number of patients with a rejoined break location marked NA
+         is ``len(np.unique(table['patient'][table['code'] == EV_CN_NA]))``.
+
+        Returns
+        -------
+        numpy.ndarray
+            One row per event with dtype `EVENT_DTYPE`.
+        """
+        table = np.zeros(len(self.events), dtype=EVENT_DTYPE)
+        table['patient'] = self.id
+        if self.events:
+            codes, chroms, bps, values = zip(*self.events)
+            table['code'] = codes
+            table['chrom'] = chroms
+            table['bp'] = bps
+            table['values'] = values
+        return table
 
     def write_logs(self, log_file, priority_level=5):
         """Write logging info to file and clear logs.
@@ -433,32 +930,32 @@ class PCAWGPatient:
             The file to which the log data is appended.
         """
         with open(log_file, 'a') as log:
-            log.writelines(log for priority, log in patient.logs
-                            if priority >= priority_level)
-        patient.logs = []
-
-
-chromothripsis = '72f0a49a-aec8-47e5-846a-956c4da1507c.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
-simple = 'e1217ebe-1826-41a9-b6c4-702100a66f5e.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
-medium = '0ae2193f-0d68-485a-b8c2-7568cbcce33e.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
-files = [simple, medium]
-# file += '.bedpe'
-# path = '/Users/siddharthsheth/Dropbox/work/research-projects/TQFT Cancer Progression/tcga/open/'
-dir_path = os.path.dirname(os.path.realpath(__file__))
-os.chdir(dir_path+'/..')
-# datasets = ['tcga', 'icgc']
-datasets = ['tcga']
-log_file = 'svlog.log'
-if os.path.exists(log_file):
-    os.remove(log_file)
-logs = []
-for dataset in datasets:
-    sv_path = f'data/{dataset}_sv/open/'
-    patient_ids = [file.split('.')[0] for file in os.listdir(sv_path)]
-    # patient_ids = [file.split('.')[0] for file in files]
-    for i, id in enumerate(patient_ids):
-        print(f'Working on patient number {i+1}: {id}.')
-        patient = PCAWGPatient(id, dataset)
-        valid = patient.check_valid()
-        # print(f'Working on patient number {i+1}: {id}. {valid}')
-        patient.write_logs(log_file)
+            log.writelines(self.render_logs(priority_level))
+        self.events = []
+
+
+if __name__ == '__main__':
+    chromothripsis = '72f0a49a-aec8-47e5-846a-956c4da1507c.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
+    simple = 'e1217ebe-1826-41a9-b6c4-702100a66f5e.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
+    medium = '0ae2193f-0d68-485a-b8c2-7568cbcce33e.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
+    files = [simple, medium]
+    # file += '.bedpe'
+    # path = '/Users/siddharthsheth/Dropbox/work/research-projects/TQFT Cancer Progression/tcga/open/'
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path+'/..')
+    # datasets = ['tcga', 'icgc']
+    datasets = ['tcga']
+    log_file = 'svlog.log'
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    logs = []
+    for dataset in datasets:
+        sv_path = f'data/{dataset}_sv/open/'
+        patient_ids = [file.split('.')[0] for file in os.listdir(sv_path)]
+        # patient_ids = [file.split('.')[0] for file in files]
+        for i, id in enumerate(patient_ids):
+            print(f'Working on patient number {i+1}: {id}.')
+            patient = PCAWGPatient(id, dataset)
+            valid = patient.check_valid()
+            # print(f'Working on patient number {i+1}: {id}. {valid}')
+            patient.write_logs(log_file)
@@ -0,0 +1,191 @@
+"""
+Parallel validation of the PCAWG cohort.
+
+Patients flow through three stages:
+
+1. An I/O thread pool reads and parses the SV and CNA files of a patient into a
+   `PCAWGPatient`.
+2. A process pool runs `check_valid` on the parsed patients.
+3. The main thread writes the logs of every validated patient, filtered by
+   priority, to a single buffered log file. Only the messages that pass the
+   filter are ever formatted. Optionally, the validation events of all
+   patients are also collected into one columnar table.
+
+A patient whose files cannot be read or validated, e.g., because a file is
+missing or has a malformed row, fails validation with an ``EV_FAILED`` event
+and an error in the log, and the run continues with the other patients.
+
+At most ``max_pending`` patients are in flight at any time, so memory use does
+not grow with the size of the cohort. Progress is reported in files per second.
+
+The script is run from the repository root, like ``pcawg_patient.py``.
+"""
+
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                FIRST_COMPLETED, wait)
+from examples.patient_analysis.pcawg_patient import (PCAWGPatient, EVENT_DTYPE,
+                                                     EV_FAILED)
+from aberration_multigraph.store import write_arrays
+import numpy as np
+import os
+import time
+
+
+def _load(patient_id, dataset):
+    """Parse the files of a patient. Runs on the I/O thread pool."""
+    return PCAWGPatient(patient_id, dataset)
+
+
+def _validate(patient, priority_level):
+    """Validate a patient. Runs on the process pool.
+
+    Returns
+    -------
+    tuple
+        The patient's id, whether its data is valid, its log lines with
+         priority at least `priority_level`, and its event table.
+    """
+    valid = patient.check_valid()
+    return (patient.id, valid, patient.render_logs(priority_level),
+            patient.event_table())
+
+
+def _failed(patient_id, error):
+    """The result of `_validate` for a patient that could not be validated.
+
+    Returns
+    -------
+    tuple
+        The patient's id, False, a log line with the error, and an event table
+         with a single `EV_FAILED` event.
+    """
+    table = np.zeros(1, dtype=EVENT_DTYPE)
+    table['code'] = EV_FAILED
+    table['patient'] = patient_id
+    log = (f'Patient {patient_id}: Validation failed. '
+           f'{type(error).__name__}: {error}\n')
+    return patient_id, False, [log], table
+
+
+def patient_ids(dataset):
+    """Lists the patients of a dataset.
+
+    Parameters
+    ----------
+    dataset : str
+        Either 'tcga' or 'icgc'.
+
+    Returns
+    -------
+    list of str
+        The ids of all patients with a consensus SV file.
+    """
+    sv_path = f'data/{dataset}_sv/open/'
+    return sorted(file.split('.')[0] for file in os.listdir(sv_path))
+
+
+def validate_cohort(datasets, log_file, priority_level=5, io_workers=4,
+                    cpu_workers=None, max_pending=64, report_every=100,
+                    events_file=None):
+    """Validates all patients of the given datasets in parallel.
+
+    Parameters
+    ----------
+    datasets : iterable of str
+        Datasets to validate, each either 'tcga' or 'icgc'.
+    log_file : str
+        The log file, overwritten with the logs of all patients.
+    priority_level : int, optional
+        Only logs with at least this priority are written, by default 5.
+    io_workers : int, optional
+        Number of threads reading and parsing files, by default 4.
+    cpu_workers : int, optional
+        Number of validating processes, by default one per CPU.
+    max_pending : int, optional
+        Maximum number of patients being parsed or validated, by default 64.
+    report_every : int, optional
+        Report progress after this many patients, by default 100.
+    events_file : str, optional
+        If given, the events of all patients are written to this store file,
+         one memory-mapped array per column of `EVENT_DTYPE`, e.g., to count
+         the patients with a rejoined break location marked NA.
+
+    Returns
+    -------
+    dict
+        Maps patient ids to whether their data is valid. Patients whose files
+         could not be read or validated are not valid.
+    """
+    jobs = iter([(patient_id, dataset) for dataset in datasets
+                    for patient_id in patient_ids(dataset)])
+    validity = {}
+    tables = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(io_workers) as io_pool, \
+            ProcessPoolExecutor(cpu_workers) as cpu_pool, \
+            open(log_file, 'w', buffering=1 << 20) as log:
+        # map futures to the id of their patient
+        loading, validating = {}, {}
+
+        def refill():
+            while len(loading)+len(validating) < max_pending:
+                job = next(jobs, None)
+                if job is None:
+                    return
+                loading[io_pool.submit(_load, *job)] = job[0]
+
+        refill()
+        while loading or validating:
+            done, _ = wait([*loading, *validating],
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in loading:
+                    patient_id = loading.pop(future)
+                    try:
+                        patient = future.result()
+                    except Exception as error:
+                        result = _failed(patient_id, error)
+                    else:
+                        validating[cpu_pool.submit(_validate, patient,
+                                                   priority_level)] = patient_id
+                        continue
+                else:
+                    patient_id = validating.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        result = _failed(patient_id, error)
+                patient_id, valid, logs, table = result
+                validity[patient_id] = valid
+                log.writelines(logs)
+                if events_file is not None:
+                    tables.append(table)
+                if len(validity) % report_every == 0:
+                    _report(len(validity), start)
+            refill()
+    _report(len(validity), start)
+    if events_file is not None:
+        events = np.concatenate(tables) if tables else \
+                    np.zeros(0, dtype=EVENT_DTYPE)
+        write_arrays(events_file, {name: events[name]
+                                    for name in events.dtype.names},
+                     {'table': 'pcawg_events'})
+    return validity
+
+
+def _report(count, start):
+    """Prints the number of patients validated and the throughput."""
+    elapsed = time.perf_counter()-start
+    rate = count/elapsed if elapsed > 0 else float('inf')
+    print(f'Validated {count} patients in {elapsed:.1f}s '
+          f'({rate:.1f} files/s).')
+
+
+if __name__ == '__main__':
+    dir_path = os.path.dirname(os.path.realpath(__file__))
+    os.chdir(dir_path+'/..')
+    # datasets = ['tcga', 'icgc']
+    datasets = ['tcga']
+    validity = validate_cohort(datasets, 'svlog.log',
+                               events_file='svevents.store')
+    print(f'{sum(validity.values())} of {len(validity)} patients are valid.')
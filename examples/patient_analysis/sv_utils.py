@@ -1,4 +1,5 @@
 from collections import defaultdict, namedtuple
+import numpy as np
 import os
 
 BreakLocation = namedtuple('BreakLocation', ['chrom', 'bp'])
@@ -133,4 +134,230 @@ StructuralVariation = namedtuple('StructuralVariation', ['chrom1',
                                                          'strand1', 
                                                          'strand2', 
                                                          'svclass', 
-                                                         'svmethod'])
\ No newline at end of file
+                                                         'svmethod'])
+
+CHROM_CODES = {**{str(i): i for i in range(1, 23)}, 'X': 23, 'Y': 24}
+"""Maps chromosome names in PCAWG files to integer codes."""
+
+SV_DTYPE = np.dtype([('chrom1', np.int8), ('start1', np.int64),
+                     ('end1', np.int64), ('chrom2', np.int8),
+                     ('start2', np.int64), ('end2', np.int64),
+                     ('sv_id', object), ('pe_support', object),
+                     ('strand1', 'U1'), ('strand2', 'U1'),
+                     ('svclass', object), ('svmethod', object)])
+
+CN_DTYPE = np.dtype([('chrom', np.int8), ('start', np.int64),
+                     ('end', np.int64), ('total_cn', np.int64),
+                     ('major_cn', np.int64), ('minor_cn', np.int64),
+                     ('star', np.int64)])
+"""Copy numbers marked 'NA' are stored as -1."""
+
+
+def _read_columns(filename, num_columns):
+    """Reads a whitespace separated file with a header into string columns.
+
+    Parameters
+    ----------
+    filename : str
+        The file to read.
+    num_columns : int
+        The number of columns of the file.
+
+    Returns
+    -------
+    numpy.ndarray
+        An array of strings of shape (rows, num_columns).
+
+    Raises
+    ------
+    ValueError
+        If a row does not have `num_columns` fields.
+    """
+    rows = []
+    with open(filename) as file:
+        file.readline()                                     # skip headers
+        for line_number, line in enumerate(file, 2):
+            fields = line.split()
+            if not fields:
+                continue
+            if len(fields) != num_columns:
+                raise ValueError(f'{filename}, line {line_number}: expected '
+                                 f'{num_columns} fields, found {len(fields)}!')
+            rows.append(fields)
+    return np.array(rows, dtype=str).reshape(-1, num_columns)
+
+
+def _chrom_codes(names):
+    """Maps an array of chromosome names through `CHROM_CODES`.
+
+    Raises
+    ------
+    ValueError
+        If a chromosome name is unknown.
+    """
+    unique, inverse = np.unique(names, return_inverse=True)
+    try:
+        codes = np.array([CHROM_CODES[name] for name in unique], dtype=np.int8)
+    except KeyError as error:
+        raise ValueError(f'Unknown chromosome {error}!') from None
+    return codes[inverse].reshape(np.shape(names))
+
+
+def _to_int(column, na=-1):
+    """Converts a column of integers, possibly in scientific notation or
+     marked 'NA', to int64."""
+    column = np.where(column == 'NA', str(na), column)
+    try:
+        return column.astype(np.int64)
+    except ValueError:
+        return column.astype(float).astype(np.int64)
+
+
+def read_bedpe(filename):
+    """Parses a PCAWG consensus SV (.bedpe) file in one pass.
+
+    Parameters
+    ----------
+    filename : str
+        The file to read.
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array with dtype `SV_DTYPE`, one row per SV.
+    """
+    columns = _read_columns(filename, len(SV_DTYPE.names))
+    table = np.empty(len(columns), dtype=SV_DTYPE)
+    for i, name in enumerate(SV_DTYPE.names):
+        if name in ('chrom1', 'chrom2'):
+            table[name] = _chrom_codes(columns[:, i])
+        elif SV_DTYPE[name] == np.int64:
+            table[name] = _to_int(columns[:, i])
+        else:
+            table[name] = columns[:, i]
+    return table
+
+
+def read_cna(filename):
+    """Parses a PCAWG consensus CNA file in one pass.
+
+    Parameters
+    ----------
+    filename : str
+        The file to read.
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array with dtype `CN_DTYPE`, one row per segment, in file
+         order.
+    """
+    columns = _read_columns(filename, len(CN_DTYPE.names))
+    table = np.empty(len(columns), dtype=CN_DTYPE)
+    table['chrom'] = _chrom_codes(columns[:, 0])
+    for i, name in enumerate(CN_DTYPE.names[1:]):
+        table[name] = _to_int(columns[:, i+1])
+    return table
+
+
+class StructuralVariationView:
+    """
+    A read-only sequence of `StructuralVariation` objects backed by a
+     structured array.
+
+    Rows are turned into namedtuples only when they are accessed.
+    """
+    def __init__(self, table):
+        """
+        Parameters
+        ----------
+        table : numpy.ndarray
+            A structured array with dtype `SV_DTYPE`.
+        """
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        return StructuralVariation(*self.table[i].tolist())
+
+    def __iter__(self):
+        for row in self.table.tolist():
+            yield StructuralVariation(*row)
+
+
+def cn_segments(table):
+    """Groups the rows of a CNA table as `CNSegment` objects by chromosome.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        A structured array with dtype `CN_DTYPE`.
+
+    Returns
+    -------
+    defaultdict(list)
+        Maps chromosomes, in order of first appearance, to their segments in
+         file order. Copy numbers stored as -1 are restored to 'NA'.
+    """
+    sequence = defaultdict(list)
+    for chrom, *segment in table.tolist():
+        segment[2:5] = ['NA' if x == -1 else x for x in segment[2:5]]
+        segment[5] = 'NA' if segment[5] == -1 else segment[5]
+        sequence[chrom].append(CNSegment(*segment))
+    return sequence
+
+
+def cluster_breakpoints(chroms, bps, slack, max_span=None):
+    """Clusters the breakpoints of each chromosome within a tolerance.
+
+    Breakpoints are sorted by chromosome and base pair and swept from left to
+     right. A breakpoint joins the current cluster if it lies on the same
+     chromosome at most `slack` base pairs after the previous breakpoint and,
+     if `max_span` is given, at most `max_span` base pairs after the first
+     breakpoint of the cluster. Otherwise it starts a new cluster.
+
+    Parameters
+    ----------
+    chroms : array_like of int
+        The chromosome of every breakpoint.
+    bps : array_like of int
+        The base pair of every breakpoint.
+    slack : int
+        The largest gap between consecutive breakpoints of a cluster.
+    max_span : int, optional
+        The largest distance between the first and the last breakpoint of a
+         cluster, by default unbounded.
+
+    Returns
+    -------
+    tuple
+        The canonical `BreakLocation` of every cluster in sorted order, and a
+         NumPy array mapping every breakpoint to the index of its cluster.
+        The canonical location of a cluster is its lower median breakpoint.
+    """
+    chroms = np.asarray(chroms, dtype=np.int64)
+    bps = np.asarray(bps, dtype=np.int64)
+    order = np.lexsort((bps, chroms))
+    chroms, bps = chroms[order], bps[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (chroms[1:] != chroms[:-1]) | (np.diff(bps) > slack)
+    if max_span is not None:
+        firsts = np.flatnonzero(new)
+        lasts = np.append(firsts[1:], len(bps))-1
+        wide = bps[lasts]-bps[firsts] > max_span
+        for first, last in zip(firsts[wide].tolist(), lasts[wide].tolist()):
+            anchor = bps[first]
+            for i in range(first+1, last+1):
+                if bps[i]-anchor > max_span:
+                    new[i] = True
+                    anchor = bps[i]
+    firsts = np.flatnonzero(new)
+    sizes = np.diff(np.append(firsts, len(bps)))
+    medians = bps[firsts+(sizes-1)//2]
+    locations = [BreakLocation(chrom, bp) for chrom, bp
+                    in zip(chroms[firsts].tolist(), medians.tolist())]
+    mapping = np.empty(len(order), dtype=np.int64)
+    mapping[order] = np.cumsum(new)-1
+    return locations, mapping
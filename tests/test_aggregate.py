@@ -0,0 +1,83 @@
+import pickle
+import unittest
+from collections import Counter
+
+from aberration_multigraph.aggregate import (Count, Histogram, JointHistogram,
+                                             Predicate, aggregate,
+                                             aggregate_batches,
+                                             cycle_structure, diameter, girth,
+                                             merge, num_cycles)
+from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.incomplete_amg import IncompleteAMG
+
+
+def has_two_cycles(amg):
+    return len(amg.cycles()) == 2
+
+
+def reducers():
+    return [Count(), Histogram(diameter), Histogram(cycle_structure),
+            JointHistogram(diameter, num_cycles), Predicate(has_two_cycles)]
+
+
+class TestAggregate(unittest.TestCase):
+    """Reducers share one pass and merge across workers."""
+
+    def setUp(self):
+        self.amgs = list(AMGGenerator(1, [4]).generate_amgs())
+
+    def test_single_pass_matches_direct_computation(self):
+        results = aggregate(self.amgs, reducers())
+        self.assertEqual(results['count'], len(self.amgs))
+        self.assertEqual(results['diameter'],
+                         Counter(amg.diameter() for amg in self.amgs))
+        self.assertEqual(results['diameter_num_cycles'],
+                         Counter((amg.diameter(), len(amg.cycles()))
+                                 for amg in self.amgs))
+        self.assertEqual(results['has_two_cycles'],
+                         sum(len(amg.cycles()) == 2 for amg in self.amgs))
+        self.assertEqual(sum(results['cycle_structure'].values()),
+                         len(self.amgs))
+
+    def test_merged_workers_match_single_pass(self):
+        partials = []
+        for share in (self.amgs[::3], self.amgs[1::3], self.amgs[2::3]):
+            worker = reducers()
+            aggregate(share, worker)
+            partials.append(pickle.loads(pickle.dumps(worker)))
+        self.assertEqual(merge(partials), aggregate(self.amgs, reducers()))
+
+    def test_generator_aggregate(self):
+        gen = AMGGenerator(2, [2, 1])
+        results = gen.aggregate([Histogram(girth), Count()])
+        self.assertEqual(results['count'], gen.amg_counter)
+        self.assertEqual(sum(results['girth'].values()), results['count'])
+
+    def test_batches_match_single_amgs(self):
+        collection = AMGGenerator(1, [4]).collection()
+        batches = [collection[:25], collection[25:]]
+        results = aggregate_batches(batches, [
+            Count(), Histogram('diameter'), Histogram('cycle_structure'),
+            JointHistogram('diameter', num_cycles), Predicate(has_two_cycles)])
+        self.assertEqual(results, aggregate(self.amgs, reducers()))
+
+    def test_incomplete_amg_aggregate(self):
+        gen = AMGGenerator(2, [2, 1])
+        v = [u for edge in gen.dsbs for u in edge]
+        inc = IncompleteAMG(gen.chromatins, gen.dsbs, [(v[0], v[3])], 'p')
+        amgs = list(inc.complete_amgs())
+        results = inc.aggregate([Count(), Histogram('girth'),
+                                 Histogram(lambda amg: amg.name, 'names')])
+        self.assertEqual(results['count'], inc.count)
+        self.assertEqual(results['girth'], Counter(girth(amg) for amg in amgs))
+        self.assertEqual(results['names'], Counter(amg.name for amg in amgs))
+
+    def test_invalid_reducers(self):
+        with self.assertRaises(ValueError):
+            aggregate(self.amgs, [Histogram(diameter), Histogram(diameter)])
+        with self.assertRaises(ValueError):
+            Histogram(diameter).merge(Histogram(girth))
+
+
+if __name__ == "__main__":
+    unittest.main()
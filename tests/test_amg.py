@@ -1,5 +1,8 @@
 import unittest, warnings
-from aberration_multigraph.amg import AberrationMultigraph
+from collections import Counter
+from aberration_multigraph.amg import (AberrationMultigraph,
+                                      cycle_structure_counts,
+                                      cycle_structure_label)
 import numpy as np
 
 class TestAMG(unittest.TestCase):
@@ -48,6 +51,13 @@ class TestAMG(unittest.TestCase):
 
         self.assertEqual(amg.diameter(), np.inf)
 
+    def test_cycle_structure_label(self):
+        for cs, label in ((Counter(), ''), (Counter({4: 1}), '4'),
+                          (Counter({6: 2, 4: 1}), '4+6*2'),
+                          (Counter({20: 1}), '20')):
+            self.assertEqual(cycle_structure_label(cs), label)
+            self.assertEqual(cycle_structure_counts(label), cs)
+
     def test_girth(self):
         amg = AberrationMultigraph((('A','B'), ('C','D'), ('E','F'), ('G','H')),
                             (('B','C'), ('D','E'), ('F','G')),
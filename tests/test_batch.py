@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+
+from aberration_multigraph.aggregate import cycle_structure
+from aberration_multigraph.amg import AberrationMultigraph
+from aberration_multigraph.batch import (invariants, plain_values,
+                                         rejoin_invariants)
+from aberration_multigraph.generator import AMGGenerator
+
+
+def girth(amg):
+    try:
+        return amg.girth()
+    except ValueError:
+        return np.inf
+
+
+class TestBatchInvariants(unittest.TestCase):
+    """Batched kernels agree with the invariants of single AMGs."""
+
+    def assertMatchesAMGs(self, amgs, results):
+        for i, amg in enumerate(amgs):
+            self.assertEqual(results['diameter'][i], amg.diameter())
+            self.assertEqual(results['girth'][i], girth(amg))
+            self.assertEqual(results['num_cycles'][i], len(amg.cycles()))
+            self.assertEqual(results['cycle_structure'][i],
+                             cycle_structure(amg))
+            self.assertEqual(results['is_connected'][i], amg.is_connected())
+
+    def test_generated_amgs(self):
+        for num_dsbs in ([4], [2, 2], [2, 1, 1]):
+            with self.subTest(num_dsbs=num_dsbs):
+                amgs = list(AMGGenerator(len(num_dsbs),
+                                         num_dsbs).generate_amgs())
+                self.assertMatchesAMGs(amgs, invariants(amgs, chunk_size=7))
+
+    def test_disconnected_amgs(self):
+        gen = AMGGenerator(3, [2, 1, 1])
+        v = [u for edge in gen.dsbs for u in edge]
+        amgs = [AberrationMultigraph(gen.chromatins, gen.dsbs, rejoins)
+                    for rejoins in ([(v[0], v[1]), (v[2], v[3])],
+                                    [(v[0], v[4]), (v[1], v[6])],
+                                    [(v[1], v[2]), (v[5], v[7])])]
+        results = invariants(amgs)
+        self.assertFalse(results['is_connected'].all())
+        self.assertMatchesAMGs(amgs, results)
+
+    def test_rejoin_arrays(self):
+        gen = AMGGenerator(2, [2, 1])
+        amgs = gen.collection()
+        results = rejoin_invariants(gen.chromatins, gen.dsbs, amgs.rejoins,
+                                    ['diameter', 'num_cycles'])
+        self.assertEqual(list(results), ['diameter', 'num_cycles'])
+        self.assertEqual(plain_values(results['diameter']),
+                         [amg.diameter() for amg in amgs])
+        np.testing.assert_array_equal(results['num_cycles'],
+                                      amgs.invariant('num_cycles'))
+        with self.assertRaises(ValueError):
+            rejoin_invariants(gen.chromatins, gen.dsbs, amgs.rejoins,
+                              ['radius'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from aberration_multigraph import cache
+from aberration_multigraph.amg import cycle_structure_label
+from aberration_multigraph.cache import ResultCache, fingerprint
+from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.incomplete_amg import IncompleteAMG
+
+
+class TestResultCache(unittest.TestCase):
+    """The SQLite cache stores, evicts and serves results."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'results.sqlite')
+        self.cache = ResultCache(self.filename)
+
+    def tearDown(self):
+        self.cache.close()
+        self.dir.cleanup()
+
+    def test_round_trip_and_persistence(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', {'count': 3, 'diameters': [[5, 2], [float('inf'), 1]]})
+        self.cache.close()
+        self.cache = ResultCache(self.filename)
+        self.assertIn('a', self.cache)
+        self.assertEqual(self.cache.get('a'),
+                         {'count': 3, 'diameters': [[5, 2], [float('inf'), 1]]})
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.max_bytes = 25
+        self.cache.put('a', 'x'*8)
+        self.cache.put('b', 'y'*8)
+        self.cache.get('a')
+        self.cache.put('c', 'z'*8)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('c', self.cache)
+        self.assertLessEqual(self.cache.size(), 25)
+
+    def test_size_is_kept_up_to_date(self):
+        self.cache.put('a', 'x'*8)
+        self.cache.put('b', 'y'*8)
+        self.cache.put('a', 'x'*4)
+        self.assertEqual(self.cache.size(), 16)
+        self.cache.max_bytes = 12
+        self.cache.put('c', 'z'*2)
+        self.assertEqual(self.cache.size(), 10)
+        self.cache.close()
+        self.cache = ResultCache(self.filename)
+        self.assertEqual(self.cache.size(), 10)
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_fingerprint_depends_on_version(self):
+        key = fingerprint('count', [(0, 1), (4, 5)], [(1, 4)])
+        version = cache.CACHE_VERSION
+        cache.CACHE_VERSION = version+1
+        try:
+            self.assertNotEqual(key, fingerprint('count', [(0, 1), (4, 5)],
+                                                 [(1, 4)]))
+        finally:
+            cache.CACHE_VERSION = version
+
+    def test_fingerprint_is_canonical(self):
+        key = fingerprint('count', [(0, 1), (4, 5)], [(1, 4)], [(4, 1)])
+        self.assertEqual(key, fingerprint('count', [(5, 4), (1, 0)], [(4, 1)],
+                                          [(1, 4)]))
+        self.assertEqual(key, fingerprint('count', [(10, 11), (14, 15)],
+                                          [(11, 14)], [(11, 14)]))
+        self.assertNotEqual(key, fingerprint('count', [(0, 1), (4, 5)],
+                                             [(1, 4)]))
+        self.assertNotEqual(key, fingerprint('other', [(0, 1), (4, 5)],
+                                             [(1, 4)], [(4, 1)]))
+
+    def test_generator_statistics_are_reused(self):
+        gen = AMGGenerator(2, [2, 1])
+        stats = gen.statistics(self.cache)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(AMGGenerator(2, [2, 1]).statistics(self.cache), stats)
+        self.assertEqual(stats, gen.statistics(cache=False))
+        self.assertEqual(gen.count_amgs(self.cache), stats['count'])
+        self.assertEqual(stats['count'], len(list(gen.generate_amgs())))
+        AMGGenerator(2, [1, 2]).statistics(self.cache)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_incomplete_amg_statistics_are_reused(self):
+        gen = AMGGenerator(2, [2, 1])
+        v = [u for edge in gen.dsbs for u in edge]
+        inc = IncompleteAMG(gen.chromatins, gen.dsbs, [(v[0], v[3])])
+        stats = inc.statistics(self.cache)
+        amgs = list(inc.complete_amgs())
+        self.assertEqual(stats['count'], len(amgs))
+        self.assertEqual(sum(stats['diameters'].values()), len(amgs))
+        self.assertEqual(stats['cycle_structures'],
+                         Counter(cycle_structure_label(amg.cycle_structure())
+                                     for amg in amgs))
+        cached = IncompleteAMG(gen.chromatins, gen.dsbs, [(v[0], v[3])])
+        self.assertEqual(cached.statistics(self.cache), stats)
+        self.assertEqual(cached.count_amgs(self.cache), len(amgs))
+        constrained = IncompleteAMG(gen.chromatins, gen.dsbs, [(v[0], v[3])],
+                                    forbidden=[(v[1], v[4])])
+        self.assertNotEqual(constrained._fingerprint('statistics'),
+                            inc._fingerprint('statistics'))
+
+
+if __name__ == "__main__":
+    unittest.main()
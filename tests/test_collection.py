@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from aberration_multigraph.collection import AMGCollection
+from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.incomplete_amg import IncompleteAMG
+from aberration_multigraph.store import AMGStore
+
+
+class TestAMGCollection(unittest.TestCase):
+    """Array-backed collections of AMGs on one backbone."""
+
+    def setUp(self):
+        self.gen = AMGGenerator(1, [4])
+        self.amgs = list(self.gen.generate_amgs())
+        self.collection = self.gen.collection()
+
+    def test_generator_collection(self):
+        self.assertEqual(len(self.collection), len(self.amgs))
+        self.assertEqual(self.gen.amg_counter, len(self.amgs))
+        self.assertEqual(list(self.collection), self.amgs)
+        self.assertEqual(self.collection[7].name, self.amgs[7].name)
+        self.assertEqual(self.collection.rejoins.shape, (len(self.amgs), 4, 2))
+
+    def test_incomplete_amg_collection(self):
+        v = [u for edge in self.gen.dsbs for u in edge]
+        inc = IncompleteAMG(self.gen.chromatins, self.gen.dsbs,
+                            [(v[0], v[5])], 'p')
+        collection = inc.collection()
+        amgs = list(inc.complete_amgs())
+        self.assertEqual(list(collection), amgs)
+        self.assertEqual([amg.name for amg in collection],
+                         [amg.name for amg in amgs])
+
+    def test_partners_round_trip(self):
+        partners = self.collection.partners
+        self.assertEqual(partners.shape,
+                         (len(self.amgs), len(self.collection.vertices)))
+        rebuilt = AMGCollection.from_partners(
+            self.gen.chromatins, self.gen.dsbs, partners)
+        np.testing.assert_array_equal(rebuilt.rejoins,
+                                      self.collection.rejoins)
+
+    def test_filter_and_group_by(self):
+        diameters = self.collection.invariant('diameter')
+        self.assertEqual(Counter(diameters.tolist()),
+                         Counter(amg.diameter() for amg in self.amgs))
+        groups = self.collection.group_by('cycle_structure')
+        self.assertEqual(sum(len(group) for group in groups.values()),
+                         len(self.amgs))
+        for label, group in groups.items():
+            self.assertTrue((group.invariant('cycle_structure') == label).all())
+        two = self.collection.filter(num_cycles=2, diameter=diameters.max())
+        self.assertEqual(list(two),
+                         [amg for amg in self.amgs if len(amg.cycles()) == 2
+                             and amg.diameter() == diameters.max()])
+
+    def test_set_operations(self):
+        evens, firsts = self.collection[::2], self.collection[:30]
+        both = evens.intersection(firsts)
+        self.assertEqual(list(both), self.amgs[:30:2])
+        self.assertEqual(list(evens.difference(firsts)), self.amgs[30::2])
+        last = len(self.collection.vertices)-1
+        relabeled = AMGCollection(self.gen.chromatins, self.gen.dsbs,
+                                  last-firsts.rejoins.astype(int),
+                                  vertices=self.collection.vertices[::-1])
+        self.assertEqual(list(evens.intersection(relabeled)), list(both))
+        other = AMGGenerator(2, [2, 2]).collection()
+        with self.assertRaises(ValueError):
+            evens.intersection(other)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            filename = os.path.join(dir_name, 'amgs.store')
+            self.collection.invariant('diameter')
+            self.collection.save(filename)
+            loaded = AMGCollection.load(filename)
+            self.assertEqual(list(loaded), self.amgs)
+            np.testing.assert_array_equal(loaded.invariant('diameter'),
+                                          self.collection.invariant('diameter'))
+            self.assertEqual(list(AMGStore(filename)), self.amgs)
+
+
+if __name__ == "__main__":
+    unittest.main()
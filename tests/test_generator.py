@@ -1,6 +1,11 @@
+import csv
+import gzip
+import os
+import tempfile
 import unittest
 
-from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.generator import (AMGGenerator, dsb_distributions,
+                                             sweep)
 
 
 class TestAMGGeneratorStructure(unittest.TestCase):
@@ -93,6 +98,62 @@ class TestAMGGeneratorKnownCounts(unittest.TestCase):
                 gen = AMGGenerator(n, dsbs)
                 count = sum(1 for _ in gen.generate_amgs())
                 self.assertEqual(count, expected)
+                self.assertEqual(gen.count_amgs(cache=False), expected)
+
+
+class TestAMGGeneratorSweep(unittest.TestCase):
+    """Sweeps share the statistics of permuted DSB distributions."""
+
+    def test_distributions_are_canonical_partitions(self):
+        distributions = list(dsb_distributions(4, max_chromosomes=2))
+        self.assertEqual(distributions, [(1,), (2,), (1, 1), (3,), (2, 1),
+                                         (4,), (3, 1), (2, 2)])
+
+    def test_permutations_share_statistics(self):
+        results = sweep([(1, 2), (2, 1), (2, 1, 0)], cache=False)
+        self.assertIs(results[(1, 2)], results[(2, 1)])
+        self.assertEqual(results[(1, 2)],
+                         AMGGenerator(2, [1, 2]).statistics(cache=False))
+        self.assertEqual(results[(2, 1, 0)]['count'], 0)
+
+
+class TestAMGGeneratorReport(unittest.TestCase):
+    """The CSV report has one well-formed row per AMG."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.gen = AMGGenerator(1, [4])
+        self.amgs = list(self.gen.generate_amgs())
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def read(self, filename, opener=open):
+        with opener(os.path.join(self.dir.name, filename), 'rt',
+                    newline='') as file:
+            return list(csv.reader(file))
+
+    def test_rows_match_generated_amgs(self):
+        filename = os.path.join(self.dir.name, 'report.csv')
+        count = self.gen.full_report(filename, workers=0, batch_size=7)
+        self.assertEqual(count, len(self.amgs))
+        rows = self.read('report.csv')
+        self.assertEqual(rows[0], ['rank', 'rejoins', 'diameter',
+                                   'cycle_structure', 'cycles'])
+        for row, amg in zip(rows[1:], self.amgs):
+            self.assertEqual(row[0], amg.name)
+            self.assertEqual(row[1], ','.join(f'({u},{v})'
+                                              for u, v in amg.rejoins))
+            self.assertEqual(row[2], str(amg.diameter()))
+        self.assertEqual(len(rows), len(self.amgs)+1)
+
+    def test_parallel_gzip_report_matches(self):
+        self.gen.full_report(os.path.join(self.dir.name, 'report.csv'),
+                             workers=0)
+        self.gen.full_report(os.path.join(self.dir.name, 'report.csv.gz'),
+                             workers=2, batch_size=5, max_pending=2)
+        self.assertEqual(self.read('report.csv.gz', gzip.open),
+                         self.read('report.csv'))
 
 
 if __name__ == "__main__":
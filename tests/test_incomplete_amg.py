@@ -134,5 +134,206 @@ class TestIncompleteAMGInvariants(unittest.TestCase):
             self.assertEqual(used, dsb_vertices)
 
 
+class TestIncompleteAMGConstraints(unittest.TestCase):
+    """Forbidden pairs and vertex group capacities prune completions."""
+
+    def setUp(self):
+        gen = AMGGenerator(2, [1, 1])
+        self.chromatins, self.dsbs = gen.chromatins, gen.dsbs
+        self.unconstrained = [
+            amg.rejoins for amg in
+            IncompleteAMG(self.chromatins, self.dsbs, []).complete_amgs()
+        ]
+
+    def test_forbidden_pair_is_never_rejoined(self):
+        pair = self.unconstrained[0][0]
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [], forbidden=[pair])
+        completions = [amg.rejoins for amg in inc.complete_amgs()]
+        self.assertEqual(inc.count_amgs(), len(self.unconstrained)-1)
+        for rejoins in completions:
+            self.assertNotIn(frozenset(pair), map(frozenset, rejoins))
+
+    def test_capacity_matches_filtered_enumeration(self):
+        gen = AMGGenerator(2, [2, 1])
+        group = (gen.dsbs[0][0], gen.dsbs[1][0])
+        unconstrained = [
+            amg.rejoins for amg in
+            IncompleteAMG(gen.chromatins, gen.dsbs, []).complete_amgs()
+        ]
+        expected = [rejoins for rejoins in unconstrained
+                    if sum(u in group or v in group for u, v in rejoins) <= 1]
+        inc = IncompleteAMG(gen.chromatins, gen.dsbs, [],
+                            capacities={group: 1})
+        completions = [amg.rejoins for amg in inc.complete_amgs()]
+        self.assertTrue(0 < len(expected) < len(unconstrained))
+        self.assertEqual(sorted(completions), sorted(expected))
+        self.assertEqual(
+            IncompleteAMG(gen.chromatins, gen.dsbs, [],
+                          capacities={group: 1}).count_amgs(),
+            len(expected))
+
+    def test_infeasible_capacity_yields_nothing(self):
+        group = tuple(v for edge in self.dsbs for v in edge)
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [],
+                            capacities={group: 1})
+        self.assertEqual(inc.count_amgs(), 0)
+        self.assertEqual(list(inc.complete_amgs()), [])
+
+
+class TestIncompleteAMGOptimize(unittest.TestCase):
+    """Branch-and-bound agrees with exhaustive enumeration."""
+
+    def setUp(self):
+        gen = AMGGenerator(2, [2, 1])
+        self.chromatins, self.dsbs = gen.chromatins, gen.dsbs
+        self.amgs = list(
+            IncompleteAMG(self.chromatins, self.dsbs, []).complete_amgs())
+
+    def test_optimum_matches_enumeration(self):
+        values = {
+            'cycles': [len(amg.cycles()) for amg in self.amgs],
+            'diameter': [amg.diameter() for amg in self.amgs],
+        }
+        for objective, observed in values.items():
+            for maximize, pick in ((False, min), (True, max)):
+                with self.subTest(objective=objective, maximize=maximize):
+                    inc = IncompleteAMG(self.chromatins, self.dsbs, [])
+                    result = inc.optimize(objective, maximize)
+                    self.assertEqual(result.value, pick(observed))
+                    self.assertIn(frozenset(result.amg.rejoins),
+                                  {frozenset(amg.rejoins) for amg in self.amgs})
+
+    def test_connected_completions_only(self):
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [])
+        result = inc.optimize('diameter', maximize=True, connected=True)
+        self.assertTrue(result.amg.is_connected())
+        self.assertEqual(result.value,
+                         max(amg.diameter() for amg in self.amgs
+                             if amg.is_connected()))
+
+    def test_infeasible_and_unknown_objective(self):
+        group = tuple(v for edge in self.dsbs for v in edge)
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [],
+                            capacities={group: 1})
+        self.assertEqual(inc.optimize('cycles'), (None, None, 0, 0))
+        with self.assertRaises(ValueError):
+            inc.optimize('girth')
+
+
+class TestIncompleteAMGInvariantBounds(unittest.TestCase):
+    """Invariant bounds enclose the invariants of every completion."""
+
+    def test_bounds_enclose_enumeration(self):
+        gen = AMGGenerator(2, [2, 2])
+        vertices = [v for edge in gen.dsbs for v in edge]
+        for rejoins in ([], [(vertices[0], vertices[3])],
+                        [(vertices[1], vertices[2]), (vertices[4], vertices[7])]):
+            with self.subTest(rejoins=rejoins):
+                inc = IncompleteAMG(gen.chromatins, gen.dsbs, rejoins)
+                bounds = inc.invariant_bounds()
+                amgs = list(inc.complete_amgs())
+                cycles = [len(amg.cycles()) for amg in amgs]
+                lengths = [len(c) for amg in amgs for c in amg.cycles()]
+                diameters = [amg.diameter() for amg in amgs]
+                self.assertEqual(bounds.cycles, (min(cycles), max(cycles)))
+                self.assertEqual(bounds.cycle_lengths,
+                                 (min(lengths), max(lengths)))
+                self.assertLessEqual(bounds.diameter[0], min(diameters))
+                self.assertGreaterEqual(bounds.diameter[1], max(diameters))
+
+    def test_complete_amg_bounds_are_exact(self):
+        gen = AMGGenerator(1, [2])
+        amg = next(iter(
+            IncompleteAMG(gen.chromatins, gen.dsbs, []).complete_amgs()))
+        bounds = IncompleteAMG(gen.chromatins, gen.dsbs,
+                               amg.rejoins).invariant_bounds()
+        cycles = len(amg.cycles())
+        self.assertEqual(bounds.cycles, (cycles, cycles))
+        self.assertEqual(bounds.diameter, (amg.diameter(), amg.diameter()))
+
+
+class TestReducedIAMG(unittest.TestCase):
+    """The reduced instance agrees with the completions of the full one."""
+
+    def setUp(self):
+        gen = AMGGenerator(2, [2, 2])
+        self.chromatins, self.dsbs = gen.chromatins, gen.dsbs
+        self.vertices = [v for edge in gen.dsbs for v in edge]
+
+    def test_fixed_path_becomes_super_edge(self):
+        v = self.vertices
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [(v[1], v[2])])
+        reduced = inc.reduce()
+        self.assertEqual(reduced.ends[v[0]], v[3])
+        self.assertEqual(reduced.lengths[v[0]], 2)
+        self.assertTrue(reduced.is_bare(v[4], v[5]))
+        self.assertFalse(reduced.is_bare(v[0], v[3]))
+
+    def test_statistics_match_completions(self):
+        v = self.vertices
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [(v[0], v[5])])
+        reduced = inc.reduce()
+        amgs = list(inc.complete_amgs())
+        rejoins = list(reduced.complete_rejoins())
+        self.assertEqual(len(rejoins), inc.count_amgs())
+        for amg, new in zip(amgs, rejoins):
+            self.assertEqual(reduced.cycle_structure(new),
+                             amg.cycle_structure())
+            self.assertEqual(reduced.is_connected(new), amg.is_connected())
+        structures = reduced.cycle_structures(connected=True)
+        self.assertEqual(sum(structures.values()),
+                         sum(amg.is_connected() for amg in amgs))
+
+
+class TestIncompleteAMGIncremental(unittest.TestCase):
+    """In-place rejoin edges agree with rebuilt incomplete AMGs."""
+
+    def setUp(self):
+        gen = AMGGenerator(2, [2, 2])
+        self.chromatins, self.dsbs = gen.chromatins, gen.dsbs
+        self.v = [v for edge in gen.dsbs for v in edge]
+
+    def assertSameCompletions(self, inc, rejoins):
+        fresh = IncompleteAMG(self.chromatins, self.dsbs, rejoins)
+        self.assertEqual(sorted(inc.free), sorted(fresh.free))
+        self.assertEqual(inc.count_amgs(), fresh.count_amgs())
+        self.assertEqual(inc.reduce().cycle_structures(connected=True),
+                         fresh.reduce().cycle_structures(connected=True))
+
+    def test_add_rejoin_and_undo(self):
+        v = self.v
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [])
+        free, count = list(inc.free), inc.count_amgs()
+        inc.add_rejoin(v[0], v[3])
+        inc.add_rejoin(v[1], v[2])
+        self.assertSameCompletions(inc, [(v[0], v[3]), (v[1], v[2])])
+        self.assertEqual(inc.reduce().closed, [4])
+        inc.undo()
+        self.assertSameCompletions(inc, [(v[0], v[3])])
+        inc.remove_rejoin(v[0], v[3])
+        self.assertEqual(inc.free, free)
+        self.assertEqual(inc.count_amgs(), count)
+        with self.assertRaises(ValueError):
+            inc.undo()
+
+    def test_remove_fixed_rejoin(self):
+        v = self.v
+        inc = IncompleteAMG(self.chromatins, self.dsbs,
+                            [(v[0], v[3]), (v[4], v[7])])
+        inc.remove_rejoin(v[0], v[3])
+        self.assertSameCompletions(inc, [(v[4], v[7])])
+
+    def test_invalid_rejoins_are_rejected(self):
+        v = self.v
+        inc = IncompleteAMG(self.chromatins, self.dsbs, [(v[0], v[3])],
+                            forbidden=[(v[1], v[4])])
+        for pair in ((v[0], v[1]), (v[4], v[5]), (v[1], v[4])):
+            with self.subTest(pair=pair):
+                with self.assertRaises(ValueError):
+                    inc.add_rejoin(*pair)
+        with self.assertRaises(ValueError):
+            inc.remove_rejoin(v[1], v[2])
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,116 @@
+import unittest
+
+import numpy as np
+
+from aberration_multigraph.markov import AMGMarkovChain, CSRMatrix
+from aberration_multigraph.representative import AMGRepresentative
+
+
+class TestCSRMatrix(unittest.TestCase):
+    """The NumPy CSR matrix agrees with dense arithmetic."""
+
+    def setUp(self):
+        self.dense = np.array([[0., 2., 0.], [1., 0., 3.], [0., 0., 0.]])
+        rows, cols = np.nonzero(self.dense)
+        self.matrix = CSRMatrix.from_coo(rows, cols, self.dense[rows, cols],
+                                         self.dense.shape)
+
+    def test_toarray(self):
+        np.testing.assert_allclose(self.matrix.toarray(), self.dense)
+
+    def test_duplicates_are_summed(self):
+        matrix = CSRMatrix.from_coo([0, 0], [1, 1], [1., 2.], (2, 2))
+        np.testing.assert_allclose(matrix.toarray(), [[0., 3.], [0., 0.]])
+
+    def test_dot_vector_and_matrix(self):
+        x = np.array([1., 2., 3.])
+        np.testing.assert_allclose(self.matrix.dot(x), self.dense @ x)
+        X = np.arange(6.).reshape(3, 2)
+        np.testing.assert_allclose(self.matrix.dot(X), self.dense @ X)
+
+    def test_dot_rows_are_summed_separately(self):
+        # Huge rows before tiny ones ruin a product computed from running
+        # sums over all nonzeros.
+        rng = np.random.default_rng(0)
+        dense = np.zeros((2000, 16))
+        dense[:1000, :8] = rng.random((1000, 8))*1e10
+        dense[1000:, 8:] = rng.random((1000, 8))*1e-3
+        dense[1500] = 0
+        rows, cols = np.nonzero(dense)
+        matrix = CSRMatrix.from_coo(rows, cols, dense[rows, cols], dense.shape)
+        x = rng.random(16)
+        np.testing.assert_allclose(matrix.dot(x), dense @ x, rtol=1e-12)
+        X = rng.random((16, 3))
+        np.testing.assert_allclose(matrix.dot(X), dense @ X, rtol=1e-12)
+
+    def test_transpose(self):
+        np.testing.assert_allclose(self.matrix.transpose().toarray(),
+                                   self.dense.T)
+
+
+class TestAMGMarkovChain(unittest.TestCase):
+    """Transition operators built from representative graphs."""
+
+    def setUp(self):
+        self.rep = AMGRepresentative(2, (2, 2))
+        self.rep.compute_amg_adjacency_list(reversals=True)
+
+    def test_requires_adjacency_list(self):
+        with self.assertRaises(RuntimeError):
+            AMGMarkovChain(AMGRepresentative(2, (1, 1)))
+
+    def test_rows_are_stochastic(self):
+        chain = AMGMarkovChain(self.rep)
+        dense = chain.transition.toarray()
+        np.testing.assert_allclose(dense.sum(axis=1), 1)
+        self.assertTrue((dense >= 0).all())
+
+    def test_move_probabilities(self):
+        chain = AMGMarkovChain(self.rep, {'twist': 0.5})
+        dense = chain.transition.toarray()
+        self.assertTrue((np.diag(dense) >= 0.5-1e-12).all())
+        with self.assertRaises(ValueError):
+            AMGMarkovChain(self.rep, {'twist': 0.7, 'swap': 0.7})
+
+    def test_step_matches_dense(self):
+        chain = AMGMarkovChain(self.rep)
+        p = chain.point_mass(chain.amgs[3])
+        dense = chain.transition.toarray()
+        np.testing.assert_allclose(chain.step(p, 3),
+                                   p @ np.linalg.matrix_power(dense, 3))
+
+    def test_stationary_distribution(self):
+        chain = AMGMarkovChain(self.rep)
+        pi = chain.stationary_distribution()
+        self.assertAlmostEqual(pi.sum(), 1)
+        np.testing.assert_allclose(chain.step(pi), pi, atol=1e-9)
+
+    def test_class_mass_is_conserved(self):
+        chain = AMGMarkovChain(self.rep)
+        history = chain.propagate_classes(chain.point_mass(chain.amgs[0]), 4)
+        self.assertEqual(history.shape, (5, len(chain.classes)))
+        np.testing.assert_allclose(history.sum(axis=1), 1)
+
+
+class TestRepresentativeOperations(unittest.TestCase):
+    """Operation descriptors recorded by the representative builder."""
+
+    def test_operations_are_described(self):
+        rep = AMGRepresentative(2, (1, 1))
+        rep.compute_amg_adjacency_list()
+        self.assertEqual(rep.operations, {1: ('twist', 0), 2: ('twist', 1),
+                                          3: ('swap', 0, 1)})
+
+    def test_reversals_match_amg(self):
+        rep = AMGRepresentative(1, (2,))
+        rep.compute_amg_adjacency_list(reversals=True)
+        for amg, nbrs in rep.adjacency_list.items():
+            for rejoins, operation in nbrs:
+                kind = rep.operations[operation]
+                if kind[0] == 'reversal':
+                    self.assertEqual(rejoins,
+                                     amg.edge_reversal(kind[1]).rejoins)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,302 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from examples.patient_analysis.pcawg_patient import (
+    PCAWGPatient, CN_ERRORS, EV_REJOINS_MINUS_OK, EV_REJOINS_OK)
+from examples.patient_analysis.sv_utils import BreakLocation
+
+SV_EXTENSION = '.pcawg_consensus_1.6.161116.somatic.sv.bedpe'
+CN_EXTENSION = '.consensus.20170119.somatic.cna.txt'
+SV_HEADER = ('chrom1\tstart1\tend1\tchrom2\tstart2\tend2\tsv_id\tpe_support'
+             '\tstrand1\tstrand2\tsvclass\tsvmethod\n')
+CN_HEADER = 'chromosome\tstart\tend\ttotal_cn\tmajor_cn\tminor_cn\tstar\n'
+
+
+def write_patient(patient_id, svs, segments, dataset='tcga'):
+    """Writes the SV and CNA files of a synthetic patient below the current
+    directory.
+
+    `svs` are (chrom1, start1, chrom2, start2, strand1, strand2) tuples, whose
+    ends are one base pair after their starts, and `segments` are (chrom,
+    start, end, total_cn) tuples in file order.
+    """
+    sv_path = f'data/{dataset}_sv/open/'
+    cn_path = f'data/{dataset}_cna/'
+    os.makedirs(sv_path, exist_ok=True)
+    os.makedirs(cn_path, exist_ok=True)
+    with open(sv_path+patient_id+SV_EXTENSION, 'w') as file:
+        file.write(SV_HEADER)
+        for k, (c1, s1, c2, s2, str1, str2) in enumerate(svs):
+            file.write(f'{c1}\t{s1}\t{s1+1}\t{c2}\t{s2}\t{s2+1}\tsv{k}\t5'
+                       f'\t{str1}\t{str2}\tTRA\tSNOWMAN\n')
+    with open(cn_path+patient_id+CN_EXTENSION, 'w') as file:
+        file.write(CN_HEADER)
+        for chrom, start, end, total_cn in segments:
+            major = 'NA' if total_cn == 'NA' else total_cn
+            file.write(f'{chrom}\t{start}\t{end}\t{total_cn}\t{major}\t0\t1\n')
+
+
+def reference_cn(patient, bl):
+    """The copy number lookup by a linear scan of the segments in file order."""
+    segments = patient.sequence[bl.chrom]
+    for segment in segments:
+        if segment.start <= bl.bp <= segment.end:
+            return ((segment.total_cn, 0) if segment.total_cn != 'NA'
+                    else (0, 'NA'))
+    if not segments:
+        return (0, 'Not sequenced')
+    if bl.bp < segments[0].start:
+        return (0, '<')
+    if bl.bp > segments[-1].end:
+        return (0, '>')
+    return (0, 'Not sequenced')
+
+
+class PatientTestCase(unittest.TestCase):
+    """Runs every test in a temporary directory holding synthetic data."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.TemporaryDirectory()
+        os.chdir(self.dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.dir.cleanup()
+
+
+class TestCopyNumberLookup(PatientTestCase):
+    """Copy numbers of break locations, as looked up by `_bp_loc_cn`."""
+
+    SEGMENTS = [(1, 100, 199, 2), (1, 200, 299, 'NA'), (1, 400, 499, 3),
+                (2, 14, 1830, 0), (2, 1827, 4792, 2), (2, 5000, 5999, 4),
+                (2, 5100, 5200, 1), (3, 10, 20, 1)]
+
+    def setUp(self):
+        super().setUp()
+        write_patient('p', [(1, 150, 2, 1829, '-', '+')], self.SEGMENTS)
+        self.patient = PCAWGPatient('p', 'tcga')
+
+    def assertCN(self, chrom, bp, expected):
+        self.assertEqual(self.patient._bp_loc_cn(BreakLocation(chrom, bp)),
+                         expected)
+
+    def test_exact(self):
+        self.assertCN(1, 100, (2, 0))
+        self.assertCN(1, 199, (2, 0))
+        self.assertCN(1, 450, (3, 0))
+
+    def test_slack(self):
+        bls = [BreakLocation(1, 198), BreakLocation(1, 201)]
+        copies, errors = self.patient.bp_locs_cn(bls, offset=2)
+        self.assertEqual(copies.tolist(), [0, 0])
+        self.assertEqual([CN_ERRORS[e] for e in errors], ['NA', 'NA'])
+        copies, errors = self.patient.bp_locs_cn(bls, offset=-2)
+        self.assertEqual(copies.tolist(), [2, 2])
+        self.assertEqual([CN_ERRORS[e] for e in errors], [0, 0])
+
+    def test_out_of_range(self):
+        self.assertCN(1, 99, (0, '<'))
+        self.assertCN(1, 500, (0, '>'))
+        self.assertCN(3, 9, (0, '<'))
+        self.assertCN(3, 21, (0, '>'))
+
+    def test_na(self):
+        self.assertCN(1, 250, (0, 'NA'))
+
+    def test_gap(self):
+        self.assertCN(1, 300, (0, 'Not sequenced'))
+        self.assertCN(1, 399, (0, 'Not sequenced'))
+        self.assertCN(2, 4900, (0, 'Not sequenced'))
+
+    def test_unsequenced_chromosome(self):
+        self.assertCN(4, 100, (0, 'Not sequenced'))
+
+    def test_overlap_resolves_to_first_segment(self):
+        self.assertCN(2, 1829, (0, 0))
+        self.assertCN(2, 1831, (2, 0))
+
+    def test_nested_segment(self):
+        self.assertCN(2, 5150, (4, 0))
+        self.assertCN(2, 5500, (4, 0))
+
+    def test_matches_linear_scan(self):
+        for chrom in (1, 2, 3, 4):
+            bps = np.arange(0, 6200, 7)
+            copies, errors = self.patient._locs_cn(
+                np.full(len(bps), chrom), bps)
+            for bp, cn, error in zip(bps.tolist(), copies.tolist(),
+                                     errors.tolist()):
+                expected = reference_cn(self.patient, BreakLocation(chrom, bp))
+                self.assertEqual((cn, CN_ERRORS[error]), expected, (chrom, bp))
+
+    def test_break_locations_cn(self):
+        chroms, bps, copies, errors = self.patient.break_locations_cn()
+        self.assertEqual(list(zip(chroms.tolist(), bps.tolist())),
+                         [(1, 150), (1, 151), (2, 1829), (2, 1830)])
+        self.assertEqual(copies.tolist(),
+                         [[2, 2, 2], [2, 2, 2], [0, 0, 2], [0, 0, 2]])
+        self.assertTrue((errors == 0).all())
+
+
+class TestValidation(PatientTestCase):
+    """Events recorded by `check_valid`."""
+
+    def test_overlapping_segments(self):
+        write_patient('p184', [(2, 1829, 2, 4000, '-', '+')],
+                      [(2, 14, 1830, 0), (2, 1827, 4792, 2)])
+        patient = PCAWGPatient('p184', 'tcga')
+        self.assertFalse(patient._check_rejoins_cn())
+        self.assertEqual(patient.events,
+                         [(EV_REJOINS_MINUS_OK, 2, 1829, (1, 0))])
+        self.assertIn('bp=1829) is rejoined', patient.logs[0][1])
+        self.assertIn('in 1 SVs while CN is 0.', patient.logs[0][1])
+
+    def test_render_logs(self):
+        segments = [(c, 1, 1000, 2) for c in range(6, 23)]
+        segments += [(1, 1, 1000, 2), (2, 1, 1000, 2), (2, 1005, 2000, 2),
+                     (3, 14, 1830, 0), (3, 1827, 4792, 2),
+                     (4, 1, 499, 3), (4, 500, 500, 0), (4, 501, 1000, 3),
+                     (5, 1, 1000, 'NA')]
+        write_patient('e', [(1, 500, 1, 600, '-', '-'),
+                            (3, 1829, 3, 4000, '-', '+'),
+                            (4, 500, 4, 700, '-', '+'),
+                            (5, 100, 5, 200, '-', '+')], segments)
+        patient = PCAWGPatient('e', 'tcga')
+        self.assertFalse(patient.check_valid())
+        messages = [
+            'Patient e',
+            'Chromosome 23 not sequenced.',
+            'Patient e: Missing bps in chromosome 2: 1000 to 1005.',
+            'Patient e: Duplicate bps sequenced in chromosome 3: 1827 to 1830.',
+            'Patient e: BreakLocation(chrom=3, bp=1829) is rejoined in 1 SVs '
+                'while CN is 0. But a location -2 is fine.',
+            'Patient e: BreakLocation(chrom=4, bp=500) is rejoined in 1 SVs '
+                'while CN is 0.',
+            'Patient e: BreakLocation(chrom=5, bp=100) CN not found for break '
+                'location. Marked NA.',
+            'Patient e: BreakLocation(chrom=5, bp=201) CN not found for break '
+                'location. Marked NA.',
+            '----------------------']
+        priorities = [5, 5, 5, 5, 1, 5, 5, 5, 5]
+        for level in (1, 5, 6):
+            logs = patient.render_logs(level)
+            self.assertEqual([' '.join(log.split()) for log in logs],
+                             [message for message, priority
+                                in zip(messages, priorities)
+                                if priority >= level])
+            self.assertTrue(all(log.endswith('\n') for log in logs))
+        self.assertEqual([priority for priority, _ in patient.logs],
+                         priorities)
+        self.assertEqual([log for _, log in patient.logs],
+                         patient.render_logs(1))
+        patient.write_logs('log.txt', 5)
+        with open('log.txt') as log:
+            self.assertEqual(log.read().count('Patient e'), 6)
+        self.assertEqual(patient.events, [])
+
+    def test_rejoins_within_copy_numbers(self):
+        write_patient('p', [(2, 100, 2, 4000, '-', '+')],
+                      [(2, 14, 1830, 1), (2, 1831, 4792, 2)])
+        patient = PCAWGPatient('p', 'tcga')
+        self.assertTrue(patient._check_rejoins_cn())
+        self.assertEqual([event[0] for event in patient.events],
+                         [EV_REJOINS_OK])
+
+
+class TestIncompleteAMG(PatientTestCase):
+    """Vertex numbering of the incomplete AMGs of a patient."""
+
+    SVS = [(1, 100, 1, 101, '-', '+'),          # a fold-back within slack
+           (1, 500, 2, 900, '-', '+'),
+           (1, 500, 3, 50, '+', '-'),           # shares the DSB at (1, 500)
+           (3, 70, 3, 300, '-', '-'),
+           (4, 10, 5, 20, '+', '+')]
+    SEGMENTS = [(1, 1, 1000, 2), (2, 1, 1000, 1), (3, 1, 1000, 3),
+                (4, 1, 100, 1), (5, 1, 100, 'NA')]
+
+    def setUp(self):
+        super().setUp()
+        write_patient('p', self.SVS, self.SEGMENTS)
+        self.patient = PCAWGPatient('p', 'tcga')
+
+    def test_clusters(self):
+        self.assertEqual(self.patient.clusters(),
+                         [frozenset({1, 2, 3}), frozenset({4, 5})])
+        self.assertEqual([amg.name for amg in
+                          self.patient.cluster_amgs().values()],
+                         ['p_1_2_3', 'p_4_5'])
+
+    def test_vertices(self):
+        amg = self.patient.amg([3, 1, 2])
+        self.assertEqual(amg.chromatins,
+                         tuple((2*i, 2*i+1) for i in range(10)))
+        self.assertEqual(amg.dsbs, ((1, 2), (3, 4), (5, 6), (9, 10), (13, 14),
+                                    (15, 16), (17, 18)))
+        self.assertEqual(amg.rejoins, ((1, 4), (5, 10), (6, 13), (15, 17)))
+        self.assertEqual([self.patient.sv_vertices(k) for k in range(4)],
+                         [(1, 4), (5, 10), (6, 13), (15, 17)])
+        self.assertEqual([self.patient.vertex_label(v) for v in (0, 3, 4, 6, 7)],
+                         [BreakLocation(1, 0), BreakLocation(1, 100),
+                          BreakLocation(1, 101), BreakLocation(1, 501),
+                          BreakLocation(1, float('inf'))])
+
+    def test_cn_capacities(self):
+        self.assertEqual(self.patient.cn_capacities([1, 2, 3]),
+                         {(1, 3, 2, 4): 0, (9, 10): 0, (13, 14): 2,
+                          (15, 16): 2, (17, 18): 2})
+        amg = self.patient.amg([1, 2, 3], copy_numbers=True)
+        self.assertEqual(amg.capacities[frozenset({1, 2, 3, 4})], 0)
+        self.assertEqual(amg.capacities[frozenset({13, 14})], 2)
+        self.assertIsNone(self.patient.amg([1, 2, 3]).capacities.get(
+            frozenset({13, 14})))
+        # the copy number of (5, 20) is NA, so it is unconstrained
+        self.assertEqual(self.patient.cn_capacities([4, 5]), {(21, 22): 0})
+
+    def test_random_patients(self):
+        rng = np.random.default_rng(1)
+        for t in range(30):
+            n = int(rng.integers(1, 40))
+            svs = [(int(rng.integers(1, 4)), int(rng.integers(1, 80)),
+                    int(rng.integers(1, 4)), int(rng.integers(1, 80)),
+                    rng.choice(['+', '-']), rng.choice(['+', '-']))
+                        for _ in range(n)]
+            write_patient(f'r{t}', svs, [(c, 1, 1000, 2) for c in (1, 2, 3)])
+            patient = PCAWGPatient(f'r{t}', 'tcga')
+            amg = patient.amg([1, 2, 3], copy_numbers=True)
+            dsb_vertices = {v for edge in amg.dsbs for v in edge}
+            degrees = Counter(v for edge in amg.rejoins for v in edge)
+            self.assertEqual(len(amg.rejoins), n)
+            self.assertTrue(set(degrees) <= dsb_vertices)
+            self.assertEqual(set(degrees.values()), {1})
+            self.assertFalse(set(amg.rejoins) & set(amg.dsbs))
+            locations, mapping = patient.merged_break_locations()
+            for k, (c1, _, c2, _, str1, str2) in enumerate(svs):
+                u, v = patient.sv_vertices(k)
+                for w, loc, strand in ((u, mapping[k, 0], str1),
+                                       (v, mapping[k, 1], str2)):
+                    label = patient.vertex_label(w)
+                    self.assertEqual(label.chrom, locations[loc].chrom)
+                    self.assertEqual(label.bp, locations[loc].bp
+                                                   + (strand == '+'))
+            # a location needs one DSB per '-' or '+' breakend, plus one per
+            # fold-back
+            breakends = Counter()
+            for k, (_, _, _, _, str1, str2) in enumerate(svs):
+                breakends[mapping[k, 0], str1] += 1
+                breakends[mapping[k, 1], str2] += 1
+            dsbs = Counter(patient.vertex_label(u) for u, _ in amg.dsbs)
+            for g, location in enumerate(locations):
+                needed = max(breakends[g, '-'], breakends[g, '+'])
+                folds = sum(1 for k in range(n) if mapping[k, 0] == g
+                                and mapping[k, 1] == g)
+                self.assertGreaterEqual(dsbs[location], needed)
+                self.assertLessEqual(dsbs[location], needed+folds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+
+import numpy as np
+
+from aberration_multigraph.store import open_arrays
+from examples.patient_analysis.pcawg_patient import (PCAWGPatient, EVENT_DTYPE,
+                                                     EV_FAILED)
+from examples.patient_analysis.pcawg_pipeline import validate_cohort
+from tests.test_pcawg_patient import (CN_EXTENSION, PatientTestCase,
+                                      write_patient)
+
+SEGMENTS = [(c, 1, 1000, 2) for c in range(1, 23)]
+
+
+class TestValidateCohort(PatientTestCase):
+    """Validating synthetic patients with the parallel pipeline."""
+
+    def setUp(self):
+        super().setUp()
+        write_patient('a', [(1, 500, 2, 600, '-', '+')], SEGMENTS)
+        write_patient('b', [(3, 100, 3, 900, '-', '-')],
+                      SEGMENTS+[('X', 1, 50, 1)])
+        write_patient('c', [(4, 10, 5, 20, '+', '-')],
+                      SEGMENTS+[(4, 900, 2000, 0)])
+
+    def validate(self, **kwargs):
+        return validate_cohort(['tcga'], 'log.txt', io_workers=2,
+                               cpu_workers=2, report_every=1000, **kwargs)
+
+    def test_validity(self):
+        self.assertEqual(self.validate(), {'a': False, 'b': True, 'c': False})
+        with open('log.txt') as log:
+            logs = log.read()
+        for patient_id in 'abc':
+            patient = PCAWGPatient(patient_id, 'tcga')
+            patient.check_valid()
+            self.assertIn(''.join(patient.render_logs(5)), logs)
+
+    def test_events_file(self):
+        self.validate(events_file='events.store')
+        arrays, attrs = open_arrays('events.store')
+        self.assertEqual(attrs['table'], 'pcawg_events')
+        self.assertEqual(set(arrays), set(EVENT_DTYPE.names))
+        events = np.zeros(len(arrays['code']), dtype=EVENT_DTYPE)
+        for name in EVENT_DTYPE.names:
+            self.assertEqual(arrays[name].dtype, EVENT_DTYPE[name].base)
+            events[name] = arrays[name]
+        tables = []
+        for patient_id in 'abc':
+            patient = PCAWGPatient(patient_id, 'tcga')
+            patient.check_valid()
+            tables.append(patient.event_table())
+        expected = np.concatenate(tables)
+        events = events[np.argsort(events['patient'], kind='stable')]
+        for name in EVENT_DTYPE.names:
+            self.assertEqual(events[name].tolist(), expected[name].tolist())
+
+    def test_failed_patients(self):
+        write_patient('d', [(1, 500, 2, 600, '-', '+')], SEGMENTS)
+        with open('data/tcga_cna/d'+CN_EXTENSION, 'a') as file:
+            file.write('1\t1001\t2000\t2\n')
+        write_patient('e', [(1, 500, 2, 600, '-', '+')], SEGMENTS)
+        os.remove('data/tcga_cna/e'+CN_EXTENSION)
+        validity = self.validate(events_file='events.store')
+        self.assertEqual(validity, {'a': False, 'b': True, 'c': False,
+                                    'd': False, 'e': False})
+        with open('log.txt') as log:
+            logs = log.read()
+        self.assertIn('Patient d: Validation failed. ValueError: ', logs)
+        self.assertIn('line 24: expected 7 fields, found 4!', logs)
+        self.assertIn('Patient e: Validation failed. FileNotFoundError: ',
+                      logs)
+        self.assertIn('Patient b: Success!', logs)
+        arrays, _ = open_arrays('events.store')
+        failed = arrays['patient'][arrays['code'] == EV_FAILED]
+        self.assertEqual(sorted(failed.tolist()), ['d', 'e'])
+
+
+if __name__ == '__main__':
+    unittest.main()
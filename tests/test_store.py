@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from aberration_multigraph.amg import AberrationMultigraph
+from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.incomplete_amg import IncompleteAMG
+from aberration_multigraph.store import (AMGSequenceStore, AMGStore,
+                                         open_arrays, write_arrays, VERSION)
+
+
+class TestArrayStore(unittest.TestCase):
+    """Round trips through the memory-mapped container."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'test.store')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        arrays = {'ints': np.arange(10, dtype=np.int32).reshape(5, 2),
+                  'names': np.array(['a', 'bcd']),
+                  'flags': np.array([True, False]),
+                  'empty': np.zeros((0, 3))}
+        write_arrays(self.filename, arrays, {'kind': 'test'})
+        loaded, attrs = open_arrays(self.filename)
+        self.assertEqual(attrs, {'kind': 'test'})
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(loaded[name], array)
+            self.assertEqual(loaded[name].dtype, array.dtype)
+        self.assertIsInstance(loaded['ints'], np.memmap)
+
+    def test_object_arrays_rejected(self):
+        with self.assertRaises(ValueError):
+            write_arrays(self.filename, {'x': np.array([{}], dtype=object)})
+
+    def test_bad_magic_and_version(self):
+        with open(self.filename, 'wb') as file:
+            file.write(b'NOTASTORE'*4)
+        with self.assertRaises(ValueError):
+            open_arrays(self.filename)
+        write_arrays(self.filename, {'x': np.zeros(3)})
+        with open(self.filename, 'r+b') as file:
+            file.seek(8)
+            file.write((VERSION+1).to_bytes(4, 'little'))
+        with self.assertRaises(ValueError):
+            open_arrays(self.filename)
+
+
+class TestAMGStore(unittest.TestCase):
+    """Storing many AMGs on one backbone."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'amgs.store')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        amgs = list(AMGGenerator(2, [2, 1]).generate_amgs())
+        AMGStore.write(self.filename, amgs)
+        store = AMGStore(self.filename)
+        self.assertEqual(len(store), len(amgs))
+        self.assertEqual(list(store), amgs)
+        self.assertEqual(store[3].name, amgs[3].name)
+
+    def test_tuple_labels(self):
+        amg = AberrationMultigraph([((1, 0), (1, 5)), ((1, 6), (1, 9))],
+                                   [((1, 5), (1, 6))],
+                                   [((1, 5), (1, 6))])
+        AMGStore.write(self.filename, [amg])
+        self.assertEqual(AMGStore(self.filename)[0], amg)
+
+    def test_mixed_backbones_rejected(self):
+        amgs = [next(AMGGenerator(1, [1]).generate_amgs()),
+                next(AMGGenerator(2, [1, 1]).generate_amgs())]
+        with self.assertRaises(ValueError):
+            AMGStore.write(self.filename, amgs)
+
+
+
+class TestAMGSequenceStore(unittest.TestCase):
+    """Delta-encoded storage of enumerated AMGs."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'amgs.store')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_generator_round_trip(self):
+        gen = AMGGenerator(2, [2, 1])
+        count = gen.save_amgs(self.filename, keyframe=5)
+        amgs = list(gen.generate_amgs())
+        store = AMGSequenceStore(self.filename)
+        self.assertEqual(count, len(amgs))
+        self.assertEqual(len(store), len(amgs))
+        self.assertEqual(list(store), amgs)
+        self.assertEqual([amg.name for amg in store],
+                         [amg.name for amg in amgs])
+
+    def test_random_access(self):
+        gen = AMGGenerator(1, [4])
+        gen.save_amgs(self.filename, keyframe=7)
+        amgs = list(gen.generate_amgs())
+        store = AMGSequenceStore(self.filename)
+        for i in (len(amgs)-1, 0, 7, 13, 6, 50):
+            self.assertEqual(store[i], amgs[i])
+            self.assertEqual(store[i].name, amgs[i].name)
+        with self.assertRaises(IndexError):
+            store[len(amgs)]
+
+    def test_smaller_than_full_records(self):
+        gen = AMGGenerator(1, [5])
+        gen.save_amgs(self.filename)
+        full = os.path.join(self.dir.name, 'full.store')
+        AMGStore.write(full, gen.generate_amgs())
+        self.assertLess(os.path.getsize(self.filename), os.path.getsize(full))
+
+    def test_incomplete_amg_completions(self):
+        gen = AMGGenerator(2, [2, 1])
+        v = [u for edge in gen.dsbs for u in edge]
+        inc = IncompleteAMG(gen.chromatins, gen.dsbs, [(v[0], v[3])], 'p')
+        inc.save_completions(self.filename, keyframe=2)
+        amgs = list(inc.complete_amgs())
+        store = AMGSequenceStore(self.filename)
+        self.assertEqual(list(store), amgs)
+        self.assertEqual([amg.name for amg in store],
+                         [amg.name for amg in amgs])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from examples.patient_analysis.sv_utils import (
+    BreakLocation, CNSegment, StructuralVariation, StructuralVariationView,
+    cluster_breakpoints, cn_segments, read_bedpe, read_cna)
+
+SV_HEADER = ('chrom1\tstart1\tend1\tchrom2\tstart2\tend2\tsv_id\tpe_support'
+             '\tstrand1\tstrand2\tsvclass\tsvmethod\n')
+CN_HEADER = 'chromosome\tstart\tend\ttotal_cn\tmajor_cn\tminor_cn\tstar\n'
+
+
+class ParserTestCase(unittest.TestCase):
+    """Writes the parsed files to a temporary directory."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, text):
+        filename = os.path.join(self.dir.name, 'input.txt')
+        with open(filename, 'w') as file:
+            file.write(text)
+        return filename
+
+
+class TestReadBedpe(ParserTestCase):
+    """Parsing consensus SV files."""
+
+    def test_rows(self):
+        table = read_bedpe(self.write(
+            SV_HEADER
+            + '1\t100\t101\tX\t2e5\t200001\tsv0\t7\t+\t-\tTRA\tSNOWMAN\n'
+            + '\n'
+            + 'Y\t5\t6\t22\t1.5E3\t1501\tsv1\t3\t-\t-\tINV\tDELLY\n'))
+        self.assertEqual(table['chrom1'].tolist(), [1, 24])
+        self.assertEqual(table['chrom2'].tolist(), [23, 22])
+        self.assertEqual(table['start2'].tolist(), [200000, 1500])
+        self.assertEqual(table['end2'].tolist(), [200001, 1501])
+        self.assertEqual(table['strand1'].tolist(), ['+', '-'])
+        svs = StructuralVariationView(table)
+        self.assertEqual(len(svs), 2)
+        self.assertEqual(svs[0], StructuralVariation(
+            1, 100, 101, 23, 200000, 200001, 'sv0', '7', '+', '-', 'TRA',
+            'SNOWMAN'))
+        self.assertEqual(list(svs)[1].svmethod, 'DELLY')
+
+    def test_empty(self):
+        table = read_bedpe(self.write(SV_HEADER))
+        self.assertEqual(len(table), 0)
+
+    def test_unknown_chromosome(self):
+        filename = self.write(
+            SV_HEADER+'MT\t1\t2\t1\t3\t4\tsv0\t7\t+\t-\tTRA\tSNOWMAN\n')
+        with self.assertRaisesRegex(ValueError, 'Unknown chromosome'):
+            read_bedpe(filename)
+
+    def test_field_count(self):
+        filename = self.write(
+            SV_HEADER
+            + '1\t100\t101\tX\t2e5\t200001\tsv0\t7\t+\t-\tTRA\tSNOWMAN\n'
+            + '1\t100\t101\tX\t2e5\t200001\tsv1\t7\t+\t-\tTRA\n')
+        with self.assertRaisesRegex(ValueError,
+                                    'line 3: expected 12 fields, found 11'):
+            read_bedpe(filename)
+
+
+class TestReadCna(ParserTestCase):
+    """Parsing consensus CNA files."""
+
+    TEXT = (CN_HEADER
+            + '2\t1\t1000\t2\t1\t1\t3\n'
+            + '2\t1001\t2e3\tNA\tNA\tNA\tNA\n'
+            + 'X\t1\t500\t1\t1\t0\t2\n')
+
+    def test_rows(self):
+        table = read_cna(self.write(self.TEXT))
+        self.assertEqual(table['chrom'].tolist(), [2, 2, 23])
+        self.assertEqual(table['end'].tolist(), [1000, 2000, 500])
+        self.assertEqual(table['total_cn'].tolist(), [2, -1, 1])
+        self.assertEqual(table['star'].tolist(), [3, -1, 2])
+
+    def test_cn_segments(self):
+        sequence = cn_segments(read_cna(self.write(self.TEXT)))
+        self.assertEqual(list(sequence), [2, 23])
+        self.assertEqual(sequence[2], [CNSegment(1, 1000, 2, 1, 1, 3),
+                                       CNSegment(1001, 2000, 'NA', 'NA', 'NA',
+                                                 'NA')])
+        self.assertEqual(sequence[23], [CNSegment(1, 500, 1, 1, 0, 2)])
+
+    def test_field_count(self):
+        filename = self.write(self.TEXT+'3\t1\t500\t1\t1\t0\n')
+        with self.assertRaisesRegex(ValueError,
+                                    'line 5: expected 7 fields, found 6'):
+            read_cna(filename)
+
+
+def sweep(breakpoints, slack, max_span):
+    """Clusters sorted (chrom, bp) pairs one breakpoint at a time."""
+    clusters = []
+    for chrom, bp in breakpoints:
+        if (clusters and clusters[-1][-1][0] == chrom
+                and bp-clusters[-1][-1][1] <= slack
+                and (max_span is None or bp-clusters[-1][0][1] <= max_span)):
+            clusters[-1].append((chrom, bp))
+        else:
+            clusters.append([(chrom, bp)])
+    return clusters
+
+
+class TestClusterBreakpoints(unittest.TestCase):
+    """Merging breakpoints within a tolerance."""
+
+    def test_slack(self):
+        locations, mapping = cluster_breakpoints(
+            [1, 1, 1, 1, 1], [10, 12, 15, 16, 30], 2)
+        self.assertEqual(locations, [BreakLocation(1, 10),
+                                     BreakLocation(1, 15),
+                                     BreakLocation(1, 30)])
+        self.assertEqual(mapping.tolist(), [0, 0, 1, 1, 2])
+
+    def test_lower_median(self):
+        locations, _ = cluster_breakpoints([3]*4, [10, 11, 12, 13], 1)
+        self.assertEqual(locations, [BreakLocation(3, 11)])
+        locations, _ = cluster_breakpoints([3]*3, [10, 11, 13], 2)
+        self.assertEqual(locations, [BreakLocation(3, 11)])
+
+    def test_max_span(self):
+        locations, mapping = cluster_breakpoints([1]*5, [0, 2, 4, 6, 8], 2,
+                                                 max_span=4)
+        self.assertEqual(locations, [BreakLocation(1, 2), BreakLocation(1, 6)])
+        self.assertEqual(mapping.tolist(), [0, 0, 0, 1, 1])
+        locations, _ = cluster_breakpoints([1]*5, [0, 2, 4, 6, 8], 2)
+        self.assertEqual(locations, [BreakLocation(1, 4)])
+
+    def test_chromosome_boundary(self):
+        locations, mapping = cluster_breakpoints([2, 1, 1], [11, 10, 12], 5)
+        self.assertEqual(locations, [BreakLocation(1, 10),
+                                     BreakLocation(2, 11)])
+        self.assertEqual(mapping.tolist(), [1, 0, 0])
+
+    def test_unsorted(self):
+        chroms = [2, 1, 2, 1, 1, 2]
+        bps = [500, 30, 498, 10, 11, 100]
+        locations, mapping = cluster_breakpoints(chroms, bps, 2)
+        self.assertEqual(locations, [BreakLocation(1, 10),
+                                     BreakLocation(1, 30),
+                                     BreakLocation(2, 100),
+                                     BreakLocation(2, 498)])
+        self.assertEqual(mapping.tolist(), [3, 1, 3, 0, 0, 2])
+
+    def test_empty(self):
+        locations, mapping = cluster_breakpoints([], [], 2)
+        self.assertEqual(locations, [])
+        self.assertEqual(mapping.shape, (0,))
+
+    def test_matches_sweep(self):
+        rng = np.random.default_rng(0)
+        for max_span in (None, 0, 5, 12):
+            chroms = rng.integers(1, 4, 200)
+            bps = rng.integers(0, 300, 200)
+            locations, mapping = cluster_breakpoints(chroms, bps, 3, max_span)
+            clusters = sweep(sorted(zip(chroms.tolist(), bps.tolist())), 3,
+                             max_span)
+            self.assertEqual(locations, [BreakLocation(*c[(len(c)-1)//2])
+                                            for c in clusters])
+            # every breakpoint maps to a cluster containing it, and the
+            # clusters are numbered in sorted order
+            for chrom, bp, k in zip(chroms.tolist(), bps.tolist(),
+                                    mapping.tolist()):
+                self.assertIn((chrom, bp), clusters[k])
+            order = np.lexsort((bps, chroms))
+            self.assertTrue((np.diff(mapping[order]) >= 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
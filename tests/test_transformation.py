@@ -0,0 +1,101 @@
+import unittest
+from collections import deque
+
+from aberration_multigraph.amg import AberrationMultigraph
+from aberration_multigraph.generator import AMGGenerator
+from aberration_multigraph.transformation import (MoveSpace,
+                                                  shortest_transformation)
+
+
+def apply_operations(amg, operations):
+    for operation in operations:
+        if operation[0] == 'twist':
+            amg = amg.total_twist(operation[1])
+        elif operation[0] == 'swap':
+            amg = amg.total_swap(operation[1], operation[2])
+        else:
+            amg = amg.edge_reversal(operation[1])
+    return amg
+
+
+class TestMoveSpace(unittest.TestCase):
+    """The compact moves agree with the AMG methods."""
+
+    def setUp(self):
+        self.chromatin = [(1,2),(3,4),(5,6),(7,8),(9,10),(11,12),(13,14),(15,16)]
+        self.dsb = [(2,3),(6,7),(10,11),(14,15)]
+        self.amg = AberrationMultigraph(self.chromatin, self.dsb,
+                                        [(2,6),(3,11),(7,14),(10,15)])
+        self.space = MoveSpace(self.chromatin, self.dsb)
+
+    def test_encode_decode(self):
+        state = self.space.encode(self.amg)
+        self.assertEqual(self.space.decode(state), self.amg)
+
+    def test_twist_matches_amg(self):
+        state = self.space.encode(self.amg)
+        for k in range(self.amg.num_chromosome):
+            self.assertEqual(self.space.decode(self.space.twist(state, k)),
+                             self.amg.total_twist(k))
+
+    def test_swap_matches_amg(self):
+        state = self.space.encode(self.amg)
+        self.assertEqual(self.space.decode(self.space.swap(state, 0, 1)),
+                         self.amg.total_swap(0, 1))
+
+    def test_reversal_matches_amg(self):
+        amg = AberrationMultigraph([(0,1),(2,3),(4,5)], [(1,2),(3,4)],
+                                   [(1,3),(2,4)])
+        space = MoveSpace(amg.chromatins, amg.dsbs)
+        state = space.reversal(space.encode(amg), (2,3))
+        self.assertEqual(space.decode(state), amg.edge_reversal((2,3)))
+
+    def test_foreign_backbone_rejected(self):
+        other = AberrationMultigraph([(1,2),(3,4)], [(2,3)], [])
+        with self.assertRaises(ValueError):
+            self.space.encode(other)
+
+
+class TestShortestTransformation(unittest.TestCase):
+    """Bidirectional search finds shortest operation sequences."""
+
+    def test_identical_amgs(self):
+        amg = next(AMGGenerator(2, [1, 1]).generate_amgs())
+        self.assertEqual(shortest_transformation(amg, amg), [])
+
+    def test_operations_reach_target(self):
+        amgs = list(AMGGenerator(2, [2, 1]).generate_amgs())
+        source = amgs[0]
+        for target in amgs[1:]:
+            path = shortest_transformation(source, target)
+            if path is not None:
+                self.assertEqual(apply_operations(source, path), target)
+
+    def test_matches_unidirectional_bfs(self):
+        amgs = list(AMGGenerator(2, [2, 2]).generate_amgs())
+        space = MoveSpace(amgs[0].chromatins, amgs[0].dsbs)
+        start = space.encode(amgs[0])
+        dist = {start: 0}
+        queue = deque([start])
+        while queue:
+            state = queue.popleft()
+            for _, new_state in space.moves(state):
+                if new_state not in dist:
+                    dist[new_state] = dist[state]+1
+                    queue.append(new_state)
+        for target in amgs[1:]:
+            path = shortest_transformation(amgs[0], target)
+            expected = dist.get(space.encode(target))
+            self.assertEqual(None if path is None else len(path), expected)
+
+    def test_restricted_operations(self):
+        gen = AMGGenerator(2, [1, 1])
+        source, target = list(gen.generate_amgs())
+        path = shortest_transformation(source, target, operations=('swap',))
+        self.assertIsNone(path)
+        path = shortest_transformation(source, target, operations=('twist',))
+        self.assertEqual(len(path), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()